@@ -0,0 +1,193 @@
+import os
+import sys
+import json
+import time
+import zlib
+import socket
+import asyncio
+import argparse
+import subprocess
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import server
+from network_format import encode_network
+from synthetic import synthetic_fixtures, write_results, compare_results
+
+# End-to-end benchmark of build_paper_network against fixtures served by epmc_replay.py
+#   python benchmarks/bench_build.py [--sizes 50,500,5000,50000] [--latency 0.05] [--output results.json] [--compare previous.json]
+#   python benchmarks/bench_build.py --fixtures recorded.jsonl.gz --seed 12345 --sizes 300
+# A size is the papers_threshold of the build (reference_threshold is half of it), the
+# synthetic corpus has twice as many papers. Fixtures are written once in benchmarks/fixtures/.
+# The CPU heavy steps run in the benchmark process (process_workers=0) so their CPU time
+# is counted, and the replay server runs in its own process so its time is not.
+# tracemalloc slows the build down : use --no-tracemalloc for timings only.
+
+REPLAY_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "epmc_replay.py")
+
+class BenchmarkClient(server.MyServerProtocol):
+    """ Stands for the client connection : counts the messages of the build. """
+
+    def __init__(self):
+        self.messages = 0
+        self.messages_bytes = 0
+
+    def send(self, message):
+        self.messages += 1
+        self.messages_bytes += len(message.encode('utf-8'))
+
+    def send_binary(self, data):
+        self.messages += 1
+        self.messages_bytes += len(data)
+
+
+class PhaseMeter:
+    """ Wall time, CPU time, peak traced memory, requests and bytes received of
+    each phase, measured between the phase changes the build reports. """
+
+    def __init__(self, engine, trace_memory):
+        self.engine = engine
+        self.trace_memory = trace_memory
+        self.phases = []
+        self.current = None
+
+    def snapshot(self):
+        return (time.perf_counter(), time.process_time(), self.engine.requests_count, self.engine.bytes_received)
+
+    def start(self, phase):
+        self.stop()
+        if self.trace_memory: tracemalloc.reset_peak()
+        self.current = (phase, self.snapshot())
+
+    def stop(self):
+        if self.current is None: return
+        (phase, (wall, cpu, requests, received)) = self.current
+        (end_wall, end_cpu, end_requests, end_received) = self.snapshot()
+        self.phases.append({
+            "phase" : phase,
+            "wall_seconds" : end_wall - wall,
+            "cpu_seconds" : end_cpu - cpu,
+            "peak_memory_bytes" : tracemalloc.get_traced_memory()[1] if self.trace_memory else None,
+            "requests" : end_requests - requests,
+            "bytes_received" : end_received - received
+        })
+        self.current = None
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def start_replay(fixtures_file, port, latency, jitter):
+    replay = subprocess.Popen([sys.executable, REPLAY_SCRIPT, fixtures_file, "--port", str(port), "--latency", str(latency), "--jitter", str(jitter)], stdout = subprocess.DEVNULL)
+    # large archives take a while to load
+    deadline = time.time() + 600
+    while time.time() < deadline:
+        if replay.poll() is not None:
+            raise ValueError("replay server exited with code {0}".format(replay.returncode))
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout = 1).close()
+            return replay
+        except OSError:
+            time.sleep(0.2)
+    replay.kill()
+    raise ValueError("replay server not listening on port {0}".format(port))
+
+def configure_server(endpoint):
+    server.epmc_endpoint = endpoint
+    server.VERBOSITY = 0
+    server.TIMING = False
+    server.NO_CLIENT = False
+    server.DUMP_FILE = False
+    server.STREAM_DELTAS = False
+    server.CACHE = False
+    server.CITATION_GRAPH = False
+    server.RESULT_STORE = False
+    server.RECORD_FIXTURES = False
+    server.SPECULATIVE_PAGING = True
+    server.process_workers = 0
+    server.requests_per_second = 100000.0
+
+async def build(seed, papers_count, meter):
+    client = BenchmarkClient()
+    listener = lambda output, phase : meter.start(phase)
+    server.phase_listeners.append(listener)
+    try:
+        meter.start("setup")
+        final_data = await client.build_paper_network(seed, reference_threshold = max(1, papers_count // 2), explored_threshold = -1, papers_threshold = papers_count,
+            cur_step_ref_buffer_size = server.cur_step_ref_buffer_size, cur_step_cit_buffer_size = server.cur_step_cit_buffer_size,
+            mined_terms_search_buffer_size = server.mined_terms_search_buffer_size, same_author_weight = server.same_author_weight)
+        meter.stop()
+    finally:
+        server.phase_listeners.remove(listener)
+        await server.get_http_engine().close()
+    return (final_data, client)
+
+def run(papers_count, fixtures_file, seed, latency = 0.0, jitter = 0.0, port = 8799, trace_memory = True):
+    replay = start_replay(fixtures_file, port, latency, jitter)
+    try:
+        configure_server("http://127.0.0.1:{0}/".format(port))
+        engine = server.get_http_engine()
+        (requests_count, bytes_received) = engine.requests_count, engine.bytes_received
+        meter = PhaseMeter(engine, trace_memory)
+        if trace_memory: tracemalloc.start()
+        (wall, cpu) = time.perf_counter(), time.process_time()
+        loop = asyncio.new_event_loop()
+        try:
+            (final_data, client) = loop.run_until_complete(build(seed, papers_count, meter))
+        finally:
+            loop.close()
+        (wall, cpu) = time.perf_counter() - wall, time.process_time() - cpu
+        if trace_memory: tracemalloc.stop()
+    finally:
+        replay.terminate()
+        replay.wait()
+    # the peak of the build is the highest peak of its phases
+    peak_memory = max(phase["peak_memory_bytes"] for phase in meter.phases) if trace_memory else None
+    payload = json.dumps(final_data).encode('utf-8')
+    return {
+        "benchmark" : "build",
+        "papers" : papers_count,
+        "fixtures" : os.path.basename(fixtures_file),
+        "latency" : latency,
+        "nodes" : len(final_data.get("nodes", [])),
+        "links" : len(final_data.get("links", [])),
+        "wall_seconds" : wall,
+        "cpu_seconds" : cpu,
+        "peak_memory_bytes" : peak_memory,
+        "requests" : engine.requests_count - requests_count,
+        "bytes_received" : engine.bytes_received - bytes_received,
+        "messages" : client.messages,
+        "messages_bytes" : client.messages_bytes,
+        "payload_bytes" : { "json" : len(payload), "json_zlib" : len(zlib.compress(payload)), "columnar" : len(encode_network(final_data)) if len(payload) > 2 else 0 },
+        "phases" : meter.phases
+    }
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def print_result(result):
+    # on stderr, stdout is left to the JSON results
+    print("{0:>7} papers : {1} nodes, {2} links, {3:.2f} s wall, {4:.2f} s CPU, {5} requests, {6} bytes received, {7} bytes of JSON".format(result["papers"], result["nodes"], result["links"], result["wall_seconds"], result["cpu_seconds"], result["requests"], result["bytes_received"], result["payload_bytes"]["json"]), file = sys.stderr)
+    for phase in result["phases"]:
+        memory = "" if phase["peak_memory_bytes"] is None else ", peak {0:.1f} MB".format(phase["peak_memory_bytes"] / 1e6)
+        print("   phase {0:<5} {1:8.3f} s wall {2:8.3f} s CPU {3:6} requests {4:10} bytes{5}".format(phase["phase"], phase["wall_seconds"], phase["cpu_seconds"], phase["requests"], phase["bytes_received"], memory), file = sys.stderr)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = "Benchmark the network build against replayed Europe PMC fixtures")
+    parser.add_argument("--sizes", default = "50,500,5000,50000", help = "papers_threshold of each build, e.g. 50,500 for a quick run")
+    parser.add_argument("--fixtures", help = "recorded fixture archive, instead of the synthetic corpus")
+    parser.add_argument("--seed", help = "initial paper of the recorded fixtures")
+    parser.add_argument("--latency", type = float, default = 0.0)
+    parser.add_argument("--jitter", type = float, default = 0.0)
+    parser.add_argument("--port", type = int, default = 8799)
+    parser.add_argument("--no-tracemalloc", action = "store_true")
+    parser.add_argument("--output", help = "JSON results file, printed when not given")
+    parser.add_argument("--compare", help = "JSON results file of a previous run")
+    args = parser.parse_args()
+    if (args.fixtures is None) != (args.seed is None): parser.error("--fixtures and --seed go together")
+    results = []
+    for papers_count in map(int, args.sizes.split(",")):
+        (fixtures_file, seed) = (args.fixtures, args.seed) if args.fixtures is not None else synthetic_fixtures(2 * papers_count)
+        result = run(papers_count, fixtures_file, seed, args.latency, args.jitter, args.port, not args.no_tracemalloc)
+        results.append(result)
+        print_result(result)
+    if args.output is not None: write_results(results, args.output)
+    if args.compare is not None: compare_results(results, args.compare)
+    if (args.output is None) and (args.compare is None): write_results(results)
@@ -0,0 +1,76 @@
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import server
+from text_processing import normalize_word, load_stop_words, title_words, text_words
+from document_index import DocumentIndex
+from relevance import RelevanceIndex
+from link_weighting import compute_link_weights, normalize_weights
+from synthetic import make_corpus, brief, write_results, compare_results
+
+# Micro-benchmarks of the steps of a build that do not wait for Europe PMC
+#   python benchmarks/bench_micro.py [--sizes 500,5000] [--output results.json] [--compare previous.json]
+
+def best_time(function, setup = lambda : None, repeat = 5):
+    # setup() runs before every measure and its result is given to function
+    times = []
+    for _ in range(repeat):
+        argument = setup()
+        start = time.perf_counter()
+        function(argument)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def run(papers_count, repeat = 5):
+    corpus = make_corpus(papers_count)
+    stop_words = load_stop_words()
+    ids = list(corpus["papers"])
+    papers = [corpus["papers"][id] for id in ids]
+    # inputs of phase 2 and phase 6, as the build has them
+    titles_index = DocumentIndex()
+    abstracts_index = DocumentIndex(titles_index.vocabulary)
+    for paper in papers:
+        titles_index.add_document(paper["id"], title_words(paper["title"], stop_words))
+        abstracts_index.add_document(paper["id"], text_words(paper["abstractText"], stop_words))
+    def relevance_index():
+        index = RelevanceIndex()
+        for id in ids:
+            index.set_word_counts(id, abstracts_index.term_counts(id))
+            index.set_terms(id, corpus["terms"][id])
+        return index
+    positions = dict((id, index) for (index, id) in enumerate(ids))
+    links = [(positions[id], positions[cited]) for id in ids for cited in corpus["references"][id]]
+    weighting_inputs = dict(titles_words = [titles_index.words(id) for id in ids], word_count = titles_index.document_frequencies(), papers_count = len(ids),
+        papers_terms = [corpus["terms"][id] for id in ids], papers_authors = [paper["authorString"].split(", ") for paper in papers], same_author_weight = 1)
+    reference_lists = [brief(paper) for paper in papers]
+    words = " ".join(paper["title"] + " " + paper["abstractText"] for paper in papers).split()
+    measures = [
+        ("extract_LtdPaperDetails", len(reference_lists), lambda _ : server.extract_LtdPaperDetails(reference_lists), lambda : None),
+        ("normalize_word", len(words), lambda _ : list(map(normalize_word, words)), lambda : None),
+        ("phase_2_relevance", len(ids), lambda index : index.similarities([ids[0]], ids[1:]), relevance_index),
+        ("phase_6_weighting", len(links), lambda _ : normalize_weights(compute_link_weights(links, **weighting_inputs)), lambda : None)
+    ]
+    results = []
+    for (name, items, function, setup) in measures:
+        seconds = best_time(function, setup, repeat)
+        results.append({ "benchmark" : name, "papers" : papers_count, "items" : items, "seconds" : seconds, "items_per_second" : items / seconds if seconds > 0 else None })
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = "Micro-benchmarks of the CPU bound steps of a build")
+    parser.add_argument("--sizes", default = "500,5000", help = "papers of each synthetic corpus")
+    parser.add_argument("--repeat", type = int, default = 5)
+    parser.add_argument("--output", help = "JSON results file, printed when not given")
+    parser.add_argument("--compare", help = "JSON results file of a previous run")
+    args = parser.parse_args()
+    results = []
+    for papers_count in map(int, args.sizes.split(",")):
+        for result in run(papers_count, args.repeat):
+            results.append(result)
+            print("{0:<24} {1:>7} papers {2:>9} items {3:10.4f} s".format(result["benchmark"], result["papers"], result["items"], result["seconds"]), file = sys.stderr)
+    if args.output is not None: write_results(results, args.output)
+    if args.compare is not None: compare_results(results, args.compare)
+    if (args.output is None) and (args.compare is None): write_results(results)
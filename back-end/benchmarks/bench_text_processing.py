@@ -0,0 +1,69 @@
+import os
+import sys
+import json
+import timeit
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from text_processing import normalize_word, load_stop_words, title_words, text_words
+
+# Micro-benchmark of the tokenizer against the functions it replaced in server.py
+#   python benchmarks/bench_text_processing.py [--json]
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+# previous implementation, kept here as the reference
+
+def legacy_delete_characters(word, characters_to_delete):
+    for char in characters_to_delete: word = word.replace(char, "")
+    return word
+
+def legacy_normalize_word(word):
+    if not isinstance(word, str):
+        raise ValueError("word : expected str, found {0}".format(type(word).__name__))
+    return legacy_delete_characters(word, ".,?():\n\r").lower()
+
+def legacy_extract_normalized_words_from_title(title, stop_words_set):
+    title_normalized_words = set(list(map(legacy_normalize_word, title.split(' '))))
+    return list(filter(lambda word : not (word in stop_words_set), title_normalized_words))
+
+def legacy_extract_normalized_words_from_text(text, stop_words_set):
+    words_list = list(filter(lambda word : len(word) > 0, map(legacy_normalize_word, text.split())))
+    return list(filter(lambda word : not (word in stop_words_set), words_list))
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def make_corpus(papers_count = 2000, seed = 1):
+    # titles and abstracts looking like Europe PMC ones
+    generator = random.Random(seed)
+    vocabulary = ["Malaria", "treatment", "of", "the", "(PfEMP1)", "cells,", "protein:", "in", "vivo.", "gene?", "analysis", "and", "risk", "Plasmodium", "falciparum", "resistance", "artemisinin", "a", "study", "with"]
+    titles = [" ".join(generator.choice(vocabulary) for _ in range(generator.randint(6, 16))) for _ in range(papers_count)]
+    abstracts = [" ".join(generator.choice(vocabulary) for _ in range(generator.randint(120, 300))) for _ in range(papers_count)]
+    return (titles, abstracts)
+
+def best_time(function, repeat = 5):
+    return min(timeit.repeat(function, number = 1, repeat = repeat))
+
+def run(papers_count = 2000):
+    (titles, abstracts) = make_corpus(papers_count)
+    stop_words = load_stop_words()
+    words = " ".join(abstracts).split()
+    # both implementations must agree
+    assert all(map(lambda title : sorted(title_words(title, stop_words)) == sorted(legacy_extract_normalized_words_from_title(title, stop_words)), titles))
+    assert all(map(lambda text : text_words(text, stop_words) == legacy_extract_normalized_words_from_text(text, stop_words), abstracts))
+    results = []
+    for (name, legacy, current) in [
+        ("normalize_word", lambda : list(map(legacy_normalize_word, words)), lambda : list(map(normalize_word, words))),
+        ("title_words", lambda : [legacy_extract_normalized_words_from_title(title, stop_words) for title in titles], lambda : [title_words(title, stop_words) for title in titles]),
+        ("text_words", lambda : [legacy_extract_normalized_words_from_text(text, stop_words) for text in abstracts], lambda : [text_words(text, stop_words) for text in abstracts])
+    ]:
+        (legacy_time, current_time) = best_time(legacy), best_time(current)
+        results.append({ "benchmark" : name, "papers" : papers_count, "legacy_seconds" : legacy_time, "seconds" : current_time, "speedup" : legacy_time / current_time })
+    return results
+
+if __name__ == '__main__':
+    results = run()
+    if "--json" in sys.argv:
+        print(json.dumps(results, indent = 4))
+    else:
+        for result in results:
+            print("{0:<16} legacy {1:8.4f} s   new {2:8.4f} s   x{3:.1f}".format(result["benchmark"], result["legacy_seconds"], result["seconds"], result["speedup"]))
@@ -0,0 +1,119 @@
+import os
+import sys
+import json
+import time
+import random
+import platform
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import server
+from epmc_replay import FixtureRecorder
+
+# Synthetic Europe PMC corpus for the benchmarks, written as a fixture archive
+# that epmc_replay.py serves like one recorded from the real API.
+
+FIXTURES_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+def make_words(generator, count, min_length = 3, max_length = 11):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(generator.choice(letters) for _ in range(generator.randint(min_length, max_length))) for _ in range(count)]
+
+def make_corpus(papers_count, seed = 1, mean_references = 15):
+    # papers cite later papers of a window, so the crawl from the first paper reaches most of them
+    generator = random.Random(seed)
+    vocabulary = make_words(generator, 3000)
+    # a few words are much more frequent than the others, as in real text
+    weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+    terms = make_words(generator, 800, 5, 14)
+    authors = ["{0} {1}".format(name.capitalize(), generator.choice("ABCDEFGHJKLMNPRSTW")) for name in make_words(generator, max(50, papers_count // 4), 4, 9)]
+    ids = [str(1000000 + index) for index in range(papers_count)]
+    papers = dict()
+    for (index, id) in enumerate(ids):
+        title = " ".join(generator.choices(vocabulary, weights, k = generator.randint(6, 16))).capitalize() + "."
+        abstract = " ".join(word + generator.choice(["", "", "", "", ",", ".", ":"]) for word in generator.choices(vocabulary, weights, k = generator.randint(80, 250)))
+        papers[id] = { "id" : id, "source" : "MED", "pmid" : id, "title" : title, "authorString" : ", ".join(generator.sample(authors, generator.randint(1, 6))),
+            "pubYear" : str(2020 - index * 30 // papers_count), "citedByCount" : 0, "hasReferences" : "Y", "abstractText" : abstract }
+    window = max(50, papers_count // 20)
+    references = dict()
+    for (index, id) in enumerate(ids):
+        later = ids[index + 1:index + 1 + window]
+        references[id] = generator.sample(later, min(len(later), generator.randint(0, 2 * mean_references)))
+    citations = dict((id, []) for id in ids)
+    for id in ids:
+        for cited in references[id]: citations[cited].append(id)
+    for id in ids: papers[id]["citedByCount"] = len(citations[id])
+    mined_terms = dict((id, dict((term, generator.randint(1, 12)) for term in generator.sample(terms, generator.randint(0, 20)))) for id in ids)
+    return { "seed" : ids[0], "papers" : papers, "references" : references, "citations" : citations, "terms" : mined_terms }
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def brief(paper):
+    # reference and citation lists carry the paper without its abstract
+    return dict((key, paper[key]) for key in paper if key != "abstractText")
+
+def relation_pages(corpus, id, relation_type, page_size):
+    (list_header, item_header) = ('referenceList', 'reference') if relation_type == "references" else ('citationList', 'citation')
+    related = corpus[relation_type][id]
+    for page in range(1, len(related) // page_size + 2):
+        JSON_resp = { "hitCount" : len(related), "request" : { "id" : id, "source" : "MED", "page" : page, "pageSize" : page_size } }
+        items = related[(page - 1) * page_size:page * page_size]
+        if len(items) > 0: JSON_resp[list_header] = { item_header : [brief(corpus["papers"][item]) for item in items] }
+        yield (page, JSON_resp)
+
+def write_fixtures(corpus, file_name, page_size = 1000):
+    # every request a build from any paper of the corpus sends, at the page sizes it uses
+    if os.path.isfile(file_name): os.remove(file_name)
+    recorder = FixtureRecorder(file_name, server.epmc_endpoint)
+    for id in corpus["papers"]:
+        paper = corpus["papers"][id]
+        recorder.record(server.id_search_page_url_builder([id], 25)(1), { "hitCount" : 1, "request" : { "query" : "(EXT_ID:" + id + ")", "page" : 1, "pageSize" : 25 }, "resultList" : { "result" : [paper] } })
+        for relation_type in ["references", "citations"]:
+            page_url = server.relation_page_url_builder("MED", id, relation_type, page_size)
+            for (page, JSON_resp) in relation_pages(corpus, id, relation_type, page_size): recorder.record(page_url(page), JSON_resp)
+        summary = [{ "term" : term, "count" : count } for (term, count) in corpus["terms"][id].items()]
+        JSON_resp = { "hitCount" : len(summary), "request" : { "id" : id, "source" : "MED", "page" : 1, "pageSize" : page_size } }
+        if len(summary) > 0: JSON_resp["semanticTypeList"] = { "semanticType" : [{ "name" : "GENE_PROTEIN", "total" : len(summary), "tmSummary" : summary }] }
+        recorder.record(server.mined_terms_page_url_builder("MED", id, page_size)(1), JSON_resp)
+        if len(recorder.pending) > 10000: recorder.commit()
+    recorder.commit()
+    return file_name
+
+def synthetic_fixtures(papers_count, seed = 1):
+    # (fixture archive, seed paper id) of a corpus, written the first time it is asked for
+    file_name = os.path.join(FIXTURES_DIRECTORY, "synthetic_{0}_{1}.jsonl.gz".format(papers_count, seed))
+    seed_file = file_name + ".seed"
+    if not (os.path.isfile(file_name) and os.path.isfile(seed_file)):
+        corpus = make_corpus(papers_count, seed)
+        write_fixtures(corpus, file_name)
+        with open(seed_file, 'w') as seed_file_handle: seed_file_handle.write(corpus["seed"])
+    with open(seed_file, 'r') as seed_file_handle:
+        return (file_name, seed_file_handle.read().strip())
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def run_info():
+    # what the results were measured on, to compare runs of different commits
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output = True, text = True, cwd = os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = None
+    return { "commit" : commit, "date" : time.strftime("%Y-%m-%dT%H:%M:%S"), "python" : platform.python_version(), "machine" : platform.machine(), "cpus" : os.cpu_count() }
+
+def write_results(results, output_file = None):
+    document = dict(run_info(), results = results)
+    if output_file is None: print(json.dumps(document, indent = 4))
+    else:
+        with open(output_file, 'w') as results_file: json.dump(document, results_file, indent = 4)
+
+def compare_results(results, previous_file):
+    # ratio new / previous of the figures measured by both runs, > 1 is slower or bigger
+    with open(previous_file, 'r') as previous:
+        document = json.load(previous)
+    before = dict(((result["benchmark"], result["papers"]), result) for result in document["results"])
+    print("compared to {0} ({1})".format(previous_file, document.get("commit")))
+    for result in results:
+        old = before.get((result["benchmark"], result["papers"]))
+        if old is None: continue
+        keys = [key for key in ["seconds", "wall_seconds", "cpu_seconds", "peak_memory_bytes", "requests", "bytes_received"] if result.get(key) and old.get(key)]
+        print("{0:<24} {1:>7} papers : {2}".format(result["benchmark"], result["papers"], ", ".join(["{0} x{1:.2f}".format(key, result[key] / old[key]) for key in keys])))
@@ -0,0 +1,81 @@
+import time
+import asyncio
+
+# share of the budget given to each phase ; a phase may also use what the phases
+# before it left, so its limit is the sum of the shares up to its own. Phase 6
+# sends no request, its share of the deadline is kept to weight the links.
+PHASE_SHARES = [("0", 0.35), ("1", 0.05), ("2", 0.0), ("3", 0.25), ("4", 0.15), ("5", 0.05), ("6", 0.15)]
+
+def cumulated_shares(shares):
+    total = sum(share for (_, share) in shares)
+    (limits, cumulated) = dict(), 0.0
+    for (phase, share) in shares:
+        cumulated += share
+        limits[phase] = cumulated / total
+    return limits
+
+class BuildBudget:
+    """ Deadline (seconds) and number of requests a build may use, either one
+    or both, None for no limit. Each phase stops once its part of the budget
+    is used ; what was cut short is reported with the network. """
+
+    def __init__(self, deadline = None, max_requests = None, requests_used = lambda : 0):
+        # requests_used : returns the requests the build sent so far
+        if (deadline is not None) and (deadline <= 0):
+            raise ValueError("deadline : expected seconds > 0, found {0}".format(deadline))
+        if (max_requests is not None) and (max_requests <= 0):
+            raise ValueError("max_requests : expected > 0, found {0}".format(max_requests))
+        self.deadline = deadline
+        self.max_requests = max_requests
+        self.requests_used = requests_used
+        self.started = time.monotonic()
+        self.time_limits = cumulated_shares(PHASE_SHARES)
+        self.request_limits = cumulated_shares([(phase, share) for (phase, share) in PHASE_SHARES if phase != "6"])
+        self.cut_short = dict()         # phase -> why it stopped early
+
+    def limited(self):
+        return (self.deadline is not None) or (self.max_requests is not None)
+
+    def remaining(self, phase = None):
+        # seconds left to the phase (to the whole build by default), None without deadline
+        if self.deadline is None: return None
+        limit = self.time_limits.get(str(phase), 1.0) if phase is not None else 1.0
+        return max(0.0, self.started + self.deadline * limit - time.monotonic())
+
+    def exhausted(self, phase = None):
+        # why the phase (the whole build by default) has to stop, None if it can go on
+        if (self.deadline is not None) and (self.remaining(phase) <= 0): return "deadline"
+        if self.max_requests is not None:
+            limit = self.request_limits.get(str(phase), 1.0) if phase is not None else 1.0
+            if self.requests_used() >= self.max_requests * limit: return "requests"
+        return None
+
+    def cut(self, phase, reason, **details):
+        if not str(phase) in self.cut_short: self.cut_short[str(phase)] = dict(details, reason = reason)
+        else: self.cut_short[str(phase)].update(details)
+
+    def stop(self, phase):
+        # True when the phase has to stop, which is then reported as cut short
+        reason = self.exhausted(phase)
+        if reason is not None: self.cut(phase, reason)
+        return reason is not None
+
+    async def step(self, phase, awaitable):
+        # a crawl step still running when the phase runs out of time is dropped : None
+        remaining = self.remaining(phase)
+        if remaining is None: return await awaitable
+        try:
+            return await asyncio.wait_for(awaitable, remaining)
+        except asyncio.TimeoutError:
+            if self.remaining(phase) > 0: raise
+            self.cut(phase, "deadline")
+            return None
+
+    def report(self):
+        return {
+            "deadline" : self.deadline,
+            "max_requests" : self.max_requests,
+            "seconds" : time.monotonic() - self.started,
+            "requests" : self.requests_used(),
+            "cut_short" : self.cut_short
+        }
@@ -0,0 +1,84 @@
+import sqlite3
+import time
+import json
+import os
+
+# Lists of related papers kept by the graph
+RELATION_TYPES = ["references", "citations"]
+
+class CitationGraph:
+    """ Citation graph of every reference and citation list fetched by the server.
+    Edges (citing, cited) and the papers they link are kept once, whichever list
+    they came from. A list is recorded with its hitCount and fetch time once it
+    was fetched entirely, and is answered from the graph until it is older than
+    the time to live of its kind ("references" or "citations"). """
+
+    def __init__(self, file_name, ttls = {}):
+        directory = os.path.dirname(file_name)
+        if (len(directory) > 0) and (not os.path.isdir(directory)): os.makedirs(directory)
+        self.file_name = file_name
+        self.ttls = dict(ttls)
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.lists_stored = 0
+        self.connection = sqlite3.connect(file_name)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS papers (id TEXT PRIMARY KEY, src TEXT, title TEXT, authors TEXT, pubYear INTEGER, citedCount INTEGER, updated REAL)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS edges (citing TEXT, cited TEXT, PRIMARY KEY (citing, cited)) WITHOUT ROWID")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS edges_cited ON edges (cited, citing)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS lists (id TEXT, kind TEXT, src TEXT, hit_count INTEGER, fetched REAL, PRIMARY KEY (id, kind))")
+        self.connection.commit()
+
+    def ttl(self, kind):
+        return self.ttls.get(kind, 0)
+
+    def get_list(self, id, kind):
+        # [(related paper id, its fields or None)] of a complete and fresh list, None otherwise
+        # fields : (id, src, title, authors, pubYear, citedCount, abstract) as extracted from a response
+        row = self.connection.execute("SELECT fetched FROM lists WHERE id = ? AND kind = ?", (id, kind)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        if time.time() - row[0] > self.ttl(kind):
+            self.stale += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        if kind == "references":
+            rows = self.connection.execute("SELECT e.cited, p.src, p.title, p.authors, p.pubYear, p.citedCount FROM edges e LEFT JOIN papers p ON p.id = e.cited WHERE e.citing = ?", (id,))
+        else:
+            rows = self.connection.execute("SELECT e.citing, p.src, p.title, p.authors, p.pubYear, p.citedCount FROM edges e LEFT JOIN papers p ON p.id = e.citing WHERE e.cited = ?", (id,))
+        return [(row[0], None if row[1] is None else (row[0], row[1], row[2], json.loads(row[3]), row[4], row[5], "")) for row in rows]
+
+    def put_list(self, src, id, kind, hit_count, items):
+        # items : the whole list, as (related paper id, its fields or None)
+        if not kind in RELATION_TYPES:
+            raise ValueError("kind : expected one of {0}, found {1}".format(RELATION_TYPES, kind))
+        now = time.time()
+        papers = [(fields[0], fields[1], fields[2], json.dumps(fields[3]), fields[4], fields[5], now) for (_, fields) in items if fields is not None]
+        self.connection.executemany("INSERT OR REPLACE INTO papers VALUES (?, ?, ?, ?, ?, ?, ?)", papers)
+        if kind == "references": edges = [(id, item[0]) for item in items]
+        else: edges = [(item[0], id) for item in items]
+        self.connection.executemany("INSERT OR IGNORE INTO edges VALUES (?, ?)", edges)
+        self.connection.execute("INSERT OR REPLACE INTO lists VALUES (?, ?, ?, ?, ?)", (id, kind, src, hit_count, now))
+        self.lists_stored += 1
+
+    def commit(self):
+        self.connection.commit()
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+    def stats(self):
+        return {
+            "hits" : self.hits,
+            "misses" : self.misses,
+            "stale" : self.stale,
+            "lists_stored" : self.lists_stored,
+            "papers" : self.connection.execute("SELECT COUNT(*) FROM papers").fetchone()[0],
+            "edges" : self.connection.execute("SELECT COUNT(*) FROM edges").fetchone()[0]
+        }
+
+    def __str__(self):
+        return "[ citation graph : {0}, hits : {1}, misses : {2}, lists stored : {3}]".format(self.file_name, self.hits, self.misses, self.lists_stored)
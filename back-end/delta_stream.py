@@ -0,0 +1,53 @@
+import json
+
+class GraphDeltaStream:
+    """ Streams the network to the client while it is being built.
+    Nodes and links keep the index they have in the PaperStore, and are sent
+    once in "add_nodes" / "add_links" messages; the final link weights follow in
+    an "update_weights" message ordered by link index. Without a send function
+    nothing is sent. """
+
+    def __init__(self, send = None):
+        self.send = send
+        self.nodes_sent = 0
+        self.links_sent = 0
+
+    def flush(self, known_papers, phase = None):
+        # send the papers and relations of the store not streamed yet
+        if self.send is None: return
+        if len(known_papers) > self.nodes_sent:
+            nodes = []
+            for index in range(self.nodes_sent, len(known_papers)):
+                node = known_papers[known_papers.ids[index]].to_dict()
+                node["index"] = index
+                nodes.append(node)
+            self.send(json.dumps({ "type" : "add_nodes", "phase" : phase, "first_index" : self.nodes_sent, "nodes" : nodes }))
+            self.nodes_sent = len(known_papers)
+        if known_papers.relations_count > self.links_sent:
+            links = list(map(lambda link : { "source" : link[0], "target" : link[1] }, known_papers.relations(self.links_sent)))
+            self.send(json.dumps({ "type" : "add_links", "phase" : phase, "first_index" : self.links_sent, "links" : links }))
+            self.links_sent = known_papers.relations_count
+
+    def update_weights(self, weights, phase = None):
+        # weights : one weight per link, in link index order
+        if self.send is None: return
+        self.send(json.dumps({ "type" : "update_weights", "phase" : phase, "weights" : list(weights) }))
+
+    def update_positions(self, nodes, phase = None):
+        # nodes : the final nodes with their x and y, in node index order
+        if self.send is None: return
+        self.send(json.dumps({ "type" : "update_positions", "phase" : phase, "x" : list(map(lambda node : node["x"], nodes)), "y" : list(map(lambda node : node["y"], nodes)) }))
+
+    def update_communities(self, communities, phase = None):
+        # communities : community of every node, in node index order
+        if self.send is None: return
+        self.send(json.dumps({ "type" : "update_communities", "phase" : phase, "communities" : communities }))
+
+    def keep_links(self, kept, phase = None):
+        # kept : indexes of the links the client should keep, the others are dropped
+        if self.send is None: return
+        self.send(json.dumps({ "type" : "keep_links", "phase" : phase, "links" : kept }))
+
+    def done(self, phase = None):
+        if self.send is None: return
+        self.send(json.dumps({ "type" : "done", "phase" : phase, "nodes_count" : self.nodes_sent, "links_count" : self.links_sent }))
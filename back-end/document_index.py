@@ -0,0 +1,68 @@
+from array import array
+from internal_types import StringTable
+
+class DocumentIndex:
+    """ Sparse document x term index, updated as documents stream in.
+    Words are interned in a vocabulary that several indexes may share (titles and
+    abstracts for instance). Each document keeps only the terms it contains, with
+    their counts, so memory grows with the number of tokens; document frequencies
+    count every document once, even when it is indexed again. """
+
+    def __init__(self, vocabulary = None):
+        self.vocabulary = vocabulary if vocabulary is not None else StringTable()
+        self.documents = dict()                 # document key -> (term ids, counts)
+        self.lengths = dict()                   # document key -> number of tokens
+        self.document_frequency = array('i')    # term id -> number of documents containing it
+
+    def add_document(self, key, words):
+        # (re)index a document from its list of words, returns False if it had the same words already
+        term_ids = dict()
+        for word in words:
+            term_id = self.vocabulary.intern(word)
+            term_ids[term_id] = term_ids.get(term_id, 0) + 1
+        if key in self.documents:
+            (old_terms, old_counts) = self.documents[key]
+            if dict(zip(old_terms, old_counts)) == term_ids: return False
+            for term_id in old_terms: self.document_frequency[term_id] -= 1
+        if len(self.document_frequency) < len(self.vocabulary):
+            self.document_frequency.extend([0] * (len(self.vocabulary) - len(self.document_frequency)))
+        for term_id in term_ids: self.document_frequency[term_id] += 1
+        self.documents[key] = (array('i', term_ids.keys()), array('i', term_ids.values()))
+        self.lengths[key] = len(words)
+        return True
+
+    def __contains__(self, key):
+        return key in self.documents
+
+    def __len__(self):
+        return len(self.documents)
+
+    def words(self, key):
+        # distinct words of one document
+        if not key in self.documents: return []
+        return list(map(self.vocabulary.__getitem__, self.documents[key][0]))
+
+    def term_counts(self, key):
+        # { word : count } for one document
+        if not key in self.documents: return dict()
+        (terms, counts) = self.documents[key]
+        return dict(zip(map(self.vocabulary.__getitem__, terms), counts))
+
+    def term_frequencies(self, key):
+        # { word : count / number of tokens } for one document
+        length = self.lengths.get(key, 0)
+        if length == 0: return dict()
+        return dict(map(lambda item : (item[0], item[1] / length), self.term_counts(key).items()))
+
+    def frequency(self, word):
+        # number of documents containing the word
+        term_id = self.vocabulary.indexes.get(word)
+        if (term_id is None) or (term_id >= len(self.document_frequency)): return 0
+        return self.document_frequency[term_id]
+
+    def document_frequencies(self):
+        # { word : number of documents containing it } for the words of this index
+        return dict((self.vocabulary[term_id], count) for (term_id, count) in enumerate(self.document_frequency) if count > 0)
+
+    def tokens_count(self):
+        return sum(map(lambda document : len(document[0]), self.documents.values()))
@@ -0,0 +1,199 @@
+import os
+import time
+import gzip
+import json
+import random
+import asyncio
+import argparse
+import re
+from urllib.parse import urlsplit, unquote, parse_qsl, urlencode
+from aiohttp import web
+
+# Fixture archive : gzipped JSON lines, { "key" : request key, "response" : JSON response }
+# Keys are relative to the endpoint, so fixtures recorded against Europe PMC are
+# replayed by a stand-in server listening anywhere.
+#   record : RECORD_FIXTURES=True and FIXTURES_FILE=... in server.conf
+#   replay : python epmc_replay.py fixtures/epmc_fixtures.jsonl.gz --port 8765 [--latency 0.05 --jitter 0.02 --error-rate 0.01 --requests-per-second 50]
+#            then epmc_endpoint=http://127.0.0.1:8765/ in server.conf
+
+def fixture_key(relative_url):
+    # the same key whichever way the client quoted the URL or ordered its parameters
+    parts = urlsplit(relative_url)
+    path = unquote(parts.path).lstrip("/")
+    query = sorted(parse_qsl(parts.query, keep_blank_values = True))
+    return path + ("?" + urlencode(query) if len(query) > 0 else "")
+
+# batched lookups of papers by id, as sent for the abstracts
+ID_BATCH_QUERY = re.compile(r"^\((EXT_ID:[^ ()]+( OR EXT_ID:[^ ()]+)*)\)( AND SRC:(\w+))?$")
+
+def load_fixtures(file_name):
+    # { key : JSON response } ; an archive written in several runs may repeat keys, the last one wins
+    fixtures = dict()
+    with gzip.open(file_name, 'rt', encoding = 'utf-8') as fixtures_file:
+        for line in fixtures_file:
+            if len(line.strip()) == 0: continue
+            fixture = json.loads(line)
+            fixtures[fixture["key"]] = fixture["response"]
+    return fixtures
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+class FixtureRecorder:
+    """ Appends every response received from the endpoint to a fixture archive.
+    A response already in the archive is not written again. Each commit
+    appends one gzip member, so the archive stays readable if the server
+    stops between two builds. """
+
+    def __init__(self, file_name, endpoint):
+        directory = os.path.dirname(file_name)
+        if (len(directory) > 0) and (not os.path.isdir(directory)): os.makedirs(directory)
+        self.file_name = file_name
+        self.endpoint = endpoint
+        self.keys = set(load_fixtures(file_name)) if os.path.isfile(file_name) else set()
+        self.pending = []
+        self.recorded = 0
+
+    def record(self, url, JSON_resp):
+        if not url.startswith(self.endpoint): return
+        key = fixture_key(url[len(self.endpoint):])
+        if key in self.keys: return
+        self.keys.add(key)
+        self.pending.append(json.dumps({ "key" : key, "response" : JSON_resp }, separators = (',', ':')))
+
+    def commit(self):
+        if len(self.pending) == 0: return
+        with gzip.open(self.file_name, 'at', encoding = 'utf-8') as fixtures_file:
+            fixtures_file.write("\n".join(self.pending) + "\n")
+        self.recorded += len(self.pending)
+        self.pending = []
+
+    def __str__(self):
+        return "[ fixture recorder : {0}, {1} response(s) recorded, {2} known]".format(self.file_name, self.recorded, len(self.keys))
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+class ReplayServer:
+    """ Stand-in for the Europe PMC REST API answering from a fixture archive.
+    Each answer is delayed by latency +/- jitter seconds. A share error_rate of
+    the requests fails with HTTP 503, and requests above requests_per_second
+    (token bucket of one second) are refused with HTTP 429, as a loaded API
+    would. Unknown requests get HTTP 404. The random draws are seeded, so a
+    sequence of requests gets the same delays and errors on every run. """
+
+    def __init__(self, fixtures, latency = 0.0, jitter = 0.0, error_rate = 0.0, requests_per_second = 0.0, seed = 0):
+        # fixtures : { key : JSON response } as returned by load_fixtures
+        if (jitter < 0) or (jitter > latency) or not (0 <= error_rate < 1) or (requests_per_second < 0):
+            raise ValueError("replay : expected latency >= jitter >= 0, 0 <= error_rate < 1 and requests_per_second >= 0, found ({0}, {1}, {2}, {3})".format(latency, jitter, error_rate, requests_per_second))
+        self.fixtures = fixtures
+        self.papers = self.index_papers(fixtures)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests_per_second = requests_per_second
+        self.random = random.Random(seed)
+        self.tokens = requests_per_second
+        self.last_refill = time.monotonic()
+        self.runner = None
+        # counters
+        self.served = 0
+        self.missing = 0
+        self.errors = 0
+        self.throttled = 0
+        self.bytes_sent = 0
+
+    def index_papers(self, fixtures):
+        # { id : { src : core result } } of every paper found in a recorded search
+        papers = dict()
+        for key in fixtures:
+            if key.startswith("search?") and ("resulttype=core" in key) and ("resultList" in fixtures[key]):
+                for paper in fixtures[key]["resultList"]["result"]:
+                    if ("id" in paper) and ("source" in paper): papers.setdefault(str(paper["id"]), dict())[str(paper["source"])] = paper
+        return papers
+
+    def answer_id_batch(self, key):
+        # the papers of a batch depend on the timing of the build : a batch never
+        # recorded as such is answered from the papers recorded in other batches
+        parameters = dict(parse_qsl(urlsplit(key).query))
+        match = ID_BATCH_QUERY.match(parameters.get("query", ""))
+        if (not urlsplit(key).path == "search") or (parameters.get("resulttype") != "core") or (match is None): return None
+        ids = [term[len("EXT_ID:"):] for term in match.group(1).split(" OR ")]
+        results = []
+        for id in ids:
+            for (src, paper) in self.papers.get(id, dict()).items():
+                if (match.group(4) is None) or (src == match.group(4)): results.append(paper)
+        (page, page_size) = int(parameters.get("page", 1)), int(parameters.get("pageSize", 25))
+        return { "hitCount" : len(results), "request" : { "query" : parameters["query"], "page" : page, "pageSize" : page_size }, "resultList" : { "result" : results[(page - 1) * page_size:page * page_size] } }
+
+    def make_app(self):
+        app = web.Application()
+        app.router.add_route("GET", "/{tail:.*}", self.handle)
+        return app
+
+    def take_token(self):
+        if self.requests_per_second <= 0: return True
+        now = time.monotonic()
+        self.tokens = min(self.requests_per_second, self.tokens + (now - self.last_refill) * self.requests_per_second)
+        self.last_refill = now
+        if self.tokens < 1: return False
+        self.tokens -= 1
+        return True
+
+    async def handle(self, request):
+        if not self.take_token():
+            self.throttled += 1
+            return web.json_response({ "errCode" : 429, "errMsg" : "too many requests" }, status = 429)
+        # draws made before waiting : they follow the order of arrival
+        delay = self.latency + self.random.uniform(-self.jitter, self.jitter)
+        fails = self.random.random() < self.error_rate
+        if delay > 0: await asyncio.sleep(delay)
+        if fails:
+            self.errors += 1
+            return web.json_response({ "errCode" : 503, "errMsg" : "injected error" }, status = 503)
+        key = fixture_key(str(request.rel_url))
+        JSON_resp = self.fixtures[key] if key in self.fixtures else self.answer_id_batch(key)
+        if JSON_resp is None:
+            self.missing += 1
+            return web.json_response({ "errCode" : 404, "errMsg" : "no fixture for " + key }, status = 404)
+        body = json.dumps(JSON_resp)
+        self.served += 1
+        self.bytes_sent += len(body)
+        return web.Response(text = body, content_type = "application/json")
+
+    async def start(self, host = "127.0.0.1", port = 8765):
+        self.runner = web.AppRunner(self.make_app())
+        await self.runner.setup()
+        await web.TCPSite(self.runner, host, port).start()
+        return "http://{0}:{1}/".format(host, port)
+
+    async def stop(self):
+        if self.runner is not None: await self.runner.cleanup()
+        self.runner = None
+
+    def stats(self):
+        return { "fixtures" : len(self.fixtures), "served" : self.served, "missing" : self.missing, "errors" : self.errors, "throttled" : self.throttled, "bytes_sent" : self.bytes_sent }
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = "Replay recorded Europe PMC responses")
+    parser.add_argument("fixtures", help = "fixture archive written in record mode")
+    parser.add_argument("--host", default = "127.0.0.1")
+    parser.add_argument("--port", type = int, default = 8765)
+    parser.add_argument("--latency", type = float, default = 0.0, help = "seconds added to every answer")
+    parser.add_argument("--jitter", type = float, default = 0.0, help = "latency varies by up to +/- jitter seconds")
+    parser.add_argument("--error-rate", type = float, default = 0.0, help = "share of requests failing with HTTP 503")
+    parser.add_argument("--requests-per-second", type = float, default = 0.0, help = "requests above this rate get HTTP 429, 0 for no limit")
+    parser.add_argument("--seed", type = int, default = 0)
+    args = parser.parse_args()
+    replay_server = ReplayServer(load_fixtures(args.fixtures), latency = args.latency, jitter = args.jitter, error_rate = args.error_rate, requests_per_second = args.requests_per_second, seed = args.seed)
+    loop = asyncio.get_event_loop()
+    endpoint = loop.run_until_complete(replay_server.start(args.host, args.port))
+    print("Replaying {0} fixture(s) at {1}".format(len(replay_server.fixtures), endpoint))
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        loop.run_until_complete(replay_server.stop())
+        print(replay_server.stats())
+        loop.close()
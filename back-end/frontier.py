@@ -0,0 +1,93 @@
+import heapq
+
+# Orders in which the crawl expands the papers it knows about
+#   discovery  : as they were found (the previous behaviour)
+#   citedCount : most cited first, they tend to have the longest reference lists
+#   relevance  : closest to the seed first (scores given with set_scores)
+#   inDegree   : most referenced by the papers already known first
+#   recency    : most recent first
+STRATEGIES = ["discovery", "citedCount", "relevance", "inDegree", "recency"]
+
+# { strategy : { phase : requests, papers found and papers expanded } }, over every build of the server
+strategies_stats = dict()
+
+class Frontier:
+    """ Papers left to expand, in a heap keyed by the score of the strategy.
+    Scores that grow while the crawl goes on (the in-degree) are refreshed
+    lazily : a paper whose score changed since it was pushed is pushed again
+    with its new score instead of being expanded. Scores given with set_scores
+    replace the previous ones and re-key the whole heap. """
+
+    def __init__(self, known_papers, strategy = "discovery", scores = None, phase = None):
+        if not strategy in STRATEGIES:
+            raise ValueError("strategy : expected one of {0}, found {1}".format(STRATEGIES, strategy))
+        self.known_papers = known_papers
+        self.strategy = strategy
+        self.phase = phase
+        self.scores = dict(scores) if scores is not None else dict()
+        self.heap = []                  # (-score, store index, paper id)
+        self.queued = set()
+        self.expanded = set()
+        self.papers_expanded = 0
+        self.requests_count = 0
+        self.papers_found = 0
+
+    def score(self, paper_id):
+        index = self.known_papers.index(paper_id)
+        if self.strategy == "citedCount": return self.known_papers.citedCount[index]
+        if self.strategy == "relevance": return self.scores.get(paper_id, 0.0)
+        if self.strategy == "inDegree": return self.known_papers.in_degree[index]
+        if self.strategy == "recency": return self.known_papers.pubYear[index]
+        return -index
+
+    def push(self, paper_id):
+        if (paper_id in self.queued) or (paper_id in self.expanded): return
+        self.queued.add(paper_id)
+        heapq.heappush(self.heap, (-self.score(paper_id), self.known_papers.index(paper_id), paper_id))
+
+    def push_all(self, papers_ids):
+        for paper_id in papers_ids: self.push(paper_id)
+
+    def set_scores(self, scores):
+        self.scores = dict(scores)
+        self.heap = list(map(lambda entry : (-self.score(entry[2]), entry[1], entry[2]), self.heap))
+        heapq.heapify(self.heap)
+
+    def pop(self, count, skip = ()):
+        # the count best papers, as (src, id) tuples ; papers in skip are dropped
+        papers = []
+        while (len(papers) < count) and (len(self.heap) > 0):
+            (score, index, paper_id) = heapq.heappop(self.heap)
+            if paper_id in skip:
+                self.queued.discard(paper_id)
+                continue
+            if -score != self.score(paper_id):
+                heapq.heappush(self.heap, (-self.score(paper_id), index, paper_id))
+                continue
+            self.queued.discard(paper_id)
+            self.expanded.add(paper_id)
+            papers.append((self.known_papers[paper_id].src, paper_id))
+        return papers
+
+    def __len__(self):
+        return len(self.heap)
+
+    def record(self, papers_expanded, requests_count, papers_found = 0):
+        # requests spent expanding papers, and the new papers they brought
+        self.papers_expanded += papers_expanded
+        self.requests_count += requests_count
+        self.papers_found += papers_found
+        stats = strategies_stats.setdefault(self.strategy, dict()).setdefault(self.phase, { "papers_expanded" : 0, "requests" : 0, "papers_found" : 0 })
+        stats["papers_expanded"] += papers_expanded
+        stats["requests"] += requests_count
+        stats["papers_found"] += papers_found
+
+    def report(self):
+        return {
+            "strategy" : self.strategy,
+            "phase" : self.phase,
+            "papers_expanded" : self.papers_expanded,
+            "requests" : self.requests_count,
+            "papers_found" : self.papers_found,
+            "papers_per_request" : (self.papers_found / self.requests_count) if self.requests_count > 0 else 0.0
+        }
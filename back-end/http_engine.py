@@ -0,0 +1,59 @@
+import json
+import aiohttp
+
+class HttpEngine:
+    """ Asynchronous HTTP client shared by every build of the server.
+    It owns one pooled keep-alive session, opened lazily on the running loop,
+    so that concurrent builds reuse the same connections to Europe PMC. """
+
+    def __init__(self, max_connections = 100, max_connections_per_host = 50, keepalive_timeout = 30, request_timeout = 60):
+        if (not isinstance(max_connections, int)) or (not isinstance(max_connections_per_host, int)):
+            raise TypeError("(max_connections, max_connections_per_host) : (int, int) expected, (%s, %s) found" % (type(max_connections).__name__, type(max_connections_per_host).__name__))
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.request_timeout = request_timeout
+        self.session = None
+        self.requests_count = 0
+        self.bytes_received = 0
+
+    def get_session(self):
+        if (self.session is None) or self.session.closed:
+            connector = aiohttp.TCPConnector(limit = self.max_connections, limit_per_host = self.max_connections_per_host, keepalive_timeout = self.keepalive_timeout)
+            timeout = aiohttp.ClientTimeout(total = self.request_timeout)
+            self.session = aiohttp.ClientSession(connector = connector, timeout = timeout)
+        return self.session
+
+    async def fetch_json(self, url):
+        # raises on network errors, HTTP errors and non JSON bodies
+        return (await self.fetch_json_sized(url))[0]
+
+    async def fetch_json_sized(self, url):
+        # (JSON response, size of the body received)
+        self.requests_count += 1
+        async with self.get_session().get(url) as http_response:
+            http_response.raise_for_status()
+            body = await http_response.read()
+            self.bytes_received += len(body)
+            return (json.loads(body.decode("utf-8")), len(body))
+
+    async def fetch_json_records(self, url, parser):
+        # (JSON response, size of the body received), the body goes through parser
+        # (json_stream.JSONRecordStream) as it arrives instead of being kept whole
+        self.requests_count += 1
+        size = 0
+        async with self.get_session().get(url) as http_response:
+            http_response.raise_for_status()
+            async for chunk in http_response.content.iter_any():
+                size += len(chunk)
+                self.bytes_received += len(chunk)
+                parser.feed(chunk)
+            return (parser.close(), size)
+
+    async def close(self):
+        if (self.session is not None) and (not self.session.closed):
+            await self.session.close()
+        self.session = None
+
+    def __str__(self):
+        return "[ http engine : {0} connection(s) max, {1} request(s), {2} bytes received]".format(self.max_connections, self.requests_count, self.bytes_received)
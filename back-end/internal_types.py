@@ -1,4 +1,5 @@
 import json
+from array import array
 
 class LtdPaperDetails:
     """  """
@@ -126,3 +127,177 @@ class LtdPaperDetails:
         }
         for author in self.authors: d["authors"].append(author)
         return d
+
+
+class QueryResponses(list):
+    """ JSON responses of a set of queries, along with the URLs that were abandoned
+    after exhausting their retries (url -> last error) and the number of requests
+    sent over the network for them (retries included, cache hits excluded). """
+
+    def __init__(self, responses = [], abandoned = {}, requests_count = 0):
+        list.__init__(self, responses)
+        self.abandoned = dict(abandoned)
+        self.requests_count = requests_count
+
+    def merge(self, other):
+        self.extend(other)
+        self.abandoned.update(other.abandoned)
+        self.requests_count += other.requests_count
+
+
+def ascii_text(text):
+    # same result as text.encode('ascii', 'replace').decode(), without the round trip for ascii text
+    return text if text.isascii() else text.encode('ascii', 'replace').decode("utf-8")
+
+
+class StringTable:
+    """ Interned strings : each distinct string is stored once and referred to by its index. """
+
+    def __init__(self):
+        self.strings = []
+        self.indexes = dict()
+
+    def intern(self, string):
+        index = self.indexes.get(string)
+        if index is None:
+            index = len(self.strings)
+            self.indexes[string] = index
+            self.strings.append(string)
+        return index
+
+    def __getitem__(self, index):
+        return self.strings[index]
+
+    def __len__(self):
+        return len(self.strings)
+
+
+class PaperView:
+    """ Read access to one paper of a PaperStore, with the fields of LtdPaperDetails. """
+    __slots__ = ("store", "index")
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    id = property(lambda self : self.store.ids[self.index])
+    src = property(lambda self : self.store.sources[self.store.src[self.index]])
+    title = property(lambda self : self.store.titles[self.store.title[self.index]])
+    pubYear = property(lambda self : self.store.pubYear[self.index])
+    citedCount = property(lambda self : self.store.citedCount[self.index])
+    abstract = property(lambda self : self.store.abstracts.get(self.index, ""))
+
+    def _get_authors_(self):
+        store = self.store
+        return [store.authors[a] for a in store.authors_ids[store.authors_offsets[self.index]:store.authors_offsets[self.index + 1]]]
+
+    authors = property(_get_authors_)
+
+    def __str__(self):
+        return "[ id : {0}, title : {1}, year : {2}, citations {3}]".format(self.id, self.title, str(self.pubYear), str(self.citedCount))
+
+    def to_dict(self):
+        return {
+            "id" : self.id,
+            "src" : self.src,
+            "title" : self.title,
+            "authors" : self.authors,
+            "pubYear" : self.pubYear,
+            "citedCount" : self.citedCount,
+            "abstract" : self.abstract
+        }
+
+
+class PaperStore:
+    """ Compact store of the papers and relations known by a build.
+    Papers get dense integer indexes in discovery order; scalar fields live in typed
+    arrays, titles, sources and authors are interned, and relations form an
+    append-only edge list (citing index, cited index) with live counters.
+    Indexing the store by paper id gives a PaperView. """
+
+    def __init__(self):
+        self.indexes = dict()                # paper id -> index
+        self.ids = []                        # index -> paper id
+        self.src = array('i')                # index -> source (in self.sources)
+        self.title = array('i')              # index -> title (in self.titles)
+        self.pubYear = array('i')
+        self.citedCount = array('i')
+        self.authors_offsets = array('i', [0])
+        self.authors_ids = array('i')        # authors of paper i : authors_ids[authors_offsets[i]:authors_offsets[i + 1]]
+        self.abstracts = dict()              # index -> abstract, only for papers that have one
+        self.sources = StringTable()
+        self.titles = StringTable()
+        self.authors = StringTable()
+        # relations
+        self.citing = array('i')             # relation -> index of the citing paper
+        self.cited = array('i')              # relation -> index of the cited paper
+        self.relations_keys = set()          # citing * 2^32 + cited, to ignore duplicates
+        self.out_degree = array('i')         # index -> number of references known
+        self.in_degree = array('i')          # index -> number of citations known
+
+    # --- --- --- --- --- --- --- ---
+
+    def add_paper(self, id, src, title, authors, pubYear, citedCount, abstract = ""):
+        # returns the index of the paper, the first details seen for an id are kept
+        index = self.indexes.get(id)
+        if index is not None: return index
+        index = len(self.ids)
+        self.indexes[id] = index
+        self.ids.append(id)
+        self.src.append(self.sources.intern(ascii_text(src)))
+        self.title.append(self.titles.intern(ascii_text(title)))
+        self.pubYear.append(pubYear)
+        self.citedCount.append(citedCount)
+        for author in authors: self.authors_ids.append(self.authors.intern(author))
+        self.authors_offsets.append(len(self.authors_ids))
+        if len(abstract) > 0: self.abstracts[index] = ascii_text(abstract)
+        self.out_degree.append(0)
+        self.in_degree.append(0)
+        return index
+
+    def add_details(self, paper):
+        # paper : LtdPaperDetails
+        return self.add_paper(paper.id, paper.src, paper.title, paper.authors, paper.pubYear, paper.citedCount, paper.abstract)
+
+    def set_abstract(self, id, abstract):
+        self.abstracts[self.indexes[id]] = ascii_text(abstract)
+
+    def add_relation(self, citing_id, cited_id):
+        # returns True if the relation was not known yet
+        (citing, cited) = self.indexes[citing_id], self.indexes[cited_id]
+        key = (citing << 32) | cited
+        if key in self.relations_keys: return False
+        self.relations_keys.add(key)
+        self.citing.append(citing)
+        self.cited.append(cited)
+        self.out_degree[citing] += 1
+        self.in_degree[cited] += 1
+        return True
+
+    def has_relation(self, citing_id, cited_id):
+        return ((self.indexes[citing_id] << 32) | self.indexes[cited_id]) in self.relations_keys
+
+    # --- --- --- --- --- --- --- ---
+
+    @property
+    def relations_count(self):
+        return len(self.citing)
+
+    def relations(self, start = 0):
+        # (citing index, cited index) of the relations, in discovery order
+        return zip(self.citing[start:], self.cited[start:])
+
+    def index(self, id):
+        return self.indexes[id]
+
+    def __getitem__(self, id):
+        return PaperView(self, self.indexes[id])
+
+    def __contains__(self, id):
+        return id in self.indexes
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids)
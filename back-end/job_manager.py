@@ -0,0 +1,176 @@
+import asyncio
+import json
+import uuid
+from collections import deque
+
+class Job:
+    """ One network build, shared by every client that asked for it.
+    The build sends its messages to the job, which forwards them to its
+    subscribers and keeps them, so a client joining a running build first
+    receives everything it missed. """
+
+    def __init__(self, key, request):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.request = request
+        self.status = "queued"
+        self.subscribers = []
+        self.messages = []              # (payload, is binary) sent so far
+        self.task = None
+        self.started = False
+
+    def subscribe(self, client):
+        # client : object with send(text) and send_binary(bytes)
+        if client in self.subscribers: return
+        for (payload, is_binary) in self.messages:
+            if is_binary: client.send_binary(payload)
+            else: client.send(payload)
+        self.subscribers.append(client)
+
+    def unsubscribe(self, client):
+        if client in self.subscribers: self.subscribers.remove(client)
+
+    def send(self, message):
+        self.messages.append((message, False))
+        for client in list(self.subscribers): client.send(message)
+
+    def send_binary(self, data):
+        self.messages.append((data, True))
+        for client in list(self.subscribers): client.send_binary(data)
+
+    def set_status(self, status, **details):
+        self.status = status
+        message = { "type" : "job", "job_id" : self.id, "status" : status }
+        message.update(details)
+        self.send(json.dumps(message))
+
+    def __repr__(self):
+        return "job {0} ({1}, {2} subscriber(s))".format(self.id, self.status, len(self.subscribers))
+
+
+class JobManager:
+    """ Runs the builds requested by the clients, at most max_running at a time.
+    Identical requests in flight share one job. A job whose last subscriber
+    leaves is cancelled. When max_running jobs run and max_queued wait,
+    new requests are refused. """
+
+    def __init__(self, max_running = 4, max_queued = 16):
+        if (max_running < 1) or (max_queued < 0):
+            raise ValueError("jobs : expected max_running > 0 and max_queued >= 0, found ({0}, {1})".format(max_running, max_queued))
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self.jobs = dict()              # job id -> job queued or running
+        self.keys = dict()              # request key -> job queued or running
+        self.running = 0
+        self.queued = 0
+        self.waiters = deque()          # (future, job) of the jobs waiting for a worker
+        # counters
+        self.submitted = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self.failed = 0
+        self.completed = 0
+
+    def configure(self, max_running, max_queued):
+        self.max_running = max(1, max_running)
+        self.max_queued = max(0, max_queued)
+
+    # --- --- --- --- --- --- --- ---
+
+    def submit(self, key, request, client, build):
+        # build : coroutine function running the request, sending its messages to the job given
+        job = self.keys.get(key)
+        if job is not None:
+            self.coalesced += 1
+            job.subscribe(client)
+            client.send(json.dumps({ "type" : "job", "job_id" : job.id, "status" : job.status, "coalesced" : True }))
+            return job
+        if (self.running >= self.max_running) and (self.queued >= self.max_queued):
+            self.rejected += 1
+            raise ValueError("server busy : {0} build(s) running and {1} waiting, try again later".format(self.running, self.queued))
+        self.submitted += 1
+        job = Job(key, request)
+        self.jobs[job.id] = job
+        self.keys[key] = job
+        job.subscribe(client)
+        job.set_status("queued", position = self.queued)
+        self.queued += 1
+        if self.running < self.max_running: self._start_(job)
+        job.task = asyncio.ensure_future(self._run_(job, build))
+        job.task.add_done_callback(lambda task : self._done_(job, task))
+        return job
+
+    def cancel(self, job_id, client = None):
+        # cancel for one client (the job goes on for the others), or for everyone
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise ValueError("cancel : no running job {0}".format(job_id))
+        if client is not None:
+            if not client in job.subscribers:
+                raise ValueError("cancel : not subscribed to job {0}".format(job_id))
+            job.unsubscribe(client)
+            client.send(json.dumps({ "type" : "job", "job_id" : job.id, "status" : "cancelled" }))
+            if len(job.subscribers) > 0: return job
+        job.task.cancel()
+        return job
+
+    def disconnect(self, client):
+        # a client left : its jobs are cancelled unless someone else waits for them
+        for job in list(self.jobs.values()):
+            if client in job.subscribers:
+                job.unsubscribe(client)
+                if len(job.subscribers) == 0: job.task.cancel()
+
+    # --- --- --- --- --- --- --- ---
+
+    async def _run_(self, job, build):
+        if not job.started:
+            # wait for a worker, _release_ hands it over
+            waiter = asyncio.get_event_loop().create_future()
+            self.waiters.append((waiter, job))
+            await waiter
+        job.set_status("running")
+        await build(job)
+
+    def _start_(self, job):
+        self.queued -= 1
+        self.running += 1
+        job.started = True
+
+    def _release_(self):
+        # the worker of a finished job goes to the next job waiting, if any
+        self.running -= 1
+        while (len(self.waiters) > 0) and (self.running < self.max_running):
+            (waiter, job) = self.waiters.popleft()
+            if not waiter.done():
+                self._start_(job)
+                waiter.set_result(None)
+
+    def _done_(self, job, task):
+        del self.jobs[job.id]
+        del self.keys[job.key]
+        if job.started: self._release_()
+        else: self.queued -= 1
+        if task.cancelled():
+            self.cancelled += 1
+            job.set_status("cancelled")
+        elif task.exception() is not None:
+            self.failed += 1
+            job.send(json.dumps({ "type" : "error", "job_id" : job.id, "message" : str(task.exception()) }))
+            job.set_status("failed")
+        else:
+            self.completed += 1
+            job.set_status("done")
+
+    def stats(self):
+        return {
+            "running" : self.running,
+            "queued" : self.queued,
+            "submitted" : self.submitted,
+            "coalesced" : self.coalesced,
+            "rejected" : self.rejected,
+            "cancelled" : self.cancelled,
+            "failed" : self.failed,
+            "completed" : self.completed
+        }
@@ -0,0 +1,201 @@
+import re
+import json
+import codecs
+
+decoder = json.JSONDecoder()
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+SEPARATOR = re.compile(r"[ \t\n\r]*,[ \t\n\r]*")
+NUMBER_TAIL = ".eE+-"               # what a number cut by the end of a chunk may stop before
+# bytes gathered before they are parsed : the item cut at the end of the text is
+# scanned again with the next chunk, which small network reads would make costly
+MIN_CHUNK_SIZE = 64 * 1024
+
+class Container:
+    """ An object or array of the document being parsed, with where the parser is in it. """
+
+    def __init__(self, path, value, state):
+        self.path = path                # object keys from the root, "*" for array items
+        self.value = value              # the dict or list being filled
+        self.state = state
+        self.key = None                 # key of the value being parsed, objects only
+
+
+class JSONRecordStream:
+    """ Incremental parser of a JSON document received in chunks. The arrays at
+    `record_paths` are never built whole : each of their items is parsed as
+    soon as it is complete and replaced by what the reduce function of its
+    path returns (dropped if None). Everything else is parsed as usual, and
+    close() returns the document. A path is a tuple of object keys, "*"
+    standing for every item of an array. """
+
+    def __init__(self, record_paths, reduce = True):
+        # record_paths : { path : function(item) }, reduce False keeps the items as they are
+        self.record_paths = record_paths
+        self.prefixes = set(path[:length] for path in record_paths for length in range(len(path) + 1))
+        self.reduce = reduce
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.position = 0
+        self.stack = []
+        self.document = None
+        self.done = False
+        self.records = 0
+        self.pending = []               # chunks received and not parsed yet
+        self.pending_size = 0
+
+    def feed(self, data):
+        self.pending.append(data)
+        self.pending_size += len(data)
+        if self.pending_size < MIN_CHUNK_SIZE: return
+        self.text = self.text[self.position:] + self.text_decoder.decode(b"".join(self.pending))
+        (self.pending, self.pending_size) = ([], 0)
+        self.position = 0
+        self.parse(final = False)
+
+    def close(self):
+        self.text = self.text[self.position:] + self.text_decoder.decode(b"".join(self.pending), final = True)
+        (self.pending, self.pending_size) = ([], 0)
+        self.position = 0
+        self.parse(final = True)
+        if not self.done: raise ValueError("incomplete JSON document")
+        return self.document
+
+    # --- --- --- --- --- --- --- ---
+
+    def skip_whitespace(self):
+        self.position = WHITESPACE.match(self.text, self.position).end()
+        return self.position < len(self.text)
+
+    def decode(self, final):
+        # the value at the current position, None if it is not all there yet
+        try:
+            (value, end) = decoder.raw_decode(self.text, self.position)
+        except ValueError as error:
+            if final: raise ValueError("invalid JSON document : {0}".format(error))
+            return None
+        if cut_short(self.text, end) and not final: return None
+        self.position = end
+        return (value,)
+
+    def attach(self, value):
+        if len(self.stack) == 0:
+            self.document = value
+            return
+        parent = self.stack[-1]
+        if isinstance(parent.value, dict): parent.value[parent.key] = value
+        elif (parent.path in self.record_paths) and self.reduce:
+            value = self.record_paths[parent.path](value)
+            if value is not None: parent.value.append(value)
+        else: parent.value.append(value)
+
+    def start_value(self, path, final):
+        # True once the value is parsed, or its container opened
+        char = self.text[self.position]
+        if (path in self.prefixes) and (char in "{["):
+            container = Container(path, dict() if char == "{" else list(), "first")
+            self.attach(container.value)
+            self.stack.append(container)
+            self.position += 1
+            return True
+        decoded = self.decode(final)
+        if decoded is None: return False
+        if (len(self.stack) > 0) and (self.stack[-1].path in self.record_paths): self.records += 1
+        self.attach(decoded[0])
+        if len(self.stack) == 0: self.done = True
+        return True
+
+    def parse_records(self, container, final):
+        # the items of a record array one after the other, out of the state machine ; stops at
+        # anything else (end of the array, nested containers) : True if it moved on, None at an
+        # item not all there yet
+        (text, position, state) = (self.text, self.position, container.state)
+        reduce = self.record_paths[container.path] if self.reduce else None
+        nested = (container.path + ("*",)) in self.prefixes
+        incomplete = False
+        position = WHITESPACE.match(text, position).end()
+        if state == "next":
+            separator = SEPARATOR.match(text, position)
+            if separator is not None: (position, state) = (separator.end(), "value")
+        while (state != "next") and (position < len(text)) and not (nested and (text[position] in "{[")):
+            try:
+                (value, end) = decoder.scan_once(text, position)
+            except (StopIteration, ValueError):
+                # not all there yet, or invalid : the state machine tells once the text is whole
+                incomplete = not final
+                break
+            if cut_short(text, end) and not final:
+                incomplete = True
+                break
+            self.records += 1
+            # None from a reducer drops the item, a null item is kept as it is
+            if reduce is not None: value = reduce(value)
+            if (value is not None) or (reduce is None): container.value.append(value)
+            separator = SEPARATOR.match(text, end)
+            (position, state) = (end, "next") if separator is None else (separator.end(), "value")
+        moved = position > self.position
+        (self.position, container.state) = (position, state)
+        return None if incomplete else moved
+
+    def expect(self, char):
+        if self.text[self.position] != char:
+            raise ValueError("invalid JSON document : expected '{0}' at {1}, found '{2}'".format(char, self.position, self.text[self.position]))
+        self.position += 1
+
+    def parse(self, final):
+        # states : "first" right after the opening, "value" after a comma, "next" after a value, "colon" after a key
+        while self.skip_whitespace():
+            if self.done: raise ValueError("invalid JSON document : data after the end")
+            if len(self.stack) == 0:
+                if not self.start_value((), final): return
+                continue
+            container = self.stack[-1]
+            if (container.path in self.record_paths) and isinstance(container.value, list):
+                moved = self.parse_records(container, final)
+                if moved is None: return
+                if moved: continue
+            char = self.text[self.position]
+            closing = "}" if isinstance(container.value, dict) else "]"
+            if (container.state in ["first", "next"]) and (char == closing):
+                self.position += 1
+                self.stack.pop()
+                if len(self.stack) == 0: self.done = True
+                else: self.stack[-1].state = "next"
+            elif container.state == "next":
+                self.expect(",")
+                container.state = "value"
+            elif isinstance(container.value, dict) and (container.state in ["first", "value"]):
+                if char != '"': self.expect('"')
+                decoded = self.decode(final)
+                if decoded is None: return
+                container.key = decoded[0]
+                container.state = "colon"
+            elif container.state == "colon":
+                self.expect(":")
+                container.state = "key value"
+            else:
+                path = container.path + ((container.key,) if isinstance(container.value, dict) else ("*",))
+                if not self.start_value(path, final): return
+                if container is self.stack[-1]: container.state = "next"
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def cut_short(text, end):
+    # True when the value parsed up to end may go on in the next chunk : a number at the end
+    # of the text, or one whose fraction or exponent was cut ("1." parses as 1) ; in the
+    # middle of a whole text, these characters after a value are an error anyway
+    return (end == len(text)) or (text[end] in NUMBER_TAIL)
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def reduce_records(document, record_paths):
+    # the same reduction on a document parsed whole, e.g. a cached response
+    for (path, reduce) in record_paths.items(): reduce_at(document, path, reduce)
+    return document
+
+def reduce_at(value, path, reduce):
+    if len(path) == 0:
+        if isinstance(value, list): value[:] = [item for item in map(reduce, value) if item is not None]
+    elif path[0] == "*":
+        if isinstance(value, list):
+            for item in value: reduce_at(item, path[1:], reduce)
+    elif isinstance(value, dict) and (path[0] in value): reduce_at(value[path[0]], path[1:], reduce)
@@ -0,0 +1,135 @@
+import numpy as np
+
+# Force-directed layout (Fruchterman-Reingold) of a paper network, in units of the
+# ideal link length :
+#   repulsion between every two nodes          1 / distance
+#   attraction along every link                (LINK_FLOOR + weight) * distance ** 2
+#   gravity towards the origin                 GRAVITY * distance
+# The moves are capped by a temperature which cools down along the iterations.
+# Repulsion is computed with the Barnes-Hut approximation over a quadtree stored
+# as a pyramid of grids : a cell seen from a node under an angle smaller than
+# theta counts as one mass at its centre of mass. The tree is walked level by
+# level for all the (node, cell) pairs at once.
+
+LINK_FLOOR = 0.1            # links of weight 0 still hold their papers together
+GRAVITY = 0.05
+LEAF_SIZE = 2               # mean number of nodes in the cells of the last level
+MAX_DEPTH = 12
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def build_levels(positions, depth):
+    # per level : (cell of every node, mass, centre of mass of every cell, cell size, origin)
+    origin = positions.min(axis = 0)
+    size = max(float((positions.max(axis = 0) - origin).max()), 1e-9) * (1 + 1e-9)
+    side = 2 ** depth
+    leaf = np.minimum((positions - origin) / size * side, side - 1).astype(np.int64)
+    levels = []
+    for level in range(depth + 1):
+        (cells_x, cells_y) = (leaf[:, 0] >> (depth - level), leaf[:, 1] >> (depth - level))
+        cells = cells_y * (2 ** level) + cells_x
+        count = 4 ** level
+        mass = np.bincount(cells, minlength = count).astype(np.float64)
+        centres = np.stack([np.bincount(cells, positions[:, 0], count), np.bincount(cells, positions[:, 1], count)], axis = 1)
+        centres /= np.maximum(mass, 1)[:, None]
+        levels.append((cells, mass, centres, size / 2 ** level))
+    return levels
+
+def children(cells, level):
+    # the 4 cells of level + 1 in each cell of level, one row per cell
+    side = 2 ** level
+    (x, y) = (cells % side, cells // side)
+    return np.stack([(2 * y + dy) * (2 * side) + 2 * x + dx for dy in (0, 1) for dx in (0, 1)], axis = 1)
+
+def repulsion(positions, theta = 0.9):
+    # Barnes-Hut approximation of sum over j != i of (p_i - p_j) / |p_i - p_j| ** 2
+    nodes_count = len(positions)
+    forces = np.zeros_like(positions)
+    if nodes_count < 2: return forces
+    depth = int(min(MAX_DEPTH, max(0, np.ceil(np.log(nodes_count / LEAF_SIZE) / np.log(4)))))
+    levels = build_levels(positions, depth)
+    (nodes, cells) = (np.arange(nodes_count), np.zeros(nodes_count, dtype = np.int64))
+    for (level, (node_cells, mass, centres, cell_size)) in enumerate(levels):
+        keep = mass[cells] > 0
+        (nodes, cells) = (nodes[keep], cells[keep])
+        delta = positions[nodes] - centres[cells]
+        distance = np.sqrt((delta ** 2).sum(axis = 1))
+        # far enough, and not the cell of the node itself
+        far = (cell_size < theta * distance) & (node_cells[nodes] != cells)
+        pull = mass[cells[far]] / np.maximum(distance[far], 1e-9) ** 2
+        forces[:, 0] += np.bincount(nodes[far], delta[far, 0] * pull, nodes_count)
+        forces[:, 1] += np.bincount(nodes[far], delta[far, 1] * pull, nodes_count)
+        (nodes, cells) = (nodes[~far], cells[~far])
+        if level < depth:
+            cells = children(cells, level).ravel()
+            nodes = np.repeat(nodes, 4)
+    # the cells left at the last level : node by node
+    (leaf_cells, mass) = (levels[-1][0], levels[-1][1])
+    order = np.argsort(leaf_cells, kind = "stable")
+    starts = np.concatenate([[0], np.cumsum(mass).astype(np.int64)])[:-1]
+    counts = mass[cells].astype(np.int64)
+    pairs_nodes = np.repeat(nodes, counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    others = order[np.repeat(starts[cells], counts) + offsets]
+    keep = pairs_nodes != others
+    (pairs_nodes, others) = (pairs_nodes[keep], others[keep])
+    delta = positions[pairs_nodes] - positions[others]
+    squared = np.maximum((delta ** 2).sum(axis = 1), 1e-9)
+    forces[:, 0] += np.bincount(pairs_nodes, delta[:, 0] / squared, nodes_count)
+    forces[:, 1] += np.bincount(pairs_nodes, delta[:, 1] / squared, nodes_count)
+    return forces
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def initial_positions(nodes_count, sources, targets, known = None, seed = 0):
+    # known : positions of the first nodes (a network laid out before), the other
+    # nodes start next to their laid out neighbours, or at random without any
+    generator = np.random.default_rng(seed)
+    spread = np.sqrt(max(nodes_count, 1))
+    positions = generator.uniform(-spread / 2, spread / 2, (nodes_count, 2))
+    if (known is None) or (len(known) == 0): return positions
+    known = np.asarray(known, dtype = np.float64)[:nodes_count]
+    placed = np.zeros(nodes_count, dtype = bool)
+    (positions[:len(known)], placed[:len(known)]) = (known, True)
+    positions[len(known):] = known.mean(axis = 0) + positions[len(known):] / 2
+    # papers found from other new papers are placed once those are
+    for _ in range(8):
+        if placed.all(): break
+        sums = np.zeros((nodes_count, 2))
+        counts = np.zeros(nodes_count)
+        for (ends, others) in [(sources, targets), (targets, sources)]:
+            use = placed[others] & ~placed[ends]
+            np.add.at(sums, ends[use], positions[others[use]])
+            np.add.at(counts, ends[use], 1)
+        new = counts > 0
+        if not new.any(): break
+        positions[new] = sums[new] / counts[new][:, None] + generator.uniform(-0.5, 0.5, (int(new.sum()), 2))
+        placed |= new
+    return positions
+
+def force_layout(nodes_count, sources, targets, weights, known_positions = None, iterations = 100, theta = 0.9, seed = 0):
+    # (nodes_count, 2) positions ; sources, targets, weights : one per link, weights in [0, 1]
+    # a network laid out before (known_positions of its first nodes) starts from there and
+    # only cools down from a low temperature
+    sources = np.asarray(sources, dtype = np.int64)
+    targets = np.asarray(targets, dtype = np.int64)
+    strength = LINK_FLOOR + np.asarray(weights, dtype = np.float64)
+    positions = initial_positions(nodes_count, sources, targets, known_positions, seed)
+    if nodes_count < 2: return positions
+    warm = (known_positions is not None) and (len(known_positions) > 0)
+    temperature = 1.0 if warm else np.sqrt(nodes_count) / 4
+    for iteration in range(iterations):
+        forces = repulsion(positions, theta) - GRAVITY * positions
+        delta = positions[targets] - positions[sources]
+        pull = delta * (strength * np.sqrt((delta ** 2).sum(axis = 1)))[:, None]
+        for axis in (0, 1):
+            forces[:, axis] += np.bincount(sources, pull[:, axis], nodes_count) - np.bincount(targets, pull[:, axis], nodes_count)
+        # every move is capped by the temperature
+        length = np.maximum(np.sqrt((forces ** 2).sum(axis = 1)), 1e-9)
+        positions += forces * (np.minimum(length, temperature * (1 - iteration / iterations)) / length)[:, None]
+    return positions - positions.mean(axis = 0)
+
+def node_positions(nodes):
+    # positions saved with the nodes of a network, None if some node has none
+    if (len(nodes) == 0) or not all(("x" in node) and ("y" in node) for node in nodes): return None
+    return np.array([(node["x"], node["y"]) for node in nodes], dtype = np.float64)
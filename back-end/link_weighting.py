@@ -0,0 +1,71 @@
+import numpy as np
+from scipy import sparse
+
+# Weight of a link (paper1 -> paper2), as computed pair by pair before :
+#   sum over the title words shared by both papers of  papers_count / word_count[word]
+# + sum over the mined terms shared by both papers of  term_counts[paper2][term] / term_counts[paper1][term]
+# + same_author_weight for every (author of paper1, author of paper2) pair with the same name
+# Every term is a row-wise product of two sparse paper x item matrices, evaluated
+# for all the links at once.
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def incidence_matrix(papers_items, column_index):
+    # papers_items : one {item : value} dict per paper (row), items are interned in column_index
+    (rows, cols, values) = [], [], []
+    for (row, items) in enumerate(papers_items):
+        for item in items:
+            if not item in column_index: column_index[item] = len(column_index)
+            rows.append(row)
+            cols.append(column_index[item])
+            values.append(items[item])
+    return sparse.csr_matrix((np.array(values, dtype = np.float64), (np.array(rows, dtype = np.int64), np.array(cols, dtype = np.int64))), shape = (len(papers_items), len(column_index)))
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def rowwise_products(left, right, sources, targets):
+    # for every link e : sum_j left[sources[e], j] * right[targets[e], j]
+    if (len(sources) == 0) or (left.shape[1] == 0):
+        return np.zeros(len(sources), dtype = np.float64)
+    return np.asarray(left[sources].multiply(right[targets]).sum(axis = 1)).ravel()
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def compute_link_weights(links, titles_words, word_count, papers_count, papers_terms, papers_authors, same_author_weight = 1):
+    # links : list of (source index, target index)
+    # titles_words : one list of distinct normalized title words per paper
+    # papers_terms : one {term : count} dict per paper
+    # papers_authors : one list of authors per paper
+    sources = np.fromiter((link[0] for link in links), dtype = np.int64, count = len(links))
+    targets = np.fromiter((link[1] for link in links), dtype = np.int64, count = len(links))
+    # titles : binary paper x word matrix, weighted by papers_count / word_count on one side
+    words_index = dict()
+    titles = incidence_matrix([dict.fromkeys(words, 1.0) for words in titles_words], words_index)
+    idf = np.zeros(len(words_index), dtype = np.float64)
+    for word in words_index:
+        if word_count.get(word, 0) > 0: idf[words_index[word]] = papers_count / word_count[word]
+    weights = rowwise_products((titles @ sparse.diags(idf)).tocsr(), titles, sources, targets)
+    # mined terms : reciprocal counts of the source times counts of the target
+    terms_index = dict()
+    counts = incidence_matrix(papers_terms, terms_index)
+    reciprocals = counts.copy()
+    reciprocals.data = np.divide(1.0, reciprocals.data, out = np.zeros_like(reciprocals.data), where = reciprocals.data != 0)
+    weights += rowwise_products(reciprocals, counts, sources, targets)
+    # authors : number of matching (author1, author2) pairs, duplicates included
+    authors_index = dict()
+    authors = incidence_matrix([count_items(paper_authors) for paper_authors in papers_authors], authors_index)
+    weights += same_author_weight * rowwise_products(authors, authors, sources, targets)
+    return weights
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def count_items(items):
+    counts = dict()
+    for item in items: counts[item] = counts.get(item, 0.0) + 1.0
+    return counts
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def normalize_weights(weights):
+    max_weight = weights.max() if len(weights) > 0 else 0
+    return weights / max_weight if max_weight > 0 else weights
@@ -0,0 +1,250 @@
+import time
+import uuid
+import bisect
+import contextvars
+from collections import deque
+from aiohttp import web
+
+# upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+COUNTERS = ["requests", "retries", "failures", "abandoned", "bytes_received", "cache_hits", "graph_hits", "papers_found", "edges_found"]
+
+# metrics of the build the current task works for ; the stage workers a build
+# starts copy its context, so their requests count for it too
+current_build = contextvars.ContextVar("current_build", default = None)
+
+class Histogram:
+    """ Counts of observed values per bucket, the last bucket has no upper bound. """
+
+    def __init__(self, bounds = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other):
+        self.counts = [count + other_count for (count, other_count) in zip(self.counts, other.counts)]
+        self.sum += other.sum
+        self.count += other.count
+
+    def to_dict(self):
+        return { "bounds" : self.bounds, "counts" : self.counts, "sum" : self.sum, "count" : self.count }
+
+
+class PhaseMetrics:
+    """ Counters of one phase of a build, or of several phases and builds merged. """
+
+    def __init__(self):
+        for counter in COUNTERS: setattr(self, counter, 0)
+        self.wall_seconds = 0.0
+        self.latency = dict()           # endpoint kind -> Histogram of the successful requests
+
+    def observe_latency(self, kind, seconds):
+        if not kind in self.latency: self.latency[kind] = Histogram()
+        self.latency[kind].observe(seconds)
+
+    def merge(self, other):
+        for counter in COUNTERS: setattr(self, counter, getattr(self, counter) + getattr(other, counter))
+        self.wall_seconds += other.wall_seconds
+        for kind in other.latency:
+            if not kind in self.latency: self.latency[kind] = Histogram(other.latency[kind].bounds)
+            self.latency[kind].merge(other.latency[kind])
+        return self
+
+    def to_dict(self):
+        values = dict((counter, getattr(self, counter)) for counter in COUNTERS)
+        values["wall_seconds"] = self.wall_seconds
+        values["latency"] = dict((kind, self.latency[kind].to_dict()) for kind in self.latency)
+        return values
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+class BuildMetrics:
+    """ Metrics of one build, split by phase. A build is in its "setup" phase
+    until it enters phase 0. A request counts for the phase the build is in
+    when it ends, stage workers included, and the papers and edges found
+    count for the phase the build leaves when it enters the next one. """
+
+    def __init__(self, build_id, seed):
+        self.id = build_id
+        self.seed = seed
+        self.status = "running"
+        self.started = time.time()
+        self.finished = None
+        self.phases = dict()            # phase name -> PhaseMetrics
+        self.phase = None
+        self.phase_start = None
+        self.papers = 0
+        self.edges = 0
+        self.requests = 0               # all phases
+        self.abandoned_urls = dict()    # url -> { phase, error } of the requests given up after their retries
+        self.enter("setup")
+
+    def current(self):
+        return self.phases[self.phase]
+
+    def count_graph(self, papers, edges):
+        # papers and edges found since the last count go to the current phase
+        self.current().papers_found += papers - self.papers
+        self.current().edges_found += edges - self.edges
+        (self.papers, self.edges) = (papers, edges)
+
+    def close_phase(self):
+        now = time.monotonic()
+        self.current().wall_seconds += now - self.phase_start
+        self.phase_start = now
+
+    def enter(self, phase, papers = None, edges = None):
+        phase = str(phase)
+        if self.phase is not None:
+            self.close_phase()
+            if papers is not None: self.count_graph(papers, edges)
+        if not phase in self.phases: self.phases[phase] = PhaseMetrics()
+        (self.phase, self.phase_start) = (phase, time.monotonic())
+
+    def finish(self, status):
+        self.close_phase()
+        self.status = status
+        self.finished = time.time()
+
+    # --- --- --- --- --- --- --- ---
+
+    def record_request(self, kind, seconds, size, retry = False):
+        phase = self.current()
+        phase.requests += 1
+        self.requests += 1
+        if retry: phase.retries += 1
+        phase.bytes_received += size
+        phase.observe_latency(kind, seconds)
+
+    def record_failure(self, kind, retry = False):
+        phase = self.current()
+        phase.requests += 1
+        self.requests += 1
+        phase.failures += 1
+        if retry: phase.retries += 1
+
+    def record_abandoned(self, abandoned):
+        # abandoned : { url : last error }
+        self.current().abandoned += len(abandoned)
+        for url in abandoned: self.abandoned_urls[url] = { "phase" : self.phase, "error" : str(abandoned[url]) }
+
+    def record_cache_hit(self):
+        self.current().cache_hits += 1
+
+    def record_graph_hits(self, count):
+        self.current().graph_hits += count
+
+    def totals(self):
+        totals = PhaseMetrics()
+        for phase in self.phases.values(): totals.merge(phase)
+        return totals
+
+    def to_dict(self):
+        return {
+            "id" : self.id,
+            "seed" : self.seed,
+            "status" : self.status,
+            "started" : self.started,
+            "seconds" : (self.finished if self.finished is not None else time.time()) - self.started,
+            "phase" : self.phase,
+            "totals" : self.totals().to_dict(),
+            "phases" : dict((phase, self.phases[phase].to_dict()) for phase in self.phases)
+        }
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+class MetricsRegistry:
+    """ Metrics of every build of the server : the running builds, the last
+    `history` finished ones, and per phase totals since the server started. """
+
+    def __init__(self, history = 20):
+        self.running = dict()           # build id -> BuildMetrics
+        self.finished = deque(maxlen = history)
+        self.phase_totals = dict()      # phase name -> PhaseMetrics of the finished builds
+        self.builds = dict()            # status -> finished builds count
+
+    def start(self, build_id, seed):
+        build_metrics = BuildMetrics(build_id if build_id is not None else uuid.uuid4().hex, seed)
+        self.running[build_metrics.id] = build_metrics
+        return build_metrics
+
+    def finish(self, build_metrics, status):
+        build_metrics.finish(status)
+        self.running.pop(build_metrics.id, None)
+        self.finished.append(build_metrics)
+        self.builds[status] = self.builds.get(status, 0) + 1
+        for phase in build_metrics.phases:
+            if not phase in self.phase_totals: self.phase_totals[phase] = PhaseMetrics()
+            self.phase_totals[phase].merge(build_metrics.phases[phase])
+
+    def totals_by_phase(self):
+        # finished and running builds
+        totals = dict((phase, PhaseMetrics().merge(self.phase_totals[phase])) for phase in self.phase_totals)
+        for build_metrics in self.running.values():
+            for phase in build_metrics.phases:
+                if not phase in totals: totals[phase] = PhaseMetrics()
+                totals[phase].merge(build_metrics.phases[phase])
+        return totals
+
+    def stats(self):
+        return {
+            "builds" : dict(self.builds, running = len(self.running)),
+            "phases" : dict((phase, metrics.to_dict()) for (phase, metrics) in self.totals_by_phase().items()),
+            "running" : [build_metrics.to_dict() for build_metrics in self.running.values()],
+            "finished" : [build_metrics.to_dict() for build_metrics in self.finished]
+        }
+
+    def prometheus(self, gauges = {}, prefix = "papernetwork"):
+        # text exposition format ; gauges : { name : number } of the other parts of the server
+        lines = []
+        def metric(name, kind, help_text, samples):
+            lines.append("# HELP {0}_{1} {2}".format(prefix, name, help_text))
+            lines.append("# TYPE {0}_{1} {2}".format(prefix, name, kind))
+            for (labels, value) in samples:
+                label_text = ",".join('{0}="{1}"'.format(key, labels[key]) for key in labels)
+                lines.append("{0}_{1}{2} {3}".format(prefix, name, "{" + label_text + "}" if len(label_text) > 0 else "", value))
+        metric("builds_total", "counter", "Builds finished, by status.", [({ "status" : status }, count) for (status, count) in self.builds.items()])
+        metric("builds_running", "gauge", "Builds running.", [({}, len(self.running))])
+        totals = self.totals_by_phase()
+        for counter in COUNTERS:
+            metric(counter + "_total", "counter", "Sum of " + counter.replace("_", " ") + " over the builds, by phase.", [({ "phase" : phase }, getattr(totals[phase], counter)) for phase in totals])
+        metric("phase_seconds_total", "counter", "Wall time spent in each phase by the builds.", [({ "phase" : phase }, totals[phase].wall_seconds) for phase in totals])
+        # one histogram per endpoint kind, all phases together
+        latency = PhaseMetrics()
+        for phase in totals: latency.merge(totals[phase])
+        samples = []
+        for kind in sorted(latency.latency):
+            histogram = latency.latency[kind]
+            cumulated = 0
+            for (bound, count) in zip(histogram.bounds + ["+Inf"], histogram.counts):
+                cumulated += count
+                samples.append(({ "kind" : kind, "le" : bound }, cumulated))
+        lines.append("# HELP {0}_request_latency_seconds Latency of the successful requests to Europe PMC, by endpoint kind.".format(prefix))
+        lines.append("# TYPE {0}_request_latency_seconds histogram".format(prefix))
+        for (labels, value) in samples:
+            lines.append('{0}_request_latency_seconds_bucket{{kind="{1}",le="{2}"}} {3}'.format(prefix, labels["kind"], labels["le"], value))
+        for kind in sorted(latency.latency):
+            lines.append('{0}_request_latency_seconds_sum{{kind="{1}"}} {2}'.format(prefix, kind, latency.latency[kind].sum))
+            lines.append('{0}_request_latency_seconds_count{{kind="{1}"}} {2}'.format(prefix, kind, latency.latency[kind].count))
+        for name in sorted(gauges):
+            metric(name, "gauge", name.replace("_", " ").capitalize() + ".", [({}, gauges[name])])
+        return "\n".join(lines) + "\n"
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+async def start_metrics_server(render, host = "0.0.0.0", port = 9100):
+    # serves render() on GET /metrics, returns the runner to clean up
+    async def handle(request):
+        return web.Response(body = render().encode("utf-8"), headers = { "Content-Type" : "text/plain; version=0.0.4; charset=utf-8" })
+    app = web.Application()
+    app.router.add_route("GET", "/metrics", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
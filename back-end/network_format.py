@@ -0,0 +1,186 @@
+import json
+import sys
+import struct
+import zlib
+from array import array
+
+# Columnar binary encoding of a paper network (final_data).
+#
+#   magic "PNET" | version (u8) | compression (u8) | body, compressed or not
+#   body : header length (u32) | JSON header | columns, one after the other
+#
+# The header gives the title, the nodes and links counts, the string tables
+# and, for every column, its name, its type and its length in bytes. Links are
+# parallel int32 / int32 / float32 columns, numeric node attributes are int32
+# (or float32) columns, strings shared between nodes (sources, authors) are
+# indexes into a string table, and free text (ids, titles, abstracts) is stored
+# as int32 offsets into one UTF-8 blob. Numbers are little-endian.
+
+MAGIC = b"PNET"
+VERSION = 1
+COMPRESSIONS = { None : 0, "zlib" : 1 }
+TYPECODES = { "int32" : "i", "float32" : "f" }
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def _to_bytes_(values, dtype):
+    column = array(TYPECODES[dtype], values)
+    if sys.byteorder == "big": column.byteswap()
+    return column.tobytes()
+
+def _from_bytes_(data, dtype):
+    column = array(TYPECODES[dtype])
+    column.frombytes(data)
+    if sys.byteorder == "big": column.byteswap()
+    return column
+
+def _text_column_(strings):
+    # (offsets, UTF-8 blob) : string i is blob[offsets[i]:offsets[i + 1]]
+    encoded = list(map(lambda string : string.encode("utf-8"), strings))
+    offsets = [0]
+    for data in encoded: offsets.append(offsets[-1] + len(data))
+    return _to_bytes_(offsets, "int32") + b"".join(encoded), 4 * len(offsets)
+
+def _intern_(strings, table, table_index):
+    indexes = []
+    for string in strings:
+        if not string in table_index:
+            table_index[string] = len(table)
+            table.append(string)
+        indexes.append(table_index[string])
+    return indexes
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def encode_network(final_data, compression = None):
+    if not compression in COMPRESSIONS:
+        raise ValueError("compression : expected one of {0}, found {1}".format(list(COMPRESSIONS.keys()), compression))
+    nodes = final_data["nodes"]
+    links = final_data["links"]
+    (sources, sources_index, authors, authors_index) = [], dict(), [], dict()
+    columns = []
+    def add_column(name, kind, data, **description):
+        description.update({ "name" : name, "kind" : kind, "size" : len(data) })
+        columns.append((description, data))
+    # links
+    add_column("source", "array", _to_bytes_(map(lambda link : link["source"], links), "int32"), dtype = "int32")
+    add_column("target", "array", _to_bytes_(map(lambda link : link["target"], links), "int32"), dtype = "int32")
+    add_column("weight", "array", _to_bytes_(map(lambda link : link["weight"], links), "float32"), dtype = "float32")
+    # nodes
+    for name in ["id", "title", "abstract"]:
+        (data, offsets_size) = _text_column_(map(lambda node : node.get(name, ""), nodes))
+        add_column(name, "text", data, offsets_size = offsets_size)
+    add_column("src", "table", _to_bytes_(_intern_(map(lambda node : node["src"], nodes), sources, sources_index), "int32"), table = "sources")
+    for name in ["pubYear", "citedCount"]:
+        add_column(name, "array", _to_bytes_(map(lambda node : node[name], nodes), "int32"), dtype = "int32")
+    # authors : per node ranges of indexes into the authors table
+    authors_offsets = [0]
+    authors_indexes = []
+    for node in nodes:
+        authors_indexes.extend(_intern_(node["authors"], authors, authors_index))
+        authors_offsets.append(len(authors_indexes))
+    add_column("authors", "table_list", _to_bytes_(authors_offsets, "int32") + _to_bytes_(authors_indexes, "int32"), table = "authors", offsets_size = 4 * len(authors_offsets))
+    # optional numeric node attributes (positions, communities ...)
+    for name in final_data.get("node_columns", []):
+        dtype = "float32" if any(map(lambda node : isinstance(node[name], float), nodes)) else "int32"
+        add_column(name, "array", _to_bytes_(map(lambda node : node[name], nodes), dtype), dtype = dtype)
+    header = {
+        "title" : final_data.get("title", ""),
+        "nodes_count" : len(nodes),
+        "links_count" : len(links),
+        "tables" : { "sources" : sources, "authors" : authors },
+        "columns" : list(map(lambda column : column[0], columns)),
+        "meta" : final_data.get("meta", {})
+    }
+    header_data = json.dumps(header, separators = (',', ':')).encode("utf-8")
+    body = struct.pack("<I", len(header_data)) + header_data + b"".join(map(lambda column : column[1], columns))
+    if compression == "zlib": body = zlib.compress(body, 6)
+    return MAGIC + struct.pack("<BB", VERSION, COMPRESSIONS[compression]) + body
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def decode_columns(data):
+    # returns (header, { column name : decoded column }) without building node objects
+    if data[:4] != MAGIC:
+        raise ValueError("not a paper network : bad magic number")
+    (version, compression) = struct.unpack("<BB", data[4:6])
+    if version != VERSION:
+        raise ValueError("unsupported paper network version {0}".format(version))
+    body = data[6:]
+    if compression == COMPRESSIONS["zlib"]: body = zlib.decompress(body)
+    header_size = struct.unpack("<I", body[:4])[0]
+    header = json.loads(body[4:4 + header_size].decode("utf-8"))
+    position = 4 + header_size
+    columns = dict()
+    for description in header["columns"]:
+        chunk = body[position:position + description["size"]]
+        position += description["size"]
+        if description["kind"] == "array":
+            columns[description["name"]] = _from_bytes_(chunk, description["dtype"])
+        elif description["kind"] == "table":
+            columns[description["name"]] = _from_bytes_(chunk, "int32")
+        elif description["kind"] == "text":
+            offsets = _from_bytes_(chunk[:description["offsets_size"]], "int32")
+            blob = chunk[description["offsets_size"]:]
+            columns[description["name"]] = (offsets, blob)
+        elif description["kind"] == "table_list":
+            columns[description["name"]] = (_from_bytes_(chunk[:description["offsets_size"]], "int32"), _from_bytes_(chunk[description["offsets_size"]:], "int32"))
+    return (header, columns)
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def decode_network(data):
+    # rebuilds the final_data document (without the per node "links" lists)
+    (header, columns) = decode_columns(data)
+    (sources, authors) = header["tables"]["sources"], header["tables"]["authors"]
+    texts = dict()
+    for name in ["id", "title", "abstract"]:
+        (offsets, blob) = columns[name]
+        texts[name] = [blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(header["nodes_count"])]
+    (authors_offsets, authors_indexes) = columns["authors"]
+    standard = set(["source", "target", "weight", "id", "title", "abstract", "src", "pubYear", "citedCount", "authors"])
+    extra = list(filter(lambda name : not name in standard, columns))
+    nodes = []
+    for i in range(header["nodes_count"]):
+        node = {
+            "index" : i,
+            "id" : texts["id"][i],
+            "src" : sources[columns["src"][i]],
+            "title" : texts["title"][i],
+            "abstract" : texts["abstract"][i],
+            "authors" : [authors[a] for a in authors_indexes[authors_offsets[i]:authors_offsets[i + 1]]],
+            "pubYear" : columns["pubYear"][i],
+            "citedCount" : columns["citedCount"][i]
+        }
+        for name in extra: node[name] = columns[name][i]
+        nodes.append(node)
+    links = [{ "source" : s, "target" : t, "weight" : w } for (s, t, w) in zip(columns["source"], columns["target"], columns["weight"])]
+    final_data = { "title" : header["title"], "nodes" : nodes, "links" : links }
+    if len(extra) > 0: final_data["node_columns"] = extra
+    if len(header.get("meta", {})) > 0: final_data["meta"] = header["meta"]
+    return final_data
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def write_network_dump(file_name, final_data, dump_format = "json", compression = None):
+    if dump_format == "columnar":
+        with open(file_name, 'wb') as outfile:
+            outfile.write(encode_network(final_data, compression))
+    elif compression == "zlib":
+        with open(file_name, 'wb') as outfile:
+            outfile.write(zlib.compress(json.dumps(final_data, separators = (',', ':')).encode("utf-8"), 6))
+    else:
+        with open(file_name, 'w') as outfile:
+            outfile.write(json.dumps(final_data, indent=4, sort_keys=True))
+
+def load_network_dump(file_name):
+    # reads any dump written by write_network_dump
+    with open(file_name, 'rb') as infile:
+        data = infile.read()
+    if data[:4] == MAGIC: return decode_network(data)
+    if data[:1] in (b"{", b"["): return json.loads(data.decode("utf-8"))
+    return json.loads(zlib.decompress(data).decode("utf-8"))
+
+def dump_extension(dump_format = "json", compression = None):
+    if dump_format == "columnar": return ".pnet"
+    return ".json.z" if compression == "zlib" else ".json"
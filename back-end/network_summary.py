@@ -0,0 +1,133 @@
+import numpy as np
+from scipy import sparse
+
+# Per request views of a built network : fewer links (the k heaviest links of every
+# paper, or the backbone kept by the disparity filter), communities found by Louvain
+# with label propagation moves, and the graph of the communities. Links are given as
+# parallel sources / targets / weights arrays, weights normalized in [0, 1].
+
+LINK_FLOOR = 0.1            # links of weight 0 still count for the communities
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def top_k_links(nodes_count, sources, targets, weights, k):
+    # mask of the links among the k heaviest links of their source or of their target
+    links_count = len(sources)
+    ends = np.concatenate([sources, targets])
+    links = np.concatenate([np.arange(links_count), np.arange(links_count)])
+    order = np.lexsort((-np.concatenate([weights, weights]), ends))
+    sorted_ends = ends[order]
+    rank = np.arange(len(order)) - np.searchsorted(sorted_ends, sorted_ends, side = "left")
+    keep = np.zeros(links_count, dtype = bool)
+    keep[links[order][rank < k]] = True
+    return keep
+
+def disparity_links(nodes_count, sources, targets, weights, alpha):
+    # mask of the backbone links (Serrano, Boguna, Vespignani 2009) : a link is kept when
+    # its share of the strength of one of its papers is significant at level alpha, and
+    # the only link of a paper is always kept so that no paper is left alone
+    strength = np.bincount(sources, weights, nodes_count) + np.bincount(targets, weights, nodes_count)
+    degree = np.bincount(sources, minlength = nodes_count) + np.bincount(targets, minlength = nodes_count)
+    def significance(ends):
+        share = np.divide(weights, strength[ends], out = np.zeros(len(ends)), where = strength[ends] > 0)
+        return (1 - share) ** (degree[ends] - 1)
+    return (significance(sources) < alpha) | (significance(targets) < alpha) | (degree[sources] == 1) | (degree[targets] == 1)
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def local_moves(nodes_count, rows, columns, votes, degree, total, generator, iterations):
+    # label of every node. A node takes the label around it with the best modularity gain :
+    # its links to the label, less its degree times the degree of the label over the total
+    # weight (Barber and Clark 2009). Half of the nodes move at a time so that labels do not
+    # oscillate, until no node would move. Links of a node to itself never move.
+    between = rows != columns
+    (rows, columns, votes) = (rows[between], columns[between], votes[between])
+    labels = np.arange(nodes_count)
+    node_rows = np.arange(nodes_count)
+    for _ in range(iterations):
+        label_degree = np.bincount(labels, degree, nodes_count)
+        around = sparse.csr_matrix((votes, (rows, labels[columns])), shape = (nodes_count, nodes_count))
+        around.sum_duplicates()
+        around_rows = np.repeat(node_rows, np.diff(around.indptr))
+        # gain of every (node, label around it), the degree of the node not counted in its own label
+        own = around.indices == labels[around_rows]
+        gain = around.data - degree[around_rows] * (label_degree[around.indices] - np.where(own, degree[around_rows], 0)) / total
+        stay = -degree * (label_degree[labels] - degree) / total
+        stay[around_rows[own]] = gain[own]
+        # best label of every node, random tie breaks
+        gain = gain + 1e-9 * generator.random(len(gain))
+        best_gain = np.full(nodes_count, -np.inf)
+        np.maximum.at(best_gain, around_rows, gain)
+        is_best = gain >= best_gain[around_rows]
+        best = labels.copy()
+        best[around_rows[is_best]] = around.indices[is_best]
+        moving = (best != labels) & (best_gain > stay + 1e-12)
+        if not moving.any(): break
+        update = moving & (generator.random(nodes_count) < 0.5)
+        labels[update] = best[update]
+    return labels
+
+def louvain_communities(nodes_count, sources, targets, weights, iterations = 30, levels = 10, seed = 0):
+    # community of every node, numbered by decreasing size : Louvain, with the local moves
+    # above, then every community becomes one node and so on while communities merge
+    generator = np.random.default_rng(seed)
+    rows = np.concatenate([sources, targets])
+    columns = np.concatenate([targets, sources])
+    votes = np.concatenate([weights, weights]) + LINK_FLOOR
+    degree = np.bincount(rows, votes, nodes_count)
+    total = max(votes.sum(), 1e-12)
+    membership = np.arange(nodes_count)
+    for _ in range(levels):
+        (_, labels) = np.unique(local_moves(nodes_count, rows, columns, votes, degree, total, generator, iterations), return_inverse = True)
+        if labels.max() + 1 == nodes_count: break
+        membership = labels[membership]
+        nodes_count = int(labels.max()) + 1
+        merged = sparse.coo_matrix((votes, (labels[rows], labels[columns])), shape = (nodes_count, nodes_count)).tocsr().tocoo()
+        (rows, columns, votes) = (merged.row, merged.col, merged.data)
+        degree = np.bincount(labels, degree, nodes_count)
+    (_, membership, sizes) = np.unique(membership, return_inverse = True, return_counts = True)
+    rank = np.empty(len(sizes), dtype = np.int64)
+    rank[np.argsort(-sizes, kind = "stable")] = np.arange(len(sizes))
+    return rank[membership]
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def cluster_graph(communities, sources, targets, weights, cited_counts, titles):
+    # the communities with their members, named after their most cited paper, and the
+    # links between them : number of paper links and sum of their weights
+    clusters_count = int(communities.max()) + 1 if len(communities) > 0 else 0
+    order = np.argsort(communities, kind = "stable")
+    bounds = np.concatenate([[0], np.cumsum(np.bincount(communities, minlength = clusters_count))])
+    (source_clusters, target_clusters) = (communities[sources], communities[targets])
+    inside = source_clusters == target_clusters
+    internal = np.bincount(source_clusters[inside], minlength = clusters_count)
+    clusters = []
+    for cluster in range(clusters_count):
+        members = order[bounds[cluster]:bounds[cluster + 1]]
+        top = int(members[np.argmax(cited_counts[members])])
+        clusters.append({ "id" : cluster, "size" : len(members), "members" : members.tolist(), "links" : int(internal[cluster]), "top" : top, "label" : titles[top] })
+    # links between clusters, both directions together
+    (low, high) = (np.minimum(source_clusters, target_clusters)[~inside], np.maximum(source_clusters, target_clusters)[~inside])
+    (pairs, pair_index) = np.unique(low * clusters_count + high, return_inverse = True)
+    counts = np.bincount(pair_index, minlength = len(pairs))
+    sums = np.bincount(pair_index, weights[~inside], minlength = len(pairs))
+    links = [{ "source" : int(pair // clusters_count), "target" : int(pair % clusters_count), "count" : int(count), "weight" : float(total) } for (pair, count, total) in zip(pairs, counts, sums)]
+    return { "clusters" : clusters, "links" : links }
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def summarize(sources, targets, weights, cited_counts, titles, top_k = 0, disparity = 0, communities = False, clusters = False):
+    # (community of every node or None, graph of the communities or None, indexes of the links kept or None)
+    # top_k > 0 keeps the k heaviest links of every paper, disparity > 0 the backbone at that level, both together
+    # the links kept by both ; the communities are found on all the links
+    nodes_count = len(titles)
+    sources = np.asarray(sources, dtype = np.int64)
+    targets = np.asarray(targets, dtype = np.int64)
+    weights = np.asarray(weights, dtype = np.float64)
+    labels = louvain_communities(nodes_count, sources, targets, weights) if (communities or clusters) else None
+    graph = cluster_graph(labels, sources, targets, weights, np.asarray(cited_counts), titles) if clusters else None
+    keep = np.ones(len(sources), dtype = bool)
+    if top_k > 0: keep &= top_k_links(nodes_count, sources, targets, weights, top_k)
+    if disparity > 0: keep &= disparity_links(nodes_count, sources, targets, weights, disparity)
+    kept = np.flatnonzero(keep).tolist() if (top_k > 0) or (disparity > 0) else None
+    return (labels.tolist() if labels is not None else None, graph, kept)
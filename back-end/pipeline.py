@@ -0,0 +1,97 @@
+import asyncio
+
+class BatchStage:
+    """ One stage of the build pipeline : items put in a bounded queue are
+    processed in batches by up to `workers` concurrent workers. Workers are
+    started when items arrive and stop when the queue is empty, so an idle
+    stage holds no task. Putting into a full queue waits for the workers
+    (back-pressure on the producer). The first error raised while processing
+    a batch is raised again by join. The workers are cancelled when the task
+    that first put items (the build) ends, cancelled builds included. """
+
+    def __init__(self, process, batch_size, workers = 1, queue_size = 0, name = "stage"):
+        # process : coroutine function taking a list of items
+        if (not isinstance(batch_size, int)) or (batch_size < 1):
+            raise ValueError("batch_size : expected int > 0, found {0}".format(batch_size))
+        if (not isinstance(workers, int)) or (workers < 1):
+            raise ValueError("workers : expected int > 0, found {0}".format(workers))
+        self.process = process
+        self.batch_size = batch_size
+        self.max_workers = workers
+        self.name = name
+        self.queue = asyncio.Queue(maxsize = queue_size)
+        self.workers = set()                 # running worker tasks
+        self.active_workers = 0
+        self.queued = 0
+        self.processed = 0
+        self.error = None
+        self.owner = None
+
+    async def put(self, items):
+        if self.owner is None:
+            self.owner = asyncio.current_task()
+            self.owner.add_done_callback(lambda task : self.cancel())
+        for item in items:
+            await self.queue.put(item)
+            self.queued += 1
+            if self.active_workers < self.max_workers: self._start_worker_()
+
+    def _start_worker_(self):
+        # counted as active right away, and until it has seen an empty queue
+        self.active_workers += 1
+        worker = asyncio.ensure_future(self._work_())
+        self.workers.add(worker)
+        worker.add_done_callback(self.workers.discard)
+
+    async def _work_(self):
+        # let the producer fill the queue before taking the first batch
+        try:
+            await asyncio.sleep(0)
+            while not self.queue.empty():
+                batch = [self.queue.get_nowait() for _ in range(min(self.batch_size, self.queue.qsize()))]
+                try:
+                    if self.error is None: await self.process(batch)
+                except Exception as error:
+                    if self.error is None: self.error = error
+                finally:
+                    self.processed += len(batch)
+                    for _ in batch: self.queue.task_done()
+        finally:
+            self.active_workers -= 1
+
+    async def join(self):
+        # wait until every item put so far is processed
+        await self.queue.join()
+        if self.error is not None: raise self.error
+
+    def cancel(self):
+        # stop the workers, the items left in the queue are dropped
+        for worker in list(self.workers): worker.cancel()
+
+    def pending(self):
+        return self.queued - self.processed
+
+    def __repr__(self):
+        return "{0} : {1} / {2} processed, {3} worker(s)".format(self.name, self.processed, self.queued, self.active_workers)
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+async def join_stages(*stages, timeout = None):
+    # wait for every stage, if one of them failed the others are cancelled
+    # returns False if timeout (seconds) runs out first, the stages go on working
+    if all(stage.pending() == 0 for stage in stages): timeout = None
+    joined = asyncio.ensure_future(join_all(stages))
+    try:
+        (done, _) = await asyncio.wait([joined], timeout = timeout)
+        if len(done) == 0:
+            joined.cancel()
+            return False
+        joined.result()
+        return True
+    except BaseException:
+        joined.cancel()
+        for stage in stages: stage.cancel()
+        raise
+
+async def join_all(stages):
+    for stage in stages: await stage.join()
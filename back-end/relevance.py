@@ -0,0 +1,87 @@
+import math
+import numpy as np
+from scipy import sparse
+
+class RelevanceIndex:
+    """ Papers as sparse TF-IDF vectors over their mined terms and abstract words.
+    Terms and words are interned to integer ids (a mined term and an abstract word
+    with the same spelling are different features). The similarity of every paper
+    to a set of papers is one sparse matrix-vector product. """
+
+    def __init__(self, words_weight = 1.0):
+        self.words_weight = words_weight   # weight of abstract words against mined terms
+        self.features = dict()             # (kind, token) -> feature id
+        self.papers = dict()               # paper id -> row
+        self.papers_ids = []               # row -> paper id
+        self.rows = []                     # row -> { feature id : term frequency }
+        self.matrix = None                 # cached normalized TF-IDF matrix
+
+    def _row_(self, paper_id):
+        if not paper_id in self.papers:
+            self.papers[paper_id] = len(self.papers_ids)
+            self.papers_ids.append(paper_id)
+            self.rows.append(dict())
+        return self.rows[self.papers[paper_id]]
+
+    def _feature_(self, kind, token):
+        key = (kind, token)
+        if not key in self.features: self.features[key] = len(self.features)
+        return self.features[key]
+
+    def set_terms(self, paper_id, term_counts):
+        # term_counts : { mined term : count }
+        row = self._row_(paper_id)
+        total = sum(term_counts.values())
+        for term in term_counts:
+            if total > 0: row[self._feature_("term", term)] = term_counts[term] / total
+        self.matrix = None
+
+    def set_words(self, paper_id, words):
+        # words : normalized words of the abstract, repeated as they occur
+        word_counts = dict()
+        for word in words: word_counts[word] = word_counts.get(word, 0) + 1
+        self.set_word_counts(paper_id, word_counts)
+
+    def set_word_counts(self, paper_id, word_counts):
+        # word_counts : { normalized word of the abstract : count }
+        row = self._row_(paper_id)
+        total = sum(word_counts.values())
+        for word in word_counts:
+            if total > 0: row[self._feature_("word", word)] = self.words_weight * word_counts[word] / total
+        self.matrix = None
+
+    def __contains__(self, paper_id):
+        return paper_id in self.papers
+
+    def __len__(self):
+        return len(self.papers_ids)
+
+    def tfidf_matrix(self):
+        # rows are L2 normalized, so a dot product is a cosine similarity
+        if self.matrix is None:
+            (rows, cols, values) = [], [], []
+            for (row, frequencies) in enumerate(self.rows):
+                rows.extend([row] * len(frequencies))
+                cols.extend(frequencies.keys())
+                values.extend(frequencies.values())
+            tf = sparse.csr_matrix((np.array(values, dtype = np.float64), (np.array(rows, dtype = np.int64), np.array(cols, dtype = np.int64))), shape = (len(self.rows), len(self.features)))
+            df = np.bincount(tf.indices, minlength = len(self.features))
+            idf = np.log((1 + len(self.rows)) / (1 + df)) + 1
+            tfidf = (tf @ sparse.diags(idf)).tocsr()
+            norms = np.sqrt(np.asarray(tfidf.multiply(tfidf).sum(axis = 1)).ravel())
+            norms[norms == 0] = 1
+            self.matrix = (sparse.diags(1 / norms) @ tfidf).tocsr()
+        return self.matrix
+
+    def similarities(self, to_papers, papers = None):
+        # cosine similarity of papers (all indexed papers by default) to the centroid of to_papers
+        matrix = self.tfidf_matrix()
+        rows = [self.papers[id] for id in to_papers if id in self.papers]
+        if papers is None: papers = self.papers_ids
+        if (len(rows) == 0) or (matrix.shape[1] == 0):
+            return dict.fromkeys(papers, 0.0)
+        query = np.asarray(matrix[rows].sum(axis = 0)).ravel()
+        query_norm = math.sqrt(float(query @ query))
+        if query_norm > 0: query = query / query_norm
+        scores = matrix @ query
+        return dict(map(lambda id : (id, float(scores[self.papers[id]]) if id in self.papers else 0.0), papers))
@@ -0,0 +1,154 @@
+import asyncio
+import random
+import time
+
+class RequestScheduler:
+    """ Schedules requests toward Europe PMC for the whole server.
+    The number of requests in flight follows an AIMD window driven by the
+    observed latency and error rate, the request rate never exceeds
+    requests_per_second, and every URL retries on its own exponential backoff
+    with jitter until it runs out of attempts and is reported as abandoned. """
+
+    def __init__(self, min_concurrency = 2, max_concurrency = 64, initial_concurrency = 8, requests_per_second = 20.0, latency_target = 2.0, backoff_base = 0.5, backoff_max = 30.0, decrease_factor = 0.5):
+        if not (0 < min_concurrency <= initial_concurrency <= max_concurrency):
+            raise ValueError("concurrency : expected 0 < min <= initial <= max, found ({0}, {1}, {2})".format(min_concurrency, initial_concurrency, max_concurrency))
+        if requests_per_second <= 0:
+            raise ValueError("requests_per_second : expected > 0, found {0}".format(requests_per_second))
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.window = float(initial_concurrency)
+        self.requests_per_second = float(requests_per_second)
+        self.latency_target = latency_target
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.decrease_factor = decrease_factor
+        self.in_flight = 0
+        self.tokens = 1.0
+        self.last_refill = time.monotonic()
+        self.condition = None
+        self.rate_lock = None
+        # requests started when the window was last decreased : the slow or failed requests
+        # started before that belong to the same congestion and decrease it no further
+        self.last_decrease = 0
+        # counters
+        self.requests = 0
+        self.failures = 0
+        self.retries = 0
+        self.abandoned = 0
+
+    def configure(self, min_concurrency, max_concurrency, requests_per_second, latency_target):
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.requests_per_second = float(requests_per_second)
+        self.latency_target = latency_target
+        self.window = min(max(self.window, min_concurrency), max_concurrency)
+
+    # --- --- --- --- --- --- --- ---
+
+    def _sync_primitives_(self):
+        # asyncio primitives are bound to the loop they are first used on
+        if self.condition is None:
+            self.condition = asyncio.Condition()
+            self.rate_lock = asyncio.Lock()
+
+    async def _acquire_slot_(self):
+        async with self.condition:
+            while self.in_flight >= int(self.window):
+                await self.condition.wait()
+            self.in_flight += 1
+
+    async def _release_slot_(self):
+        async with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    async def _acquire_token_(self):
+        # token bucket holding at most one second worth of requests
+        async with self.rate_lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.requests_per_second, self.tokens + (now - self.last_refill) * self.requests_per_second)
+                self.last_refill = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.requests_per_second)
+
+    def _on_success_(self, latency, sequence):
+        # sequence : number of the request among the requests started
+        if latency > self.latency_target:
+            self._decrease_(sequence)
+        else:
+            # additive increase : about one more slot per window of successful requests
+            self.window = min(self.max_concurrency, self.window + 1 / self.window)
+
+    def _on_failure_(self, sequence):
+        self.failures += 1
+        self._decrease_(sequence)
+
+    def _decrease_(self, sequence):
+        # multiplicative decrease, at most once per window of requests
+        if sequence <= self.last_decrease: return
+        self.last_decrease = self.requests
+        self.window = max(self.min_concurrency, self.window * self.decrease_factor)
+
+    def backoff_delay(self, attempt):
+        # exponential backoff with "equal jitter"
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    # --- --- --- --- --- --- --- ---
+
+    async def fetch(self, url, fetch_function, max_attempts):
+        # returns the fetched value, or raises the last error once max_attempts is reached
+        self._sync_primitives_()
+        attempt = 0
+        while True:
+            await self._acquire_slot_()
+            try:
+                await self._acquire_token_()
+                self.requests += 1
+                sequence = self.requests
+                start_time = time.monotonic()
+                try:
+                    result = await fetch_function(url)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as error:
+                    self._on_failure_(sequence)
+                    last_error = error
+                else:
+                    self._on_success_(time.monotonic() - start_time, sequence)
+                    return result
+            finally:
+                await self._release_slot_()
+            attempt += 1
+            if attempt >= max_attempts:
+                self.abandoned += 1
+                raise last_error
+            self.retries += 1
+            await asyncio.sleep(self.backoff_delay(attempt))
+
+    async def fetch_all(self, urls, fetch_function, max_attempts):
+        # returns ({url : value}, {url : last error}) for the URLs fetched and abandoned
+        urls = list(urls)
+        results = await asyncio.gather(*[self.fetch(url, fetch_function, max_attempts) for url in urls], return_exceptions = True)
+        (fetched, abandoned) = dict(), dict()
+        for (url, result) in zip(urls, results):
+            if isinstance(result, asyncio.CancelledError): raise result
+            elif isinstance(result, BaseException): abandoned[url] = result
+            else: fetched[url] = result
+        return (fetched, abandoned)
+
+    def stats(self):
+        return {
+            "window" : self.window,
+            "in_flight" : self.in_flight,
+            "requests" : self.requests,
+            "failures" : self.failures,
+            "retries" : self.retries,
+            "abandoned" : self.abandoned
+        }
+
+    def __str__(self):
+        return "[ scheduler : window {0:.1f}, {1} in flight, {2} request(s), {3} failure(s), {4} abandoned]".format(self.window, self.in_flight, self.requests, self.failures, self.abandoned)
@@ -0,0 +1,127 @@
+import sqlite3
+import time
+import json
+import os
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, unquote
+
+# Kinds of Europe PMC queries, used to pick a time to live for cached responses
+ENDPOINT_KINDS = ["references", "citations", "textMinedTerms", "search", "profile", "other"]
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def endpoint_kind(url):
+    path = urlsplit(url).path
+    for kind in ["references", "citations", "textMinedTerms"]:
+        if ("/" + kind + "/") in path: return kind
+    if path.endswith("/search"): return "search"
+    if path.endswith("/profile"): return "profile"
+    return "other"
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def normalize_url(url):
+    # two URLs asking for the same resource must give the same key :
+    # lower case scheme and host, decoded path, sorted query parameters
+    parts = urlsplit(url)
+    query = sorted(parse_qsl(parts.query, keep_blank_values = True))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), unquote(parts.path), urlencode(query), ""))
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+class ResponseCache:
+    """ Persistent cache of Europe PMC JSON responses, keyed by normalized URL.
+    Entries expire after a time to live depending on the endpoint kind, and the
+    least recently used entries are evicted once the cache exceeds max_size bytes. """
+
+    def __init__(self, file_name, max_size = 256 * 1024 * 1024, ttls = {}):
+        if not isinstance(max_size, int):
+            raise TypeError("max_size : int expected, %s found" % type(max_size).__name__)
+        directory = os.path.dirname(file_name)
+        if (len(directory) > 0) and (not os.path.isdir(directory)): os.makedirs(directory)
+        self.file_name = file_name
+        self.max_size = max_size
+        self.ttls = dict(ttls)
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.connection = sqlite3.connect(file_name)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS responses (url TEXT PRIMARY KEY, kind TEXT, body BLOB, size INTEGER, stored REAL, accessed REAL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self.connection.commit()
+        self.size = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def ttl(self, kind):
+        return self.ttls[kind] if kind in self.ttls else self.ttls.get("other", 0)
+
+    def get(self, url):
+        key = normalize_url(url)
+        row = self.connection.execute("SELECT kind, body, stored FROM responses WHERE url = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        now = time.time()
+        if now - row[2] > self.ttl(row[0]):
+            self.remove(key)
+            self.expired += 1
+            self.misses += 1
+            return None
+        self.connection.execute("UPDATE responses SET accessed = ? WHERE url = ?", (now, key))
+        self.hits += 1
+        return json.loads(row[1].decode("utf-8"))
+
+    def put(self, url, JSON_resp):
+        # never keep API errors, they would be served again until they expire
+        if 'errCode' in JSON_resp: return
+        key = normalize_url(url)
+        kind = endpoint_kind(key)
+        if self.ttl(kind) <= 0: return
+        body = json.dumps(JSON_resp, separators = (',', ':')).encode("utf-8")
+        if len(body) > self.max_size: return
+        self.remove(key)
+        now = time.time()
+        self.connection.execute("INSERT INTO responses VALUES (?, ?, ?, ?, ?, ?)", (key, kind, body, len(body), now, now))
+        self.size += len(body)
+        self.evict()
+
+    def remove(self, key):
+        row = self.connection.execute("SELECT size FROM responses WHERE url = ?", (key,)).fetchone()
+        if row is not None:
+            self.connection.execute("DELETE FROM responses WHERE url = ?", (key,))
+            self.size -= row[0]
+
+    def evict(self):
+        # drop least recently used entries until the cache fits in max_size
+        while self.size > self.max_size:
+            rows = self.connection.execute("SELECT url, size FROM responses ORDER BY accessed ASC LIMIT 64").fetchall()
+            if len(rows) == 0: break
+            for (key, size) in rows:
+                if self.size <= self.max_size: break
+                self.connection.execute("DELETE FROM responses WHERE url = ?", (key,))
+                self.size -= size
+                self.evictions += 1
+
+    def commit(self):
+        self.connection.commit()
+
+    def clear(self):
+        self.connection.execute("DELETE FROM responses")
+        self.connection.commit()
+        self.size = 0
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+    def stats(self):
+        return {
+            "hits" : self.hits,
+            "misses" : self.misses,
+            "expired" : self.expired,
+            "evictions" : self.evictions,
+            "size" : self.size,
+            "max_size" : self.max_size
+        }
+
+    def __str__(self):
+        return "[ cache : {0}, hits : {1}, misses : {2}, size : {3} / {4} bytes]".format(self.file_name, self.hits, self.misses, self.size, self.max_size)
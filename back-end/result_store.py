@@ -0,0 +1,120 @@
+import os
+import re
+import json
+import time
+from network_format import load_network_dump
+
+# dumps/papers_init{src}-{id}_ref{reference_threshold}_expl{explored_threshold}_find{papers_threshold}{extension}
+DUMP_NAME = re.compile(r"^papers_init([A-Za-z]+)-(.+)_ref(-?\d+)_expl(-?\d+)_find(-?\d+)\.(json|json\.z|pnet)$")
+THRESHOLDS = ["reference_threshold", "explored_threshold", "papers_threshold"]
+
+def dump_name(src, id, reference_threshold, explored_threshold, papers_threshold, extension):
+    return "papers_init{0}-{1}_ref{2}_expl{3}_find{4}{5}".format(src, id, reference_threshold, explored_threshold, papers_threshold, extension)
+
+def covers(requested, stored):
+    # a threshold of -1 has no limit
+    if requested == -1: return True
+    return (stored != -1) and (stored <= requested)
+
+def restore_network(final_data, known_papers):
+    # puts the papers and relations of a stored network in a PaperStore, returns its meta
+    for node in final_data["nodes"]:
+        known_papers.add_paper(node["id"], node["src"], node["title"], node["authors"], node["pubYear"], node["citedCount"], node.get("abstract", ""))
+    for link in final_data["links"]:
+        known_papers.add_relation(final_data["nodes"][link["source"]]["id"], final_data["nodes"][link["target"]]["id"])
+    return final_data.get("meta", {})
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+class ResultStore:
+    """ Index of the networks dumped by previous builds.
+    The index file keeps, for each dump, its seed, thresholds, size and date,
+    so a lookup reads no dump. Dumps missing from the index are added from
+    their file name only; they can answer the same request again, but only
+    dumps written with their "meta" (explored papers, mined terms) can be
+    extended by a request with larger thresholds. """
+
+    def __init__(self, directory = "dumps", index_name = "index.json", max_age = 7 * 24 * 3600):
+        self.directory = directory
+        self.index_file = os.path.join(directory, index_name)
+        self.max_age = max_age
+        self.entries = dict()           # dump file name -> entry
+        self.hits = 0
+        self.resumes = 0
+        self.misses = 0
+        self.load_index()
+
+    def load_index(self):
+        if os.path.isfile(self.index_file):
+            with open(self.index_file, 'r') as index_file:
+                self.entries = json.load(index_file)
+        # forget the dumps deleted, learn the ones written without the index
+        names = set(os.listdir(self.directory)) if os.path.isdir(self.directory) else set()
+        changed = False
+        for name in list(self.entries):
+            if not name in names:
+                del self.entries[name]
+                changed = True
+        for name in names:
+            match = DUMP_NAME.match(name)
+            if (match is not None) and (not name in self.entries):
+                self.entries[name] = {
+                    "src" : match.group(1),
+                    "seed" : match.group(2),
+                    "reference_threshold" : int(match.group(3)),
+                    "explored_threshold" : int(match.group(4)),
+                    "papers_threshold" : int(match.group(5)),
+                    "same_author_weight" : None,
+                    "created" : os.path.getmtime(os.path.join(self.directory, name)),
+                    "nodes_count" : None,
+                    "resumable" : False
+                }
+                changed = True
+        if changed: self.save_index()
+
+    def save_index(self):
+        # written aside then renamed, a reader never sees half an index
+        if not os.path.isdir(self.directory): os.makedirs(self.directory)
+        temporary_file = self.index_file + ".tmp"
+        with open(temporary_file, 'w') as index_file:
+            json.dump(self.entries, index_file, separators = (',', ':'))
+        os.replace(temporary_file, self.index_file)
+
+    def add(self, name, entry):
+        self.entries[name] = dict(entry, created = time.time())
+        self.save_index()
+
+    # --- --- --- --- --- --- --- ---
+
+    def find(self, seed, thresholds, same_author_weight):
+        # returns (file name, exact) of the best stored network for a request, or (None, False)
+        # thresholds : { threshold name : requested value }
+        now = time.time()
+        (best, best_count) = None, -1
+        for name in self.entries:
+            entry = self.entries[name]
+            if (entry["seed"] != seed) or (now - entry["created"] > self.max_age): continue
+            if all(map(lambda threshold : entry[threshold] == thresholds[threshold], THRESHOLDS)) and (entry["same_author_weight"] in (None, same_author_weight)):
+                self.hits += 1
+                return (name, True)
+            if entry["resumable"] and all(map(lambda threshold : covers(thresholds[threshold], entry[threshold]), THRESHOLDS)):
+                if entry["nodes_count"] > best_count: (best, best_count) = name, entry["nodes_count"]
+        if best is None: self.misses += 1
+        else: self.resumes += 1
+        return (best, False)
+
+    def load(self, name):
+        # final_data of a dump, with the per node "links" lists the client expects
+        final_data = load_network_dump(os.path.join(self.directory, name))
+        if any(map(lambda node : not "links" in node, final_data["nodes"])):
+            for node in final_data["nodes"]: node["links"] = []
+            for link in final_data["links"]:
+                final_data["nodes"][link["source"]]["links"].append(link["target"])
+                final_data["nodes"][link["target"]]["links"].append(link["source"])
+        return final_data
+
+    def stats(self):
+        return { "entries" : len(self.entries), "hits" : self.hits, "resumes" : self.resumes, "misses" : self.misses }
+
+    def __repr__(self):
+        return "result store {0} ({1} network(s))".format(self.directory, len(self.entries))
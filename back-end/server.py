@@ -2,14 +2,42 @@ from autobahn.asyncio.websocket import WebSocketServerProtocol, \
     WebSocketServerFactory
 
 import time
-import grequests
-import requests
+import asyncio
 import json
 import pprint
 import math
+import os
+import zlib
+import functools
+import multiprocessing
+import cProfile
+import pstats
+import io
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import quote
 from internal_types import *
+from response_cache import ResponseCache, endpoint_kind
+from http_engine import HttpEngine
+from request_scheduler import RequestScheduler
+from link_weighting import compute_link_weights, normalize_weights
+from relevance import RelevanceIndex
+from document_index import DocumentIndex
+from text_processing import normalize_word, load_stop_words, title_words, text_words, STOP_WORD_FILE
+from delta_stream import GraphDeltaStream
+from network_format import encode_network, write_network_dump, dump_extension, COMPRESSIONS
+from frontier import Frontier, STRATEGIES
+from pipeline import BatchStage, join_stages
+from job_manager import JobManager
+from result_store import ResultStore, restore_network, dump_name
+from citation_graph import CitationGraph
+from epmc_replay import FixtureRecorder
+from metrics import MetricsRegistry, current_build, start_metrics_server
+from build_budget import BuildBudget
+from json_stream import JSONRecordStream, reduce_records
+from layout import force_layout, node_positions
+from network_summary import summarize
 import sys
-from collections import Counter
 
 epmc_endpoint = "http://www.ebi.ac.uk/europepmc/webservices/rest/"
 
@@ -20,13 +48,80 @@ TIMING = True
 NO_CLIENT = False
 DUMP_FILE = False
 STOP_WORDS = True
+STREAM_DELTAS = False
+WS_COMPRESSION = False
+DUMP_FORMAT = "json"
+DUMP_COMPRESSION = None
+SPECULATIVE_PAGING = True
+frontier_strategy = "discovery"
+citations_frontier_strategy = "relevance"
 reference_threshold = 100
 explored_threshold = -1
 papers_threshold = 300
 cur_step_ref_buffer_size = 25
 cur_step_cit_buffer_size = 1
 mined_terms_search_buffer_size = 25
+abstract_batch_size = 100
+pipeline_queue_size = 1000
+abstract_workers = 2
+terms_workers = 4
 same_author_weight = 1
+CACHE = False
+CACHE_FILE = "cache/epmc_responses.sqlite"
+cache_max_size = 256 * 1024 * 1024
+cache_ttls = {
+    "references" : 30 * 24 * 3600,
+    "citations" : 24 * 3600,
+    "textMinedTerms" : 30 * 24 * 3600,
+    "search" : 7 * 24 * 3600,
+    "profile" : 24 * 3600,
+    "other" : 24 * 3600
+}
+response_cache = None
+max_connections = 100
+max_connections_per_host = 50
+http_engine = None
+min_concurrency = 2
+max_concurrency = 64
+requests_per_second = 20.0
+latency_target = 2.0
+request_scheduler = None
+max_running_jobs = 4
+max_queued_jobs = 16
+job_manager = None
+process_workers = 2
+process_pool = None
+RESULT_STORE = True
+result_max_age = 7 * 24 * 3600
+result_store = None
+CITATION_GRAPH = True
+CITATION_GRAPH_FILE = "cache/citation_graph.sqlite"
+citation_graph = None
+RECORD_FIXTURES = False
+FIXTURES_FILE = "fixtures/epmc_fixtures.jsonl.gz"
+fixture_recorder = None
+phase_listeners = []
+metrics_port = 9100
+metrics_history = 20
+metrics_registry = None
+PROFILING = False
+profiled_build = None
+build_deadline = 0
+build_max_requests = 0
+STREAM_PARSING = True
+LAYOUT = False
+layout_iterations = 100
+layout_warm_iterations = 20
+layout_theta = 0.9
+top_k = 0
+disparity_alpha = 0
+COMMUNITIES = False
+CLUSTER_GRAPH = False
+SEND_ABSTRACTS = True
+search_page_size = 1000
+search_max_results = 10000
+search_partition_pages = 5
+search_first_year = 1500
 
 def isfloat(value):
     try:
@@ -36,18 +131,67 @@ def isfloat(value):
         return False
 
 def read_config():
+    global epmc_endpoint
     global VERBOSITY
     global TIMING
     global NO_CLIENT
     global DUMP_FILE
     global STOP_WORDS
+    global SPECULATIVE_PAGING
+    global frontier_strategy
+    global citations_frontier_strategy
+    global STREAM_DELTAS
+    global WS_COMPRESSION
+    global DUMP_FORMAT
+    global DUMP_COMPRESSION
     global reference_threshold
     global explored_threshold
     global papers_threshold
     global cur_step_ref_buffer_size
     global cur_step_cit_buffer_size
     global mined_terms_search_buffer_size
+    global abstract_batch_size
+    global pipeline_queue_size
+    global abstract_workers
+    global terms_workers
     global same_author_weight
+    global CACHE
+    global CACHE_FILE
+    global cache_max_size
+    global max_connections
+    global max_connections_per_host
+    global min_concurrency
+    global max_concurrency
+    global requests_per_second
+    global latency_target
+    global max_running_jobs
+    global max_queued_jobs
+    global process_workers
+    global RESULT_STORE
+    global result_max_age
+    global CITATION_GRAPH
+    global CITATION_GRAPH_FILE
+    global RECORD_FIXTURES
+    global FIXTURES_FILE
+    global metrics_port
+    global metrics_history
+    global PROFILING
+    global build_deadline
+    global build_max_requests
+    global STREAM_PARSING
+    global LAYOUT
+    global layout_iterations
+    global layout_warm_iterations
+    global layout_theta
+    global top_k
+    global disparity_alpha
+    global COMMUNITIES
+    global CLUSTER_GRAPH
+    global SEND_ABSTRACTS
+    global search_page_size
+    global search_max_results
+    global search_partition_pages
+    global search_first_year
     # read config file
     if VERBOSITY > 0: print("Reading config file...")
     with open("server.conf", 'r') as config_file:
@@ -60,22 +204,280 @@ def read_config():
             if (len(line) > 0) and (line[0] != '#'):
                 param = line.split("=", 1)
                 if (param[0] == "VERBOSITY"): VERBOSITY = int(param[1])
+                elif (param[0] == "epmc_endpoint"): epmc_endpoint = param[1] if param[1].endswith("/") else param[1] + "/"
                 elif (param[0] == "TIMING") and (param[1] == "True"): TIMING = True
                 elif (param[0] == "NO_CLIENT") and (param[1] == "True"): NO_CLIENT = True
                 elif (param[0] == "DUMP_FILE") and (param[1] == "True"): DUMP_FILE = True
                 elif (param[0] == "STOP_WORDS") and (param[1] == "True"): STOP_WORDS = True
+                elif (param[0] == "SPECULATIVE_PAGING"): SPECULATIVE_PAGING = (param[1] == "True")
+                elif (param[0] == "frontier_strategy") and (param[1] in STRATEGIES): frontier_strategy = param[1]
+                elif (param[0] == "citations_frontier_strategy") and (param[1] in STRATEGIES): citations_frontier_strategy = param[1]
+                elif (param[0] == "STREAM_DELTAS"): STREAM_DELTAS = (param[1] == "True")
+                elif (param[0] == "WS_COMPRESSION"): WS_COMPRESSION = (param[1] == "True")
+                elif (param[0] == "DUMP_FORMAT") and (param[1] in ["json", "columnar"]): DUMP_FORMAT = param[1]
+                elif (param[0] == "DUMP_COMPRESSION"): DUMP_COMPRESSION = param[1] if param[1] in COMPRESSIONS else None
                 elif (param[0] == "reference_threshold"): reference_threshold = int(param[1])
                 elif (param[0] == "explored_threshold"): explored_threshold = int(param[1])
                 elif (param[0] == "papers_threshold"): papers_threshold = int(param[1])
                 elif (param[0] == "cur_step_ref_buffer_size"): cur_step_ref_buffer_size = int(param[1])
                 elif (param[0] == "cur_step_cit_buffer_size"): cur_step_cit_buffer_size = int(param[1])
                 elif (param[0] == "mined_terms_search_buffer_size"): mined_terms_search_buffer_size = int(param[1])
+                elif (param[0] == "abstract_batch_size"): abstract_batch_size = int(param[1])
+                elif (param[0] == "pipeline_queue_size"): pipeline_queue_size = int(param[1])
+                elif (param[0] == "abstract_workers"): abstract_workers = int(param[1])
+                elif (param[0] == "terms_workers"): terms_workers = int(param[1])
                 elif (param[0] == "same_author_weight"): same_author_weight = int(param[1])
+                elif (param[0] == "CACHE"): CACHE = (param[1] == "True")
+                elif (param[0] == "CACHE_FILE"): CACHE_FILE = param[1]
+                elif (param[0] == "cache_max_size"): cache_max_size = int(param[1])
+                elif (param[0] == "max_connections"): max_connections = int(param[1])
+                elif (param[0] == "max_connections_per_host"): max_connections_per_host = int(param[1])
+                elif (param[0] == "min_concurrency"): min_concurrency = int(param[1])
+                elif (param[0] == "max_concurrency"): max_concurrency = int(param[1])
+                elif (param[0] == "requests_per_second") and isfloat(param[1]): requests_per_second = float(param[1])
+                elif (param[0] == "latency_target") and isfloat(param[1]): latency_target = float(param[1])
+                elif (param[0] == "max_running_jobs"): max_running_jobs = int(param[1])
+                elif (param[0] == "max_queued_jobs"): max_queued_jobs = int(param[1])
+                elif (param[0] == "process_workers"): process_workers = int(param[1])
+                elif (param[0] == "RESULT_STORE"): RESULT_STORE = (param[1] == "True")
+                elif (param[0] == "result_max_age"): result_max_age = int(param[1])
+                elif (param[0] == "CITATION_GRAPH"): CITATION_GRAPH = (param[1] == "True")
+                elif (param[0] == "CITATION_GRAPH_FILE"): CITATION_GRAPH_FILE = param[1]
+                elif (param[0] == "RECORD_FIXTURES"): RECORD_FIXTURES = (param[1] == "True")
+                elif (param[0] == "FIXTURES_FILE"): FIXTURES_FILE = param[1]
+                elif (param[0] == "metrics_port"): metrics_port = int(param[1])
+                elif (param[0] == "metrics_history"): metrics_history = int(param[1])
+                elif (param[0] == "PROFILING"): PROFILING = (param[1] == "True")
+                elif (param[0] == "build_deadline"): build_deadline = float(param[1])
+                elif (param[0] == "build_max_requests"): build_max_requests = int(param[1])
+                elif (param[0] == "STREAM_PARSING"): STREAM_PARSING = (param[1] == "True")
+                elif (param[0] == "LAYOUT"): LAYOUT = (param[1] == "True")
+                elif (param[0] == "layout_iterations"): layout_iterations = int(param[1])
+                elif (param[0] == "layout_warm_iterations"): layout_warm_iterations = int(param[1])
+                elif (param[0] == "layout_theta"): layout_theta = float(param[1])
+                elif (param[0] == "top_k"): top_k = int(param[1])
+                elif (param[0] == "disparity_alpha"): disparity_alpha = float(param[1])
+                elif (param[0] == "COMMUNITIES"): COMMUNITIES = (param[1] == "True")
+                elif (param[0] == "CLUSTER_GRAPH"): CLUSTER_GRAPH = (param[1] == "True")
+                elif (param[0] == "SEND_ABSTRACTS"): SEND_ABSTRACTS = (param[1] == "True")
+                elif (param[0] == "search_page_size"): search_page_size = int(param[1])
+                elif (param[0] == "search_max_results"): search_max_results = int(param[1])
+                elif (param[0] == "search_partition_pages"): search_partition_pages = int(param[1])
+                elif (param[0] == "search_first_year"): search_first_year = int(param[1])
+                elif (param[0].startswith("cache_ttl_")) and (param[0][len("cache_ttl_"):] in cache_ttls): cache_ttls[param[0][len("cache_ttl_"):]] = int(param[1])
                 if VERBOSITY > 1: print(" .config: {0} = {1}".format(param[0], param[1]))
     if VERBOSITY > 0: print("Done\n")
 
+def get_response_cache():
+    # the cache is opened once and shared by every build of the server
+    global response_cache
+    if not CACHE: return None
+    if response_cache is None:
+        response_cache = ResponseCache(CACHE_FILE, max_size = cache_max_size, ttls = cache_ttls)
+        if VERBOSITY > 1: print("Opened response cache {0}".format(response_cache))
+    else:
+        response_cache.max_size = cache_max_size
+        response_cache.ttls = dict(cache_ttls)
+    return response_cache
+
+def get_http_engine():
+    # one pooled session for the whole server, shared by concurrent builds
+    global http_engine
+    if http_engine is None:
+        http_engine = HttpEngine(max_connections = max_connections, max_connections_per_host = max_connections_per_host)
+    return http_engine
+
+def get_request_scheduler():
+    # the rate ceiling toward Europe PMC holds for the whole server
+    global request_scheduler
+    if request_scheduler is None:
+        request_scheduler = RequestScheduler(min_concurrency = min_concurrency, max_concurrency = max_concurrency, initial_concurrency = min(max(8, min_concurrency), max_concurrency), requests_per_second = requests_per_second, latency_target = latency_target)
+    else:
+        request_scheduler.configure(min_concurrency, max_concurrency, requests_per_second, latency_target)
+    return request_scheduler
+
+def get_job_manager():
+    # builds of every client go through one manager, which bounds how many run at once
+    global job_manager
+    if job_manager is None:
+        job_manager = JobManager(max_running = max_running_jobs, max_queued = max_queued_jobs)
+    else:
+        job_manager.configure(max_running_jobs, max_queued_jobs)
+    return job_manager
+
+def get_process_pool():
+    # worker processes for the CPU heavy steps, None to run them in the event loop
+    global process_pool
+    if (process_pool is None) and (process_workers > 0):
+        process_pool = ProcessPoolExecutor(max_workers = process_workers)
+    return process_pool
+
+def get_result_store():
+    # index of the networks in dumps/, read once
+    global result_store
+    if result_store is None:
+        result_store = ResultStore("dumps", max_age = result_max_age)
+        if VERBOSITY > 1: print("Opened {0}".format(result_store))
+    else:
+        result_store.max_age = result_max_age
+    return result_store
+
+def get_citation_graph():
+    # reference and citation lists fetched by every build, reused until their ttl expires
+    global citation_graph
+    if not CITATION_GRAPH: return None
+    if citation_graph is None:
+        citation_graph = CitationGraph(CITATION_GRAPH_FILE, ttls = cache_ttls)
+        if VERBOSITY > 1: print("Opened {0}".format(citation_graph))
+    else:
+        citation_graph.ttls = dict(cache_ttls)
+    return citation_graph
+
+def get_fixture_recorder():
+    # record mode : every response is kept, to be replayed by epmc_replay.py
+    global fixture_recorder
+    if not RECORD_FIXTURES: return None
+    if (fixture_recorder is None) or (fixture_recorder.file_name != FIXTURES_FILE):
+        if fixture_recorder is not None: fixture_recorder.commit()
+        fixture_recorder = FixtureRecorder(FIXTURES_FILE, epmc_endpoint)
+        if VERBOSITY > 1: print("Opened {0}".format(fixture_recorder))
+    else:
+        fixture_recorder.endpoint = epmc_endpoint
+    return fixture_recorder
+
+def get_metrics():
+    # requests, latencies and discoveries of every build, by phase
+    global metrics_registry
+    if metrics_registry is None:
+        metrics_registry = MetricsRegistry(history = metrics_history)
+    return metrics_registry
+
+def server_stats():
+    # the "stats" message : builds metrics and the state of the shared parts of the server
+    stats = { "type" : "stats", "metrics" : get_metrics().stats(), "jobs" : get_job_manager().stats(), "scheduler" : get_request_scheduler().stats() }
+    if response_cache is not None: stats["cache"] = response_cache.stats()
+    if citation_graph is not None: stats["citation_graph"] = citation_graph.stats()
+    if result_store is not None: stats["result_store"] = result_store.stats()
+    return stats
+
+def prometheus_metrics():
+    # the numbers of the "stats" message that are not per build become gauges
+    gauges = dict()
+    stats = server_stats()
+    for part in ["jobs", "scheduler", "cache", "citation_graph", "result_store"]:
+        for (name, value) in stats.get(part, {}).items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool): gauges[part + "_" + name] = value
+    return get_metrics().prometheus(gauges)
+
+def enter_phase(output, phase, known_papers = None):
+    # listeners (output, phase) hear when a build, sending to output, starts a phase
+    build_metrics = current_build.get()
+    if build_metrics is not None:
+        if known_papers is None: build_metrics.enter(phase)
+        else: build_metrics.enter(phase, len(known_papers), known_papers.relations_count)
+    for listener in phase_listeners: listener(output, phase)
+
+def start_profile():
+    # cProfile and tracemalloc see the whole server process while the build runs,
+    # so one build at a time is profiled
+    global profiled_build
+    if profiled_build is not None:
+        raise ValueError("profile : another build is being profiled, try again later")
+    profiled_build = cProfile.Profile()
+    tracemalloc.start()
+    profiled_build.enable()
+    return profiled_build
+
+def stop_profile(profiler, build_metrics):
+    # the "profile" message : functions by cumulative time, peak and largest allocations
+    global profiled_build
+    profiler.disable()
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    profiled_build = None
+    text = io.StringIO()
+    pstats.Stats(profiler, stream = text).sort_stats("cumulative").print_stats(40)
+    allocations = [{ "line" : str(statistic.traceback), "bytes" : statistic.size, "blocks" : statistic.count } for statistic in snapshot.statistics("lineno")[:20]]
+    return { "type" : "profile", "build_id" : build_metrics.id, "cprofile" : text.getvalue(), "peak_memory_bytes" : peak_memory, "allocations" : allocations }
+
+async def run_cpu_bound(function, *args, **kwargs):
+    # function and arguments are sent to a worker process, the loop keeps serving the other builds
+    pool = get_process_pool()
+    if pool is None: return function(*args, **kwargs)
+    return await asyncio.get_event_loop().run_in_executor(pool, functools.partial(function, *args, **kwargs))
+
+def parse_client_request(payload):
+    # a bare paper id, or a JSON object :
+    # { "seed" : id or [ids], "format" : "json" | "columnar", "compression" : null | "zlib", "stream" : true | false, "strategy" : frontier strategy }
+    # or { "search" : terms, "has_references" : true | false, "max_results" : count } for the seeds of a build,
+    # or { "cancel" : job id } to stop following a build, { "stats" : true } for the server metrics
+    # ("format" : "prometheus" for the text dump), and "profile" : true profiles a build if PROFILING is on
+    # "deadline" : seconds and "max_requests" : count bound the build, null for no limit
+    # "layout" : true adds the x and y of every node, laid out by the server
+    # "top_k" : k keeps the k heaviest links of every paper, "disparity" : alpha the backbone links,
+    # "communities" : true adds the community of every node, "clusters" : true sends the graph of
+    # the communities before the network, "abstracts" : false sends the nodes without abstract
+    text = payload.decode('utf8').strip()
+    request = { "seed" : text, "format" : "json", "compression" : None, "stream" : STREAM_DELTAS, "strategy" : frontier_strategy, "profile" : False, "layout" : LAYOUT,
+        "top_k" : top_k, "disparity" : disparity_alpha, "communities" : COMMUNITIES, "clusters" : CLUSTER_GRAPH, "abstracts" : SEND_ABSTRACTS,
+        "deadline" : build_deadline if build_deadline > 0 else None, "max_requests" : build_max_requests if build_max_requests > 0 else None }
+    if text.startswith("{"):
+        try:
+            request.update(json.loads(text))
+        except ValueError:
+            raise ValueError("request : expected a paper id or a JSON object, found {0}".format(text))
+    if "cancel" in request:
+        if not isinstance(request["cancel"], str):
+            raise ValueError("cancel : expected a job id, found {0}".format(request["cancel"]))
+        return { "cancel" : request["cancel"] }
+    if "stats" in request:
+        if not request["format"] in ["json", "prometheus"]:
+            raise ValueError("stats format : expected 'json' or 'prometheus', found {0}".format(request["format"]))
+        return { "stats" : True, "format" : request["format"] }
+    if "search" in request:
+        search = { "search" : request["search"], "has_references" : request.get("has_references", True), "max_results" : request.get("max_results", search_max_results) }
+        if not isinstance(search["search"], str) or (len(search["search"].strip()) == 0):
+            raise ValueError("search : expected search terms, found {0}".format(search["search"]))
+        if not isinstance(search["has_references"], bool):
+            raise ValueError("has_references : expected true or false, found {0}".format(search["has_references"]))
+        if not (isinstance(search["max_results"], int) and (search["max_results"] > 0)):
+            raise ValueError("max_results : expected a count > 0, found {0}".format(search["max_results"]))
+        return search
+    # several seeds (e.g. the results of a search) make one network, a tuple so the job key can hold it
+    if isinstance(request["seed"], list) and (len(request["seed"]) > 0) and all(isinstance(id, str) and (len(id) > 0) for id in request["seed"]):
+        seeds = tuple(dict.fromkeys(request["seed"]))
+        request["seed"] = seeds[0] if len(seeds) == 1 else seeds
+    elif not isinstance(request["seed"], str) or (len(request["seed"]) == 0):
+        raise ValueError("seed : expected a paper id or a list of paper ids, found {0}".format(request["seed"]))
+    if not request["format"] in ["json", "columnar"]:
+        raise ValueError("format : expected 'json' or 'columnar', found {0}".format(request["format"]))
+    if not request["compression"] in COMPRESSIONS:
+        raise ValueError("compression : expected one of {0}, found {1}".format(list(COMPRESSIONS.keys()), request["compression"]))
+    if not request["strategy"] in STRATEGIES:
+        raise ValueError("strategy : expected one of {0}, found {1}".format(STRATEGIES, request["strategy"]))
+    if request["profile"] and not PROFILING:
+        raise ValueError("profile : profiling is off on this server (PROFILING in server.conf)")
+    if not ((request["deadline"] is None) or (isinstance(request["deadline"], (int, float)) and (request["deadline"] > 0))):
+        raise ValueError("deadline : expected seconds > 0 or null, found {0}".format(request["deadline"]))
+    if not ((request["max_requests"] is None) or (isinstance(request["max_requests"], int) and (request["max_requests"] > 0))):
+        raise ValueError("max_requests : expected a count > 0 or null, found {0}".format(request["max_requests"]))
+    for name in ["layout", "communities", "clusters", "abstracts"]:
+        if not isinstance(request[name], bool):
+            raise ValueError("{0} : expected true or false, found {1}".format(name, request[name]))
+    if not (isinstance(request["top_k"], int) and (request["top_k"] >= 0)):
+        raise ValueError("top_k : expected a count >= 0 (0 keeps every link), found {0}".format(request["top_k"]))
+    if not (isinstance(request["disparity"], (int, float)) and (0 <= request["disparity"] < 1)):
+        raise ValueError("disparity : expected a level in [0, 1) (0 keeps every link), found {0}".format(request["disparity"]))
+    return request
+
 if NO_CLIENT: client = open("dumps/sent_to_client.txt", "w")
-if STOP_WORDS: stop_words_set = set()
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def get_stop_words():
+    # the stop words list is read once, the first time it is needed
+    return load_stop_words(STOP_WORD_FILE) if STOP_WORDS else None
 
 # ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
 
@@ -88,150 +490,275 @@ class MyServerProtocol(WebSocketServerProtocol):
     def onOpen(self):
         print("WebSocket connection open.")
 
-    def onMessage(self, payload, isBinary):
+    async def onMessage(self, payload, isBinary):
+       # autobahn runs coroutine handlers as tasks : a build no longer blocks the loop
        print("received: {0}".format(payload.decode('utf8')))
        read_config()
        self.sendMessage(payload,isBinary)
-       self.build_paper_network(initial_paper_id = payload.decode('utf8'), reference_threshold = reference_threshold, explored_threshold = explored_threshold, papers_threshold = papers_threshold, cur_step_ref_buffer_size = cur_step_ref_buffer_size, cur_step_cit_buffer_size = cur_step_cit_buffer_size, mined_terms_search_buffer_size = mined_terms_search_buffer_size, same_author_weight = same_author_weight)
+       # builds run as jobs : identical requests share one build, which is cancelled
+       # once no client follows it anymore
+       try:
+           request = parse_client_request(payload)
+           if "cancel" in request:
+               get_job_manager().cancel(request["cancel"], self)
+               return
+           if "stats" in request:
+               if request["format"] == "prometheus": self.send(json.dumps({ "type" : "stats", "format" : "prometheus", "text" : prometheus_metrics() }))
+               else: self.send(json.dumps(server_stats()))
+               return
+           if "search" in request:
+               parameters = dict(terms = request["search"], has_references = request["has_references"], max_results = request["max_results"], page_size = search_page_size)
+               job = get_job_manager().submit(("search",) + tuple(sorted(parameters.items())), parameters, self, lambda job : search_stream(job, **parameters))
+               if VERBOSITY > 0: print("{0} for search '{1}'".format(job, request["search"]))
+               return
+           parameters = dict(initial_paper_id = request["seed"], wire_format = request["format"], compression = request["compression"], stream_deltas = request["stream"], frontier_strategy = request["strategy"], citations_frontier_strategy = citations_frontier_strategy, reference_threshold = reference_threshold, explored_threshold = explored_threshold, papers_threshold = papers_threshold, cur_step_ref_buffer_size = cur_step_ref_buffer_size, cur_step_cit_buffer_size = cur_step_cit_buffer_size, mined_terms_search_buffer_size = mined_terms_search_buffer_size, same_author_weight = same_author_weight, deadline = request["deadline"], max_requests = request["max_requests"], layout = request["layout"], top_k = request["top_k"], disparity = request["disparity"], communities = request["communities"], clusters = request["clusters"], abstracts = request["abstracts"], profile = request["profile"])
+           job = get_job_manager().submit(tuple(sorted(parameters.items())), parameters, self, lambda job : self.build_paper_network(output = job, **parameters))
+           if VERBOSITY > 0: print("{0} for {1}".format(job, request["seed"]))
+       except ValueError as error:
+           self.send(json.dumps({ "type" : "error", "message" : str(error) }))
 
         
 
     def onClose(self, wasClean, code, reason):
         print("WebSocket connection closed: {0}".format(reason))
+        get_job_manager().disconnect(self)
 
     def send(self,message):
         if NO_CLIENT: client.write(message + "\n")
         else: self.sendMessage(payload = message.encode('utf-8'), isBinary = False)   
+
+    def send_binary(self, data):
+        if NO_CLIENT: client.write("<{0} bytes of binary data>\n".format(len(data)))
+        else: self.sendMessage(payload = data, isBinary = True)
+
+    async def send_network(self, output, stream, final_data, wire_format, compression):
+        # a streaming client already has the whole network
+        if stream.send is not None: stream.done(phase = 6)
+        elif wire_format == "columnar": output.send_binary(await run_cpu_bound(encode_network, final_data, compression))
+        elif compression == "zlib": output.send_binary(zlib.compress(json.dumps(final_data).encode('utf-8')))
+        else: output.send(json.dumps(final_data))
    
    
     # ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
 
-    def build_paper_network(self, initial_paper_id, reference_threshold = 2000, explored_threshold = 5000, papers_threshold = 5000, cur_step_ref_buffer_size = 10, cur_step_cit_buffer_size = 2, mined_terms_search_buffer_size = 10, abstract_buffer_size = 25, same_author_weight = 1):
-        (known_papers, known_relations, word_count, word_frequency) = dict(), dict(), dict(), dict()
-        (explored, to_explore, retrieved_abstracts) = set(), [], set()
+    async def build_paper_network(self, initial_paper_id, output = None, profile = False, **parameters):
+        # output : where messages go (send and send_binary), the connection itself by default
+        # the metrics of the build follow it into the stage workers it starts
+        if output is None: output = self
+        profiler = start_profile() if profile else None
+        build_metrics = get_metrics().start(getattr(output, "id", None), initial_paper_id)
+        token = current_build.set(build_metrics)
+        status = "failed"
+        try:
+            final_data = await self.build_network(initial_paper_id, output = output, **parameters)
+            status = "done"
+            return final_data
+        except asyncio.CancelledError:
+            status = "cancelled"
+            raise
+        finally:
+            current_build.reset(token)
+            get_metrics().finish(build_metrics, status)
+            if profiler is not None: output.send(json.dumps(stop_profile(profiler, build_metrics)))
+            if VERBOSITY > 1: print("Build {0} {1} : {2}".format(build_metrics.id, status, build_metrics.totals().to_dict()))
+
+    async def build_network(self, initial_paper_id, reference_threshold = 2000, explored_threshold = 5000, papers_threshold = 5000, cur_step_ref_buffer_size = 10, cur_step_cit_buffer_size = 2, mined_terms_search_buffer_size = 10, abstract_buffer_size = 1000, same_author_weight = 1, wire_format = "json", compression = None, stream_deltas = False, frontier_strategy = "discovery", citations_frontier_strategy = "relevance", deadline = None, max_requests = None, layout = False, top_k = 0, disparity = 0, communities = False, clusters = False, abstracts = True, output = None):
+        # output : where messages go (send and send_binary), the connection itself by default
+        # deadline (seconds) and max_requests bound the build : each phase gets a share of them,
+        # the crawl and the stages stop when it is used and the network is made with what was found
+        if output is None: output = self
+        build_metrics = current_build.get()
+        budget = BuildBudget(deadline, max_requests, requests_used = lambda : build_metrics.requests if build_metrics is not None else 0)
+        # several seeds (a tuple of ids) grow one network around all of them, which is named
+        # after the first seed found and is neither looked for in nor added to the result store
+        seeds = [initial_paper_id] if isinstance(initial_paper_id, str) else list(initial_paper_id)
+        (initial_paper_id, storable) = (seeds[0], len(seeds) == 1)
+        known_papers = PaperStore()
+        # requests given up after their retries, stage workers included : the network misses what
+        # they would have brought. The progress messages carry the URLs given up since the previous
+        # message, final_data all of them
+        abandoned_sent = [0]
+        def with_abandoned(message):
+            urls = list(build_metrics.abandoned_urls)[abandoned_sent[0]:] if build_metrics is not None else []
+            abandoned_sent[0] += len(urls)
+            return dict(message, requests_abandoned = abandoned_sent[0], abandoned_urls = urls)
+        # title and abstract words of the known papers, over one shared vocabulary
+        titles_index = DocumentIndex()
+        abstracts_index = DocumentIndex(titles_index.vocabulary)
+        (explored, citations_explored) = set(), set()
         stop_looking = False
+        # nodes and links are indexed (and streamed if wanted) as they are discovered
+        stream = GraphDeltaStream(output.send if stream_deltas else None)
         if TIMING: total_time = 0
-        # find initial paper
-        result = search_papers([initial_paper_id])
-        for res in result:
-            if res.id == initial_paper_id:
-                initial_paper_src = res.src
-                known_papers[initial_paper_id] = res
-        if not initial_paper_id in known_papers:
-            if VERBOSITY > 0: print ("could not find initial paper in {0} paper(s)".format(len(result)))
-            return {}
-        # init search
-        cur_step_papers = [(initial_paper_src, initial_paper_id)]
+        # a network stored for the same request is sent as is, a smaller one is extended
+        requested_thresholds = { "reference_threshold" : reference_threshold, "explored_threshold" : explored_threshold, "papers_threshold" : papers_threshold }
+        (stored_name, exact) = get_result_store().find(initial_paper_id, requested_thresholds, same_author_weight) if RESULT_STORE and storable else (None, False)
+        if exact:
+            if VERBOSITY > 0: print("Sending the network stored in {0}".format(stored_name))
+            final_data = get_result_store().load(stored_name)
+            final_data.pop("meta", None)
+            restore_network(final_data, known_papers)
+            stream.flush(known_papers, phase = 6)
+            stream.update_weights(map(lambda link : link["weight"], final_data["links"]), phase = 6)
+            if layout and (node_positions(final_data["nodes"]) is None): await add_layout(final_data)
+            if layout: stream.update_positions(final_data["nodes"], phase = 6)
+            final_data = await summarize_network(output, stream, final_data, top_k, disparity, communities, clusters, abstracts)
+            await self.send_network(output, stream, final_data, wire_format, compression)
+            return final_data
+        if stored_name is not None:
+            # the stored papers and relations are known, what they explored is not explored again
+            if VERBOSITY > 0: print("Extending the network stored in {0}".format(stored_name))
+            stored_data = get_result_store().load(stored_name)
+            stored_meta = restore_network(stored_data, known_papers)
+            # its layout, if it has one, is where the new layout starts from
+            stored_positions = node_positions(stored_data["nodes"])
+            del stored_data
+            initial_paper_src = known_papers[initial_paper_id].src
+            explored.update(map(lambda index : known_papers.ids[index], stored_meta["explored"]))
+            citations_explored.update(map(lambda index : known_papers.ids[index], stored_meta["citations_explored"]))
+        else:
+            # find the seeds, their core details come with their abstracts
+            found = await budget.step("setup", find_papers(seeds))
+            result = dict((res.id, res) for res in found) if found is not None else dict()
+            for id in seeds:
+                if id in result: known_papers.add_details(result[id])
+            seeds = list(filter(lambda id : id in known_papers, seeds))
+            if len(seeds) == 0:
+                if VERBOSITY > 0: print ("could not find initial paper in {0} paper(s)".format(len(result)))
+                return {}
+            initial_paper_id = seeds[0]
+            initial_paper_src = known_papers[initial_paper_id].src
+        # abstracts and mined terms are fetched by concurrent stages as soon as the papers
+        # are found, and the relevance index takes them in as they arrive
+        term_counts = dict()
+        relevance_index = RelevanceIndex()
+        terms_phase = 1
+        async def fetch_abstracts(ids):
+            if budget.exhausted() is not None:
+                budget.cut("abstracts", budget.exhausted(), skipped = budget.cut_short.get("abstracts", {}).get("skipped", 0) + len(ids))
+                return
+            abstracts = await get_abstracts(list(map(lambda id : (known_papers[id].src, id), ids)))
+            index_abstracts(abstracts, known_papers, abstracts_index)
+            for id in abstracts: relevance_index.set_word_counts(id, abstracts_index.term_counts(id))
+            if VERBOSITY > 1: print("\n. Requested abstracts for {0} / {1} paper(s)\n".format(abstracts_stage.processed + len(ids), abstracts_stage.queued))
+        async def fetch_mined_terms(ids):
+            if budget.exhausted() is not None:
+                budget.cut("mined_terms", budget.exhausted(), skipped = budget.cut_short.get("mined_terms", {}).get("skipped", 0) + len(ids))
+                return
+            # each page is counted in as soon as it is received
+            def add_terms(JSON_resp):
+                if 'errCode' in JSON_resp:
+                    raise ValueError("epmc api error : {0} - {1}".format(JSON_resp['errCode'], JSON_resp['errMsg']))
+                else:
+                    cur_id = JSON_resp['request']['id']
+                    if not (cur_id in term_counts): term_counts[cur_id] = dict()
+                    if 'semanticTypeList' in JSON_resp:
+                        for semantic_type in JSON_resp['semanticTypeList']['semanticType']:
+                            for (term, count) in semantic_type['tmSummary']:
+                                term_counts[cur_id][term] = count
+            await perform_mined_terms_queries(list(map(lambda id : (known_papers[id].src, id), ids)), page_size = 1000, max_retry_iter = 2, on_response = add_terms)
+            for id in ids:
+                if id in term_counts: relevance_index.set_terms(id, term_counts[id])
+            # - - - - - - - - - - - - - SEND TO CLIENT - - - - - - - - - - - - -
+            message = {
+                "phase" : terms_phase,
+                "papers_known" : terms_stage.queued,
+                "papers_explored_for_terms" : terms_stage.processed + len(ids)
+            }
+            output.send(json.dumps(with_abandoned(message)))
+            # - - - - - - - - - - - - - SEND TO CLIENT - - - - - - - - - - - - -
+            if VERBOSITY > 1: print("\n. Requested mined terms for {0} / {1} paper(s)\n".format(terms_stage.processed + len(ids), terms_stage.queued))
+        abstracts_stage = BatchStage(fetch_abstracts, batch_size = abstract_buffer_size, workers = abstract_workers, queue_size = pipeline_queue_size, name = "abstracts")
+        terms_stage = BatchStage(fetch_mined_terms, batch_size = mined_terms_search_buffer_size, workers = terms_workers, queue_size = pipeline_queue_size, name = "mined terms")
+        # the initial paper came with its abstract, stored papers with their abstracts and mined terms
+        if stored_name is not None:
+            for (index, terms) in enumerate(stored_meta["terms"]): term_counts[known_papers.ids[index]] = terms
+        for id in known_papers:
+            titles_index.add_document(id, extract_normalized_words_from_title(known_papers[id].title))
+            if len(known_papers[id].abstract) > 0:
+                index_abstracts({ id : known_papers[id].abstract }, known_papers, abstracts_index)
+                relevance_index.set_word_counts(id, abstracts_index.term_counts(id))
+            if id in term_counts: relevance_index.set_terms(id, term_counts[id])
+        if stored_name is None: await terms_stage.put(seeds)
+        # init search, the next papers to expand are taken from the frontier
+        frontier = Frontier(known_papers, frontier_strategy, phase = 0)
+        if stored_name is None: cur_step_papers = list(map(lambda id : (known_papers[id].src, id), seeds))
+        else:
+            frontier.push_all(known_papers)
+            cur_step_papers = frontier.pop(cur_step_ref_buffer_size, skip = explored) if len(known_papers) < reference_threshold else []
+            stop_looking = len(cur_step_papers) == 0
         
         # --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- ---
         
+        enter_phase(output, 0, known_papers)
         if VERBOSITY > 0: print("\n- - - - - - - - - Looking for referenced papers (0) - - - - - - - - -\n")
         if TIMING: start_time = time.time()
         # process until we have found as much referenced papers as wanted
-        while (len(known_papers) < reference_threshold) and (not stop_looking):
+        while (len(known_papers) < reference_threshold) and (not stop_looking) and (not budget.stop(0)):
             # Get more papers related to already known papers
-            result = search_related_papers(related_to = cur_step_papers, look_for = ["references"], request_page_size = 1000, known_papers = known_papers, known_relations = known_relations, word_count = word_count)
-            # Retrieve abstracts for all known papers
-            abstracts_to_retrieve = list(filter(lambda id : not (id in retrieved_abstracts), list(known_papers.keys())))
-            if VERBOSITY > 1: print("..Retrieve abstracts for known papers")
-            while len(abstracts_to_retrieve) > 0:
-                abstracts = get_abstracts(abstracts_to_retrieve[:abstract_buffer_size])
-                for id in abstracts_to_retrieve[:abstract_buffer_size]: retrieved_abstracts.add(id)
-                abstracts_to_retrieve = abstracts_to_retrieve[abstract_buffer_size:]
-                for id in abstracts:
-                    word_frequency[id] = dict()
-                    known_papers[id].abstract = abstracts[id]
-                    words_list = list(map(normalize_word, abstracts[id].split(" ")))
-                    if STOP_WORDS: words_list = list(filter(lambda word : not (word in stop_words_set), words_list))
-                    if len(words_list) > 0:
-                        words_count = Counter(words_list)
-                        for word in word_count:
-                            word_frequency[id][word] = words_count[word] / len(words_list)
-                if VERBOSITY > 1: print("\n. Requested abstracts for {0} / {1} paper(s)\n".format(len(retrieved_abstracts), len(known_papers)))
+            papers_count = len(known_papers)
+            result = await budget.step(0, search_related_papers(related_to = cur_step_papers, look_for = ["references"], request_page_size = 1000, known_papers = known_papers, titles_index = titles_index))
+            if result is None: break
+            frontier.record(len(cur_step_papers), result['requests'], len(known_papers) - papers_count)
+            # the abstracts and mined terms of the new papers are fetched while the crawl goes on
+            await abstracts_stage.put(known_papers.ids[papers_count:])
+            await terms_stage.put(known_papers.ids[papers_count:])
             # Update our variables
             explored.update(set(map(lambda x : x[1], cur_step_papers)))
-            known_papers = result['papers']
-            known_relations = result['relations']
-            to_explore = list(filter(lambda id : not (id in explored), known_papers)) # TODO: sort to explore to explore first relevant papers            
-            # check if there still is papers to explore
-            if (len(to_explore) > 0) and (len(known_papers) < reference_threshold):
-                # choose next step's papers (to explore)
-                cur_step_papers = list(map(lambda id : (known_papers[id].src, id), to_explore[:cur_step_ref_buffer_size]))
-                # remove these papers from the to_explore list
-                to_explore = to_explore[cur_step_ref_buffer_size:]
-                # we also use this iteration over every paper to count the number of occurence of each word
-                # this count will be used later to weight the relations between papers
-                word_count = result['word_count']
-            else: stop_looking = True
+            frontier.push_all(known_papers.ids[papers_count:])
+            if frontier_strategy == "relevance": frontier.set_scores(abstracts_relevance(seeds, known_papers, abstracts_index))
+            # choose next step's papers (to explore) if we still need some
+            cur_step_papers = frontier.pop(cur_step_ref_buffer_size, skip = explored) if len(known_papers) < reference_threshold else []
+            if len(cur_step_papers) == 0: stop_looking = True
             # - - - - - - - - - - - - - SEND TO CLIENT - - - - - - - - - - - - -
-            relations_count = sum(list(map(lambda x : len(known_relations[x]), known_relations)))
+            stream.flush(known_papers, phase = 0)
+            relations_count = known_papers.relations_count
             message = {
                 "phase" : 0,
                 "papers_found" : len(known_papers),
                 "papers_explored" : len(explored),
                 "relations_found": relations_count
             }
-            self.send(json.dumps(message))
+            output.send(json.dumps(with_abandoned(message)))
             # - - - - - - - - - - - - - SEND TO CLIENT - - - - - - - - - - - - -
             
             if VERBOSITY > 1:
                 print("\n. Explored {0} / {1} paper(s)".format(len(explored), len(known_papers)))
-                print(". Found {0} relation(s)\n".format(sum(list(map(lambda x : len(known_relations[x]), known_relations)))))
+                print(". Found {0} relation(s)\n".format(known_papers.relations_count))
         if TIMING:
             print("done in {0} seconds".format(time.time() - start_time))
             total_time += time.time() - start_time
         
         # --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- ---
         
+        enter_phase(output, 1, known_papers)
         if VERBOSITY > 0: print("\n- - - - - - - - - Requesting mined terms for referenced papers (1) - - - - - - - - -\n")    
         if TIMING: start_time = time.time()
-        term_counts = dict()
-        referenced_papers_to_explore = list(map(lambda id: (known_papers[id].src, id), known_papers))
-        init_count = len(referenced_papers_to_explore)
-        while len(referenced_papers_to_explore) > 0:
-            responses = perform_queries(build_mined_terms_queries(referenced_papers_to_explore[:mined_terms_search_buffer_size], page_size = 1000), max_retry_iter = 2)
-            for JSON_resp in responses:
-                if 'errCode' in JSON_resp:
-                    raise ValueError("epmc api error : {0} - {1}".format(JSON_resp['errCode'], JSON_resp['errMsg']))
-                else:
-                    cur_id = JSON_resp['request']['id']
-                    if not (cur_id in term_counts): term_counts[cur_id] = dict()
-                    if 'semanticTypeList' in JSON_resp:
-                        for semantic_type in JSON_resp['semanticTypeList']['semanticType']:
-                            for term in semantic_type['tmSummary']:
-                                term_counts[cur_id][term['term']] = term['count']
-            referenced_papers_to_explore = referenced_papers_to_explore[mined_terms_search_buffer_size:]
-            
-            # - - - - - - - - - - - - - SEND TO CLIENT - - - - - - - - - - - - -
-            relations_count = sum(list(map(lambda x : len(known_relations[x]), known_relations)))
-            message = {
-                "phase" : 1,
-                "papers_known" : init_count,
-                "papers_explored_for_terms" : init_count - len(referenced_papers_to_explore)
-            }
-            self.send(json.dumps(message))
-            # - - - - - - - - - - - - - SEND TO CLIENT - - - - - - - - - - - - -
-            
-            if VERBOSITY > 1: print("\n. Requested mined terms for {0} / {1} paper(s)\n".format(init_count - len(referenced_papers_to_explore), init_count))                  
+        # the stages have been fetching since the first papers were found, wait for them to catch up ;
+        # out of time, the next phases go on with the terms fetched so far and the stages keep fetching
+        if not await join_stages(terms_stage, abstracts_stage, timeout = budget.remaining(1)): budget.cut(1, "deadline")
+        terms_phase = 5
+        # - - - - - - - - - - - - - SEND TO CLIENT - - - - - - - - - - - - -
+        message = {
+            "phase" : 1,
+            "papers_known" : terms_stage.queued,
+            "papers_explored_for_terms" : terms_stage.processed
+        }
+        output.send(json.dumps(with_abandoned(message)))
+        # - - - - - - - - - - - - - SEND TO CLIENT - - - - - - - - - - - - -
         if TIMING:
             print("done in {0} seconds".format(time.time() - start_time))
             total_time += time.time() - start_time
         
         # --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- ---
         
+        enter_phase(output, 2, known_papers)
         if VERBOSITY > 0: print("\n- - - - - - - - - Calculating relevance for referenced papers based on mined terms (2) - - - - - - - - -\n")    
         if TIMING: start_time = time.time()
         
-        papers_relevance = dict()
-        for id in known_papers:
-            if id != initial_paper_id:
-                relevance = 0
-                if initial_paper_id in term_counts:
-                    for term_in_init in term_counts[initial_paper_id]:
-                        if id in term_counts:
-                            for term_in_other in term_counts[id]:
-                                if term_in_init == term_in_other: relevance += 1
-                papers_relevance[id] = relevance
+        # relevance : cosine similarity to the seeds (their centroid) of the TF-IDF vectors
+        # over mined terms and abstract words, indexed as they were fetched
+        papers_relevance = relevance_index.similarities(seeds, list(filter(lambda id : not id in seeds, known_papers)))
         
         if VERBOSITY > 1:
             average = 0
@@ -245,189 +772,166 @@ class MyServerProtocol(WebSocketServerProtocol):
         
         # --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- ---
         
-        citations_for_top = 50
+        enter_phase(output, 3, known_papers)
         if VERBOSITY > 0: print("\n- - - - - - - - - Looking for relevant citations (3) - - - - - - - - -\n")    
         if TIMING: start_time = time.time()
         
-        relevant_ref_papers = list(filter(lambda id : (id in papers_relevance), known_papers))
-        referenced_papers = list(map(lambda id: (id, papers_relevance[id]), relevant_ref_papers))
-        referenced_papers.sort(key = lambda rp : rp[1], reverse = True)
-        referenced_papers_to_explore = list(map(lambda rp : (known_papers[rp[0]].src, rp[0]), referenced_papers))
-        stop_looking = False if len(referenced_papers_to_explore) > 0 else False
+        # papers found here join the frontier, after the ones scored in phase 2 for the relevance strategy
+        citations_frontier = Frontier(known_papers, citations_frontier_strategy, scores = papers_relevance, phase = 3)
+        citations_frontier.push_all(filter(lambda id : (id in papers_relevance) and not (id in citations_explored), known_papers))
+        cur_step_papers = citations_frontier.pop(cur_step_cit_buffer_size)
+        stop_looking = False if len(cur_step_papers) > 0 else True
         
         # Get more papers related to already known papers
-        while (len(known_papers) < papers_threshold) and (not stop_looking):
-            result = search_related_papers(related_to = referenced_papers_to_explore[:cur_step_cit_buffer_size], look_for = ["citations", "references"], request_page_size = 1000, known_papers = known_papers, known_relations = known_relations, word_count = word_count)
-            # Retrieve abstracts for all known papers
-            abstracts_to_retrieve = list(filter(lambda id : not (id in retrieved_abstracts), list(known_papers.keys())))
-            if VERBOSITY > 1: print("..Retrieve abstracts for known papers")
-            while len(abstracts_to_retrieve) > 0:
-                abstracts = get_abstracts(abstracts_to_retrieve[:abstract_buffer_size])
-                for id in abstracts_to_retrieve[:abstract_buffer_size]: retrieved_abstracts.add(id)
-                abstracts_to_retrieve = abstracts_to_retrieve[abstract_buffer_size:]
-                for id in abstracts:
-                    known_papers[id].abstract = abstracts[id]
-                    words_list = list(map(normalize_word, abstracts[id].split(" ")))
-                    if STOP_WORDS: words_list = list(filter(lambda word : not (word in stop_words_set), words_list))
-                    if len(words_list) > 0:                    
-                        words_count = Counter(words_list)
-                        for word in word_count:
-                            word_frequency[id][word] = words_count[word] / len(words_list)
-                if VERBOSITY > 1: print("\n. Requested abstracts for {0} / {1} paper(s)\n".format(len(retrieved_abstracts), len(known_papers)))
+        while (len(known_papers) < papers_threshold) and (not stop_looking) and (not budget.stop(3)):
+            papers_count = len(known_papers)
+            result = await budget.step(3, search_related_papers(related_to = cur_step_papers, look_for = ["citations", "references"], request_page_size = 1000, known_papers = known_papers, titles_index = titles_index))
+            if result is None: break
+            citations_frontier.record(len(cur_step_papers), result['requests'], len(known_papers) - papers_count)
+            citations_explored.update(map(lambda x : x[1], cur_step_papers))
+            # the abstracts and mined terms of the new papers are fetched while the crawl goes on
+            await abstracts_stage.put(known_papers.ids[papers_count:])
+            await terms_stage.put(known_papers.ids[papers_count:])
             # Update our variables
-            explored.update(set(referenced_papers_to_explore[:cur_step_cit_buffer_size]))
-            referenced_papers_to_explore = referenced_papers_to_explore[cur_step_cit_buffer_size:]
+            explored.update(set(map(lambda x : x[1], cur_step_papers)))
+            citations_frontier.push_all(known_papers.ids[papers_count:])
+            cur_step_papers = citations_frontier.pop(cur_step_cit_buffer_size)
             if len(cur_step_papers) == 0: stop_looking = True
-            known_papers = result['papers']
-            known_relations = result['relations']
-            word_count = result['word_count']
             
             # - - - - - - - - - - - - - SEND TO CLIENT - - - - - - - - - - - - -
-            relations_count = sum(list(map(lambda x : len(known_relations[x]), known_relations)))
+            stream.flush(known_papers, phase = 3)
+            relations_count = known_papers.relations_count
             message = {
                 "phase" : 3,
                 "papers_found" : len(known_papers),
                 "papers_explored" : len(explored),
                 "relations_found": relations_count
             }
-            self.send(json.dumps(message))
+            output.send(json.dumps(with_abandoned(message)))
             # - - - - - - - - - - - - - SEND TO CLIENT - - - - - - - - - - - - -
             
             if VERBOSITY > 1:
                 print("\n. Explored {0} / {1} paper(s)".format(len(explored), len(known_papers)))
-                print(". Found {0} relation(s)\n".format(sum(list(map(lambda x : len(known_relations[x]), known_relations)))))
+                print(". Found {0} relation(s)\n".format(known_papers.relations_count))
         if TIMING:
             print("done in {0} seconds".format(time.time() - start_time))
             total_time += time.time() - start_time
 
         # --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- ---
         
+        enter_phase(output, 4, known_papers)
         if VERBOSITY > 0: print("\n- - - - - - - - - Looking for relations between know papers (4) - - - - - - - - -\n")    
         if TIMING: start_time = time.time()
         
-        to_explore = list(filter(lambda id : not (id in explored), known_papers)) # TODO: sort to explore to explore first relevant papers
-        stop_looking = False if (len(to_explore) > 0) else True
+        # papers explored from here only get their relations to the papers known now
+        references_explored = set(explored)
+        relations_frontier = Frontier(known_papers, frontier_strategy, scores = papers_relevance, phase = 4)
+        relations_frontier.push_all(filter(lambda id : not (id in explored), known_papers))
         if explored_threshold == -1: explored_threshold = len(known_papers)
+        cur_step_papers = relations_frontier.pop(cur_step_ref_buffer_size)
+        stop_looking = False if (len(cur_step_papers) > 0) else True
         # Once we have enough papers, we look for the relations between them
-        while (len(explored) < explored_threshold) and (not stop_looking):
+        while (len(explored) < explored_threshold) and (not stop_looking) and (not budget.stop(4)):
             # Get relations not found previously
-            known_relations = search_relations(related_to = cur_step_papers, look_for = ["references"], request_page_size = 1000, known_papers = known_papers, known_relations = known_relations)
-            # Update explored and to_explore
+            result = await budget.step(4, search_relations(related_to = cur_step_papers, look_for = ["references"], request_page_size = 1000, known_papers = known_papers))
+            if result is None: break
+            relations_frontier.record(len(cur_step_papers), result['requests'])
+            # Update explored and choose the next papers to explore
             explored.update(set(map(lambda x : x[1], cur_step_papers)))
-            to_explore = list(filter(lambda id : not (id in explored), known_papers)) # TODO: sort to explore to explore first relevant papers
-            # check if there still is papers to explore and choose the next one to explore
-            if (len(to_explore) > 0) and (len(explored) < explored_threshold):
-                cur_step_papers = list(map(lambda id : (known_papers[id].src, id), to_explore[:cur_step_ref_buffer_size]))
-            else: stop_looking = True
+            cur_step_papers = relations_frontier.pop(cur_step_ref_buffer_size) if len(explored) < explored_threshold else []
+            if len(cur_step_papers) == 0: stop_looking = True
             # - - - - - - - - - - - - - SEND TO CLIENT - - - - - - - - - - - - -
-            relations_count = sum(list(map(lambda x : len(known_relations[x]), known_relations)))
+            stream.flush(known_papers, phase = 4)
+            relations_count = known_papers.relations_count
             message = {
                 "phase" : 4,
                 "papers_found" : len(known_papers),
                 "papers_explored" : len(explored),
                 "relations_found": relations_count
             }
-            self.send(json.dumps(message))
+            output.send(json.dumps(with_abandoned(message)))
             # - - - - - - - - - - - - - SEND TO CLIENT - - - - - - - - - - - - -
             
             if VERBOSITY > 1:
                 print("\n. Explored {0} / {1} paper(s)".format(len(explored), len(known_papers)))
-                print(". Found {0} relation(s)\n".format(sum(list(map(lambda x : len(known_relations[x]), known_relations)))))
+                print(". Found {0} relation(s)\n".format(known_papers.relations_count))
         if TIMING:
             print("done in {0} seconds".format(time.time() - start_time))
             total_time += time.time() - start_time
+        # requests spent by each frontier strategy to expand the papers
+        frontiers = [frontier.report(), citations_frontier.report(), relations_frontier.report()]
+        if VERBOSITY > 0:
+            for report in frontiers:
+                print(". phase {0} ({1}) : {2} paper(s) expanded with {3} request(s), {4} new paper(s)".format(report["phase"], report["strategy"], report["papers_expanded"], report["requests"], report["papers_found"]))
+        output.send(json.dumps({ "type" : "frontier", "frontiers" : frontiers }))
         if TIMING: start_time = time.time()
 
         # --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- ---
         
+        enter_phase(output, 5, known_papers)
         if VERBOSITY > 0: print("\n- - - - - - - - - Requesting mined terms for new papers (5) - - - - - - - - -\n")    
         if TIMING: start_time = time.time()
-        need_to_request_mined_terms = []
-        for id in known_papers:
-            if not (id in term_counts): need_to_request_mined_terms.append(id)
-        referenced_papers_to_explore = list(map(lambda id: (known_papers[id].src, id), need_to_request_mined_terms))
-        init_count = len(referenced_papers_to_explore)
-        while len(referenced_papers_to_explore) > 0:
-            responses = perform_queries(build_mined_terms_queries(referenced_papers_to_explore[:mined_terms_search_buffer_size], page_size = 1000), max_retry_iter = 2)
-            for JSON_resp in responses:
-                if 'errCode' in JSON_resp:
-                    raise ValueError("epmc api error : {0} - {1}".format(JSON_resp['errCode'], JSON_resp['errMsg']))
-                else:
-                    cur_id = JSON_resp['request']['id']
-                    if not (cur_id in term_counts): term_counts[cur_id] = dict()
-                    if 'semanticTypeList' in JSON_resp:
-                        for semantic_type in JSON_resp['semanticTypeList']['semanticType']:
-                            for term in semantic_type['tmSummary']:
-                                term_counts[cur_id][term['term']] = term['count']
-            referenced_papers_to_explore = referenced_papers_to_explore[mined_terms_search_buffer_size:]
-            
-            # - - - - - - - - - - - - - SEND TO CLIENT - - - - - - - - - - - - -
-            relations_count = sum(list(map(lambda x : len(known_relations[x]), known_relations)))
-            message = {
-                "phase" : 5,
-                "papers_known" : init_count,
-                "papers_explored_for_terms" : init_count - len(referenced_papers_to_explore)
-            }
-            self.send(json.dumps(message))
-            # - - - - - - - - - - - - - SEND TO CLIENT - - - - - - - - - - - - -
-            
-            if VERBOSITY > 1: print("\n. Requested mined terms for {0} / {1} paper(s)\n".format(init_count - len(referenced_papers_to_explore), init_count))                  
+        # the papers found since phase 1 were queued as they came ; out of time, the papers
+        # still queued are weighted without their mined terms
+        if not await join_stages(terms_stage, abstracts_stage, timeout = budget.remaining(5)):
+            budget.cut(5, "deadline", papers_without_terms = terms_stage.pending())
+            terms_stage.cancel()
+            abstracts_stage.cancel()
+        # - - - - - - - - - - - - - SEND TO CLIENT - - - - - - - - - - - - -
+        message = {
+            "phase" : 5,
+            "papers_known" : terms_stage.queued,
+            "papers_explored_for_terms" : terms_stage.processed
+        }
+        output.send(json.dumps(with_abandoned(message)))
+        # - - - - - - - - - - - - - SEND TO CLIENT - - - - - - - - - - - - -
         if TIMING:
             print("done in {0} seconds".format(time.time() - start_time))
             total_time += time.time() - start_time
         
         # --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- ---    
         
+        enter_phase(output, 6, known_papers)
         if VERBOSITY > 0: print("\n- - - - - - - - - Producing final data (6) - - - - - - - - -\n")    
         if TIMING: start_time = time.time()
         final_data = { 'title': 'final' , 'nodes' : [], 'links' : [] }    
         
-        relations_to_weight = sum(list(map(lambda x : len(known_relations[x]), known_relations)))
-        
-        indexes = dict()
+        # nodes and links keep the indexes of the paper store, which were streamed
+        stream.flush(known_papers, phase = 6)
+        links = list(known_papers.relations())
+        papers_ids = known_papers.ids
         
         # ADD papers to node
-        for key in known_papers:
+        for (index, key) in enumerate(papers_ids):
             # add to final data
             final_data['nodes'].append(known_papers[key].to_dict())
-            index = len(final_data['nodes']) - 1
             # set index
             final_data['nodes'][index]["index"] = index
-            indexes[known_papers[key].id] = index
             # init links
             final_data['nodes'][index]["links"] = []
         
         # set links for papers
-        for paper1 in final_data['nodes']:
-            paper1_id = paper1["id"]
-            paper1_index = indexes[paper1_id]
-            if paper1_id in known_relations:
-                for paper2_id in known_relations[paper1_id]:
-                    paper2_index = indexes[paper2_id]
-                    paper2 = final_data["nodes"][paper2_index]
-                    paper1["links"].append(paper2_index) # references
-                    paper2["links"].append(paper1_index) # citations
-        
-        # add links data
-        for paper1 in known_relations:
-            for paper2 in known_relations[paper1]:
-                weight = 0
-                for word_p1 in extract_normalized_words_from_title(known_papers[paper1].title):
-                    for word_p2 in extract_normalized_words_from_title(known_papers[paper2].title):
-                        if word_p1 == word_p2: weight += 1 / (word_count[word_p1] / len(known_papers))
-                if paper1 in term_counts:
-                    for term_p1 in term_counts[paper1]:
-                        if paper2 in term_counts:
-                            for term_p2 in term_counts[paper2]:
-                                if term_p1 == term_p2: weight += term_counts[paper2][term_p1]/term_counts[paper1][term_p1]
-                for author1 in known_papers[paper1].authors:
-                    for author2 in known_papers[paper2].authors:
-                        if author1 == author2: weight += same_author_weight
-                final_data["links"].append({"source" : indexes[paper1], "target" : indexes[paper2], "weight" : weight})                 
+        for link in links:
+            final_data["nodes"][link[0]]["links"].append(link[1]) # references
+            final_data["nodes"][link[1]]["links"].append(link[0]) # citations
         
-        max_weight = max(list(map(lambda link: link["weight"], final_data["links"])))
-        for link in final_data["links"]:
-            link["weight"] = link["weight"] / max_weight
+        # add links data : every weight is computed at once from sparse paper x item matrices
+        weights = await run_cpu_bound(compute_link_weights, links,
+            titles_words = list(map(lambda id : titles_index.words(id) if id in titles_index else extract_normalized_words_from_title(known_papers[id].title), papers_ids)),
+            word_count = titles_index.document_frequencies(),
+            papers_count = len(known_papers),
+            papers_terms = list(map(lambda id : term_counts[id] if id in term_counts else {}, papers_ids)),
+            papers_authors = list(map(lambda id : known_papers[id].authors, papers_ids)),
+            same_author_weight = same_author_weight)
+        weights = normalize_weights(weights).tolist()
+        for (link, weight) in zip(links, weights):
+            final_data["links"].append({"source" : link[0], "target" : link[1], "weight" : weight})
+        stream.update_weights(weights, phase = 6)
+        # node positions, from the stored network when it is extended ; skipped out of time
+        if layout and (budget.exhausted() != "deadline"):
+            await add_layout(final_data, stored_positions if stored_name is not None else None)
+            stream.update_positions(final_data["nodes"], phase = 6)
+        elif layout: budget.cut("layout", "deadline")
 
         if TIMING:
             print("done in {0} seconds".format(time.time() - start_time))
@@ -435,13 +939,31 @@ class MyServerProtocol(WebSocketServerProtocol):
 
         # --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- ---    
         
-        file_name = "dumps/papers_init{0}-{1}_ref{2}_expl{3}_find{4}.json".format(initial_paper_src, initial_paper_id, str(reference_threshold), str(explored_threshold), str(papers_threshold))
+        # named after the requested thresholds, so the same request finds it again
+        file_name = dump_name(initial_paper_src, initial_paper_id, reference_threshold, requested_thresholds["explored_threshold"], papers_threshold, dump_extension(DUMP_FORMAT, DUMP_COMPRESSION))
         
-        if DUMP_FILE:
-            with open(file_name, 'w') as outfile:
-                outfile.write(json.dumps(final_data, indent=4, sort_keys=True))
+        # a network cut short, or missing abandoned requests, is not stored as the answer to the request
+        if budget.limited(): output.send(json.dumps(dict(budget.report(), type = "budget")))
+        if len(budget.cut_short) > 0:
+            final_data["budget"] = budget.report()
+            if VERBOSITY > 0: print("Build cut short : {0}".format(budget.cut_short))
+
+        if (build_metrics is not None) and (len(build_metrics.abandoned_urls) > 0):
+            final_data["abandoned"] = list(map(lambda url : dict(build_metrics.abandoned_urls[url], url = url), build_metrics.abandoned_urls))
+            if VERBOSITY > 0: print("Build missing {0} abandoned request(s)".format(len(final_data["abandoned"])))
 
-        self.send(json.dumps(final_data))
+        if DUMP_FILE and storable and (len(budget.cut_short) == 0) and not ("abandoned" in final_data):
+            # what was explored and the mined terms let a later build extend this network
+            meta = dict(requested_thresholds, seed = initial_paper_id, src = initial_paper_src, same_author_weight = same_author_weight,
+                explored = sorted(map(known_papers.index, references_explored)),
+                citations_explored = sorted(map(known_papers.index, citations_explored)),
+                terms = list(map(lambda id : term_counts.get(id, {}), papers_ids)))
+            write_network_dump(os.path.join("dumps", file_name), dict(final_data, meta = meta), DUMP_FORMAT, DUMP_COMPRESSION)
+            get_result_store().add(file_name, dict(requested_thresholds, seed = initial_paper_id, src = initial_paper_src, same_author_weight = same_author_weight, nodes_count = len(final_data["nodes"]), links_count = len(final_data["links"]), resumable = True))
+
+        # what this request asked for, the whole network is what was stored
+        final_data = await summarize_network(output, stream, final_data, top_k, disparity, communities, clusters, abstracts)
+        await self.send_network(output, stream, final_data, wire_format, compression)
         
         if TIMING: print("\ntotal execution time for the search: {0} seconds".format(total_time))
         if VERBOSITY > 0: print("\n - ^ - ^ - ^ - ^ - ^ - ^ - ^ - ^ - ^ - ^ - ^ - ^ - ^ - ^ - ^ -\n -III-III-III-III-III-III-III-III-III-III-III-III-III-III-III-\n - v - v - v - v - v - v - v - v - v - v - v - v - v - v - v -\n")
@@ -450,15 +972,59 @@ class MyServerProtocol(WebSocketServerProtocol):
         
 # ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
 
-def search_papers(terms = [], page_size = 1000):
+async def add_layout(final_data, known_positions = None):
+    # x and y of every node, from the links weighted as in final_data ; known_positions :
+    # the positions of the first nodes in a previous layout, which only needs a few iterations then
+    links = final_data["links"]
+    warm = (known_positions is not None) and (len(known_positions) > 0)
+    positions = await run_cpu_bound(force_layout, len(final_data["nodes"]),
+        list(map(lambda link : link["source"], links)), list(map(lambda link : link["target"], links)), list(map(lambda link : link["weight"], links)),
+        known_positions = known_positions, iterations = layout_warm_iterations if warm else layout_iterations, theta = layout_theta)
+    for (node, (x, y)) in zip(final_data["nodes"], positions.tolist()):
+        (node["x"], node["y"]) = (round(x, 3), round(y, 3))
+    final_data["node_columns"] = final_data.get("node_columns", []) + [name for name in ["x", "y"] if not name in final_data.get("node_columns", [])]
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+async def summarize_network(output, stream, final_data, top_k = 0, disparity = 0, communities = False, clusters = False, abstracts = True):
+    # a copy of final_data as the request wants it (see parse_client_request) ; the graph of
+    # the communities is sent right away, before the network
+    if (top_k == 0) and (disparity == 0) and not (communities or clusters) and abstracts: return final_data
+    (nodes, links) = (final_data["nodes"], final_data["links"])
+    (labels, graph, kept) = await run_cpu_bound(summarize, list(map(lambda link : link["source"], links)), list(map(lambda link : link["target"], links)), list(map(lambda link : link["weight"], links)),
+        list(map(lambda node : node["citedCount"], nodes)), list(map(lambda node : node["title"], nodes)), top_k = top_k, disparity = disparity, communities = communities, clusters = clusters)
+    summary = dict(final_data, nodes = list(map(dict, nodes)))
+    if graph is not None: output.send(json.dumps(dict(graph, type = "clusters")))
+    if labels is not None:
+        for (node, label) in zip(summary["nodes"], labels): node["community"] = label
+        summary["node_columns"] = final_data.get("node_columns", []) + ([] if "community" in final_data.get("node_columns", []) else ["community"])
+        stream.update_communities(labels, phase = 6)
+    if kept is not None:
+        summary["links"] = list(map(lambda index : links[index], kept))
+        for node in summary["nodes"]: node["links"] = []
+        for link in summary["links"]:
+            summary["nodes"][link["source"]]["links"].append(link["target"])
+            summary["nodes"][link["target"]]["links"].append(link["source"])
+        stream.keep_links(kept, phase = 6)
+    if not abstracts:
+        for node in summary["nodes"]: node.pop("abstract", None)
+    return summary
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+async def search_papers(terms = [], page_size = 1000, result_type = "lite"):
     if TIMING: start_time = time.time()
     # set up queries
-    query_base_url = epmc_endpoint + "search?format=json&pageSize=" + str(page_size) + "&query=" + format_search_terms(terms) + "&page="
-    hit_count = estimate_search_hit_count(terms)
-    page_count = calc_page_count(hit_count, page_size)
-    query_urls = set(list(map(lambda p : query_base_url + str(p), range(1, page_count + 1))))
-    # perform queries
-    responses = perform_queries(query_urls, max_retry_iter = 3)
+    query_base_url = epmc_endpoint + "search?format=json&resulttype=" + result_type + "&pageSize=" + str(page_size) + "&query=" + format_search_terms(terms) + "&page="
+    if SPECULATIVE_PAGING:
+        # the first page tells how many pages follow, no need for a profile query
+        responses = await perform_paged_queries({ query_base_url + "1" : lambda p : query_base_url + str(p) }, page_size, max_retry_iter = 3)
+    else:
+        hit_count = await estimate_search_hit_count(terms)
+        page_count = calc_page_count(hit_count, page_size)
+        query_urls = set(list(map(lambda p : query_base_url + str(p), range(1, page_count + 1))))
+        # perform queries
+        responses = await perform_queries(query_urls, max_retry_iter = 3)
     # handle responses
     query_results = set()
     for JSON_resp in responses:
@@ -472,123 +1038,235 @@ def search_papers(terms = [], page_size = 1000):
     return query_results
     
 # ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
-    
-def search_related_papers(related_to, look_for, request_page_size, known_papers, known_relations, word_count):
-    query_urls = build_relation_queries(papers = related_to, relation_types = look_for, page_size = request_page_size)
-    responses = perform_queries(query_urls, max_retry_iter = 3)
-    # handle responses
-    found_ids = set()
-    for JSON_resp in responses:
-        if 'errCode' in JSON_resp:
-            raise ValueError("epmc api error : {0} - {1}".format(JSON_resp['errCode'], JSON_resp['errMsg']))
-        else:
-            cur_id = JSON_resp['request']['id']
-            if ('referenceList' in JSON_resp) or ('citationList' in JSON_resp):
-                if 'referenceList' in JSON_resp: (list_header, item_header, look_for_ref) = 'referenceList', 'reference', True
-                else: (list_header, item_header, look_for_ref) = 'citationList', 'citation', False
-                for paper in extract_LtdPaperDetails(JSON_resp[list_header][item_header]):
-                    #if paper.citedCount > 0:
-                    # Update found_ids and known_papers
-                    found_ids.add(paper.id)
-                    if not (paper.id in known_papers):
-                        # paper.abstract = get_abstract(paper.id)
-                        known_papers[paper.id] = paper
-                    # Update known_relations
-                    if (look_for_ref):
-                        if not cur_id in known_relations: known_relations[cur_id] = set()
-                        known_relations[cur_id].add(paper.id)
-                    else:
-                        if not paper.id in known_relations: known_relations[paper.id] = set()
-                        known_relations[paper.id].add(cur_id)
-                    # Update word_count
-                    for word in extract_normalized_words_from_title(paper.title):
-                        if not word in word_count: word_count[word] = 1
-                        else: word_count[word] += 1
-    return { 'papers' : known_papers, 'relations' : known_relations, 'word_count' : word_count, 'found' : found_ids }
-
-# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
-
-def get_abstract(paper_id):
-    # set up queries
-    query_base_url = epmc_endpoint + "search?format=json&resulttype=core&query=" + str(paper_id)
-    query_urls = set()
-    query_urls.add(query_base_url)
-    # perform queries
-    responses = perform_queries(query_urls, max_retry_iter = 3)
-    # handle responses
-    abstract = ""
+
+async def find_papers(ids, src = None, batch_size = None, page_size = 25):
+    # the papers with these ids, core details with their abstracts : an EXT_ID query only
+    # matches the papers themselves, where a free text query on an id matches every paper
+    # mentioning it ; one query for up to batch_size ids, as in get_abstracts
+    if batch_size is None: batch_size = abstract_batch_size
+    wanted = set(ids)
+    ids = list(ids)
+    first_pages = dict()
+    for batch_start in range(0, len(ids), batch_size):
+        page_url = id_search_page_url_builder(ids[batch_start:batch_start + batch_size], page_size, src)
+        first_pages[page_url(1)] = page_url
+    responses = await perform_paged_queries(first_pages, page_size, max_retry_iter = 3)
+    found = set()
     for JSON_resp in responses:
         if 'errCode' in JSON_resp:
             raise ValueError("epmc api error : {0} - {1}".format(JSON_resp['errCode'], JSON_resp['errMsg']))
         elif 'resultList' in JSON_resp:
-            for paper in JSON_resp['resultList']['result']:
-                if (paper["id"] == paper_id) and ("abstractText" in paper):
-                    abstract = paper["abstractText"]
-    # return papers found
-    return abstract
+            found.update(filter(lambda paper : paper.id in wanted, extract_LtdPaperDetails(JSON_resp['resultList']['result'])))
+    return found
 
 # ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
 
-def get_abstracts(paper_ids):
-    # set up queries
-    query_base_url = epmc_endpoint + "search?format=json&resulttype=core&query="
-    query_urls = set(list(map(lambda id : query_base_url + str(id), paper_ids)))
+async def search_stream(output, terms, has_references = True, max_results = 10000, page_size = 1000):
+    # keyword search for the seeds of a build : the papers found are sent as they arrive in
+    # "search_results" messages, then a "search_done" message. Pages follow each other by cursor
+    # (cursorMark), so deep pages cost no more than the first one ; a search with more pages than
+    # search_partition_pages is split into publication year ranges whose cursors are followed
+    # concurrently, a range being split again while it is too big.
+    query = "(" + terms + ") AND HAS_REFLIST:Y" if has_references else terms
+    def page_url(query, cursor, size):
+        return epmc_endpoint + "search?format=json&resulttype=lite&pageSize=" + str(size) + "&cursorMark=" + quote(cursor) + "&query=" + quote(query)
+    found = dict()                      # id -> paper sent
+    counts = { "requests" : 0, "abandoned" : 0 }
+    async def fetch_page(query, cursor, size = page_size):
+        # the response, None when it could not be fetched
+        responses = await perform_queries(set([page_url(query, cursor, size)]), max_retry_iter = 3, records = SEARCH_RECORDS)
+        counts["requests"] += responses.requests_count
+        counts["abandoned"] += len(responses.abandoned)
+        if len(responses) == 0: return None
+        if 'errCode' in responses[0]:
+            raise ValueError("epmc api error : {0} - {1}".format(responses[0]['errCode'], responses[0]['errMsg']))
+        return responses[0]
+    def send_results(JSON_resp):
+        # the papers of the page not sent yet, those without references left out when asked
+        papers = []
+        for (fields, references) in JSON_resp.get('resultList', {}).get('result', []):
+            if (len(found) >= max_results) or (fields[0] in found) or (has_references and (references != "Y")): continue
+            (id, src, title, authors, pubYear, citedCount, _) = fields
+            found[id] = { "id" : id, "src" : src, "title" : title, "authors" : authors, "pubYear" : pubYear, "citedCount" : citedCount }
+            papers.append(found[id])
+        if len(papers) > 0: output.send(json.dumps({ "type" : "search_results", "papers" : papers, "found" : len(found) }))
+    async def follow_cursor(query, JSON_resp, cursor = "*"):
+        # the next pages, until the cursor stops moving or enough papers are found
+        while (JSON_resp is not None) and (len(found) < max_results) and (len(JSON_resp.get('resultList', {}).get('result', [])) > 0):
+            if JSON_resp.get('nextCursorMark', cursor) == cursor: break
+            cursor = JSON_resp['nextCursorMark']
+            JSON_resp = await fetch_page(query, cursor)
+            if JSON_resp is not None: send_results(JSON_resp)
+    async def search_years(low, high, hit_count = None):
+        # the papers published from low to high ; a range too big for one cursor is split in two
+        range_query = query + " AND PUB_YEAR:[" + str(low) + " TO " + str(high) + "]"
+        if hit_count is None:
+            probe = await fetch_page(range_query, "*", 1)
+            hit_count = probe.get('hitCount', 0) if probe is not None else 0
+        if (hit_count == 0) or (len(found) >= max_results): return
+        if (hit_count > page_size * search_partition_pages) and (low < high):
+            middle = (low + high) // 2
+            await asyncio.gather(search_years(low, middle), search_years(middle + 1, high))
+            return
+        JSON_resp = await fetch_page(range_query, "*")
+        if JSON_resp is not None:
+            send_results(JSON_resp)
+            await follow_cursor(range_query, JSON_resp)
+    # the first page is enough for most searches
+    JSON_resp = await fetch_page(query, "*")
+    hit_count = JSON_resp.get('hitCount', 0) if JSON_resp is not None else 0
+    if JSON_resp is not None: send_results(JSON_resp)
+    if (hit_count > page_size * search_partition_pages) and (len(found) < max_results):
+        await search_years(search_first_year, time.gmtime().tm_year + 1)
+    elif hit_count > page_size: await follow_cursor(query, JSON_resp)
+    output.send(json.dumps({ "type" : "search_done", "terms" : terms, "hit_count" : hit_count, "found" : len(found), "seeds" : list(found),
+        "requests" : counts["requests"], "abandoned" : counts["abandoned"] }))
+    return list(found.values())
+    
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+    
+async def search_related_papers(related_to, look_for, request_page_size, known_papers, titles_index):
+    # known_papers : PaperStore, updated with the papers and relations found
+    # titles_index : DocumentIndex of the titles, updated with the new papers
+    (lists, requests_count) = await get_relation_lists(papers = related_to, relation_types = look_for, page_size = request_page_size, max_retry_iter = 3)
+    found_ids = set()
+    for ((cur_id, relation_type), items) in lists.items():
+        for (paper_id, paper) in items:
+            if paper is None: continue
+            # Update found_ids and known_papers
+            found_ids.add(paper_id)
+            if not paper_id in known_papers:
+                known_papers.add_paper(*paper)
+                titles_index.add_document(paper_id, extract_normalized_words_from_title(paper[2]))
+            # Update relations
+            if relation_type == "references": known_papers.add_relation(cur_id, paper_id)
+            else: known_papers.add_relation(paper_id, cur_id)
+    return { 'papers' : known_papers, 'found' : found_ids, 'requests' : requests_count }
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+async def get_abstracts(papers, batch_size = None, page_size = 1000):
+    # papers : list of (src, id), or of bare ids when the source is unknown
+    if batch_size is None: batch_size = abstract_batch_size
+    # group the papers by source so each query can be constrained by SRC
+    ids_by_src = dict()
+    for paper in papers:
+        (src, id) = paper if isinstance(paper, tuple) else (None, paper)
+        if not src in ids_by_src: ids_by_src[src] = []
+        ids_by_src[src].append(str(id))
+    # set up queries : one boolean query for up to batch_size papers
+    first_pages = dict()
+    for src in ids_by_src:
+        ids = ids_by_src[src]
+        for batch_start in range(0, len(ids), batch_size):
+            page_url = id_search_page_url_builder(ids[batch_start:batch_start + batch_size], page_size, src)
+            first_pages[page_url(1)] = page_url
     # perform queries
-    responses = perform_queries(query_urls, max_retry_iter = 3)
-    # handle responses
+    responses = await perform_paged_queries(first_pages, page_size, max_retry_iter = 3)
+    # handle responses : map every result back to the requested paper
+    wanted = dict()
+    for src in ids_by_src:
+        for id in ids_by_src[src]: wanted[(src, id)] = id
     abstracts = dict()
     for JSON_resp in responses:
         if 'errCode' in JSON_resp:
             raise ValueError("epmc api error : {0} - {1}".format(JSON_resp['errCode'], JSON_resp['errMsg']))
         elif 'resultList' in JSON_resp:
-            cur_id = JSON_resp["request"]["query"]
-            if not cur_id in abstracts:
-                for paper in JSON_resp['resultList']['result']:
-                    if (paper["id"] == cur_id) and ("abstractText" in paper):
-                        abstracts[cur_id] = paper["abstractText"]
+            for paper in JSON_resp['resultList']['result']:
+                if ("abstractText" in paper) and ("id" in paper):
+                    for key in [(paper.get("source"), str(paper["id"])), (None, str(paper["id"]))]:
+                        if (key in wanted) and (not wanted[key] in abstracts):
+                            abstracts[wanted[key]] = paper["abstractText"]
     # return papers found
     return abstracts
 
 # ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
 
+def index_abstracts(abstracts, known_papers, abstracts_index):
+    # store the abstracts and index their words
+    for id in abstracts:
+        known_papers.set_abstract(id, abstracts[id])
+        abstracts_index.add_document(id, extract_normalized_words_from_text(abstracts[id]))
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def abstracts_relevance(seeds, known_papers, abstracts_index):
+    # relevance to the seeds from the abstracts only, before the mined terms are known
+    relevance_index = RelevanceIndex()
+    for id in known_papers:
+        if id in abstracts_index: relevance_index.set_word_counts(id, abstracts_index.term_counts(id))
+    return relevance_index.similarities(seeds)
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def extract_normalized_words_from_text(text):
+    # every normalized word of the text, in order, without stop words
+    return text_words(text, get_stop_words())
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
 def extract_normalized_words_from_title(title):
-    title_normalized_words = set(list(map(normalize_word, title.split(' '))))
-    if STOP_WORDS:
-        return list(filter(lambda word : not (word in stop_words_set), title_normalized_words))
-    else:
-        return list(title_normalized_words)
+    return title_words(title, get_stop_words())
 
 # ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
 
-def search_relations(related_to, look_for, request_page_size, known_papers, known_relations):
-    query_urls = build_relation_queries(papers = related_to, relation_types = look_for, page_size = request_page_size)
-    # perform queries
-    queries = (grequests.get(url) for url in query_urls)
-    responses = perform_queries(query_urls, max_retry_iter = 3)
-    # handle responses
-    for JSON_resp in responses:
-        if 'errCode' in JSON_resp:
-            raise ValueError("epmc api error : {0} - {1}".format(JSON_resp['errCode'], JSON_resp['errMsg']))
-        else:
-            cur_id = JSON_resp['request']['id']
-            if ('referenceList' in JSON_resp) or ('citationList' in JSON_resp):
-                if 'referenceList' in JSON_resp: (list_header, item_header, look_for_ref) = 'referenceList', 'reference', True
-                else: (list_header, item_header, look_for_ref) = 'citationList', 'citation', False
-                for paper in extract_LtdPaperDetails(JSON_resp[list_header][item_header]):
-                    if paper.id in known_papers:
-                        # Update known_relations
-                        if (look_for_ref):
-                            if not cur_id in known_relations: known_relations[cur_id] = set()
-                            known_relations[cur_id].add(paper.id)
-                        else:
-                            if not paper.id in known_relations: known_relations[paper.id] = set()
-                            known_relations[paper.id].add(cur_id)
-    return known_relations
-
-# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
-
-def build_relation_queries(papers, relation_types, page_size):
-    # Parameters type checking
+async def search_relations(related_to, look_for, request_page_size, known_papers):
+    # known_papers : PaperStore, updated with the relations found between its papers
+    (lists, requests_count) = await get_relation_lists(papers = related_to, relation_types = look_for, page_size = request_page_size, max_retry_iter = 3)
+    for ((cur_id, relation_type), items) in lists.items():
+        for (paper_id, _) in items:
+            if paper_id in known_papers:
+                # Update relations
+                if relation_type == "references": known_papers.add_relation(cur_id, paper_id)
+                else: known_papers.add_relation(paper_id, cur_id)
+    return { 'papers' : known_papers, 'requests' : requests_count }
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+async def get_relation_lists(papers, relation_types, page_size, max_retry_iter = 3):
+    # returns ({ (paper id, relation type) : [(related paper id, its fields or None)] }, requests sent)
+    # lists complete and fresh in the citation graph are not requested again, the
+    # lists fetched entirely are stored in it
+    check_papers_list(papers)
+    graph = get_citation_graph()
+    lists = dict()
+    missing = dict()
+    for relation_type in relation_types:
+        missing[relation_type] = []
+        for paper in papers:
+            stored = graph.get_list(paper[1], relation_type) if graph is not None else None
+            if stored is None: missing[relation_type].append(paper)
+            else: lists[(paper[1], relation_type)] = stored
+    build_metrics = current_build.get()
+    if (build_metrics is not None) and (len(lists) > 0): build_metrics.record_graph_hits(len(lists))
+    # one query set per relation type : a response without list still tells its type ; each page
+    # goes into its list as soon as it is received, with its papers already extracted (RELATION_RECORDS)
+    hit_counts = dict()
+    def add_page(relation_type):
+        (list_header, item_header) = ('referenceList', 'reference') if relation_type == "references" else ('citationList', 'citation')
+        def add(JSON_resp):
+            if 'errCode' in JSON_resp:
+                raise ValueError("epmc api error : {0} - {1}".format(JSON_resp['errCode'], JSON_resp['errMsg']))
+            key = (JSON_resp['request']['id'], relation_type)
+            if not key in lists: lists[key] = []
+            if 'hitCount' in JSON_resp: hit_counts[key] = int(JSON_resp['hitCount'])
+            if list_header in JSON_resp: lists[key].extend(JSON_resp[list_header][item_header])
+        return add
+    relation_types = [relation_type for relation_type in relation_types if len(missing[relation_type]) > 0]
+    all_responses = await asyncio.gather(*[perform_relation_queries(papers = missing[relation_type], relation_types = [relation_type], page_size = page_size, max_retry_iter = max_retry_iter, on_response = add_page(relation_type)) for relation_type in relation_types])
+    requests_count = sum(map(lambda responses : responses.requests_count, all_responses))
+    # store the lists received whole, pages abandoned leave them short
+    if graph is not None:
+        sources = dict((paper[1], paper[0]) for paper in papers)
+        for key in hit_counts:
+            if (key in lists) and (key[0] in sources) and (len(lists[key]) >= hit_counts[key]):
+                graph.put_list(sources[key[0]], key[0], key[1], hit_counts[key], lists[key])
+        graph.commit()
+    return (lists, requests_count)
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def check_papers_list(papers):
     if not isinstance(papers, list):
         raise ValueError("papers : expected list of [src, id]")
     for paper in papers:
@@ -597,10 +1275,80 @@ def build_relation_queries(papers, relation_types, page_size):
         for val in paper:
             if not isinstance(val, str):
                 raise ValueError("papers : expected str found {0}".format(type(val).__name__    ))
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def relation_page_url_builder(src, id, relation_type, page_size):
+    return lambda p : epmc_endpoint + src + "/" + id + "/" + relation_type + "/" + str(p) + "/" + str(page_size) + "/json/"
+
+def mined_terms_page_url_builder(src, id, page_size):
+    return lambda p : epmc_endpoint + src + "/" + id + "/textMinedTerms//" + str(p) + "/" + str(page_size) + "/json/"
+
+def id_search_page_url_builder(ids, page_size, src = None):
+    query = "(" + " OR ".join(map(lambda id : "EXT_ID:" + str(id), ids)) + ")" + (" AND SRC:" + src if src is not None else "")
+    return lambda p : epmc_endpoint + "search?format=json&resulttype=core&pageSize=" + str(page_size) + "&query=" + quote(query) + "&page=" + str(p)
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+async def perform_relation_queries(papers, relation_types, page_size, max_retry_iter = 3, on_response = None):
+    # the papers of the lists come as (id, fields or None), see relation_record
+    if not SPECULATIVE_PAGING:
+        return await perform_queries(await build_relation_queries(papers, relation_types, page_size), max_retry_iter = max_retry_iter, records = RELATION_RECORDS, on_response = on_response)
+    # Parameters type checking
+    check_papers_list(papers)
+    # the first page of each list is requested at full size right away
+    first_pages = dict()
+    for relation_type in relation_types:
+        for paper in papers:
+            page_url = relation_page_url_builder(paper[0], paper[1], relation_type, page_size)
+            first_pages[page_url(1)] = page_url
+    return await perform_paged_queries(first_pages, page_size, max_retry_iter = max_retry_iter, records = RELATION_RECORDS, on_response = on_response)
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+async def perform_mined_terms_queries(papers, page_size, max_retry_iter = 3, on_response = None):
+    # the terms of the summaries come as (term, count), see mined_term_record
+    if not SPECULATIVE_PAGING:
+        return await perform_queries(await build_mined_terms_queries(papers, page_size), max_retry_iter = max_retry_iter, records = MINED_TERM_RECORDS, on_response = on_response)
+    # Parameters type checking
+    check_papers_list(papers)
+    first_pages = dict()
+    for paper in papers:
+        page_url = mined_terms_page_url_builder(paper[0], paper[1], page_size)
+        first_pages[page_url(1)] = page_url
+    return await perform_paged_queries(first_pages, page_size, max_retry_iter = max_retry_iter, records = MINED_TERM_RECORDS, on_response = on_response)
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+async def perform_paged_queries(first_pages, page_size, max_retry_iter = 3, records = None, on_response = None):
+    # first_pages : { url of the first page : function giving the url of page p }
+    # records, on_response : see perform_queries
+    # The hitCount of each first page gives the number of pages left, which are
+    # requested as soon as it arrives, without waiting for the other lists.
+    responses = QueryResponses()
+    handle = on_response if on_response is not None else responses.append
+    async def follow_pages(first_page_url, page_url):
+        hit_counts = []
+        def first_page(JSON_resp):
+            if isinstance(JSON_resp.get('hitCount'), int): hit_counts.append(JSON_resp['hitCount'])
+            handle(JSON_resp)
+        responses.merge(await perform_queries(set([first_page_url]), max_retry_iter = max_retry_iter, records = records, on_response = first_page))
+        for hit_count in hit_counts:
+            next_pages = set(map(page_url, range(2, calc_page_count(hit_count, page_size) + 1)))
+            if len(next_pages) > 0:
+                responses.merge(await perform_queries(next_pages, max_retry_iter = max_retry_iter, records = records, on_response = handle))
+    await asyncio.gather(*[follow_pages(url, first_pages[url]) for url in first_pages])
+    return responses
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+async def build_relation_queries(papers, relation_types, page_size):
+    # Parameters type checking
+    check_papers_list(papers)
     # set up queries
     query_urls = set()
     for relation_type in relation_types:
-        for paper in estimate_relation_hit_counts(papers, relation_type):
+        for paper in await estimate_relation_hit_counts(papers, relation_type):
             query_url_b = epmc_endpoint + paper[0] + "/" + paper[1] + "/" + relation_type + "/"
             query_url_e = "/" + str(page_size) + "/json/"
             page_count = calc_page_count(paper[2], page_size)
@@ -610,19 +1358,12 @@ def build_relation_queries(papers, relation_types, page_size):
 
 # ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
 
-def build_mined_terms_queries(papers, page_size):
+async def build_mined_terms_queries(papers, page_size):
     # Parameters type checking
-    if not isinstance(papers, list):
-        raise ValueError("papers : expected list of [src, id]")
-    for paper in papers:
-        if not isinstance(paper, tuple):
-            raise ValueError("papers : expected list of [src, id]")
-        for val in paper:
-            if not isinstance(val, str):
-                raise ValueError("papers : expected str found {0}".format(type(val).__name__    ))
+    check_papers_list(papers)
     # set up queries
     query_urls = set()
-    for paper in estimate_mined_terms_hit_counts(papers):
+    for paper in await estimate_mined_terms_hit_counts(papers):
         query_url_b = epmc_endpoint + paper[0] + "/" + paper[1] + "/textMinedTerms//"
         query_url_e = "/" + str(page_size) + "/json/"
         page_count = calc_page_count(paper[2], page_size)
@@ -632,7 +1373,7 @@ def build_mined_terms_queries(papers, page_size):
 
 # ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
 
-def estimate_relation_hit_count(src = "", id = "", relation_type = ""):
+async def estimate_relation_hit_count(src = "", id = "", relation_type = ""):
     # Parameters type checking
     if not relation_type in ["citations","references"]:
         raise ValueError("relation_type : expected 'citations' or 'references', found {0}".format(relation_type))
@@ -640,19 +1381,19 @@ def estimate_relation_hit_count(src = "", id = "", relation_type = ""):
         raise ValueError("(src, id) : expected (str, str) found ({0}, {1})".format(type(src).__name__, type(id).__name__))
     # Perform count query
     count_query = epmc_endpoint + src + "/" + id + "/" + relation_type + "/1/1/json/"
-    JSON_resp = perform_queries(set([count_query]), max_retry_iter = 2)
+    JSON_resp = await perform_queries(set([count_query]), max_retry_iter = 2)
     # Check the API response
     if (len(JSON_resp) > 0) and (not ('errCode' in JSON_resp[0])): return JSON_resp[0]['hitCount']
     else: raise ValueError("Could not retrieve count data")
 
 # ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
 
-def estimate_relation_hit_counts(papers = [], relation_type = ""):
+async def estimate_relation_hit_counts(papers = [], relation_type = ""):
     # Parameters type checking
         # TODO
     # Perform count query
     count_queries = set(list(map(lambda p : epmc_endpoint + p[0] + "/" + p[1] + "/" + relation_type + "/1/1/json/", papers)))
-    responses = perform_queries(count_queries, max_retry_iter = 2)
+    responses = await perform_queries(count_queries, max_retry_iter = 2)
     # Check the API response
     result = []
     for JSON_resp in responses:
@@ -663,12 +1404,12 @@ def estimate_relation_hit_counts(papers = [], relation_type = ""):
     
 # ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
 
-def estimate_mined_terms_hit_counts(papers = []):
+async def estimate_mined_terms_hit_counts(papers = []):
     # Parameters type checking
         # TODO
     # Perform count query
     count_queries = set(list(map(lambda p : epmc_endpoint + p[0] + "/" + p[1] + "/textMinedTerms//1/1/json/", papers)))
-    responses = perform_queries(count_queries, max_retry_iter = 2)
+    responses = await perform_queries(count_queries, max_retry_iter = 2)
     # Check the API response
     result = []
     for JSON_resp in responses:
@@ -679,10 +1420,10 @@ def estimate_mined_terms_hit_counts(papers = []):
 
 # ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
 
-def estimate_search_hit_count(terms = []):
+async def estimate_search_hit_count(terms = []):
     # Perform count query
     count_query = epmc_endpoint + "profile?format=json&query=" + format_search_terms(terms)
-    JSON_resp = perform_queries(set([count_query]), max_retry_iter = 2)
+    JSON_resp = await perform_queries(set([count_query]), max_retry_iter = 2)
     # Check the API response
     if (len(JSON_resp) > 0) and (not ('errCode' in JSON_resp[0])):
         for pubType in JSON_resp[0]['profileList']['pubType']:
@@ -701,52 +1442,85 @@ def calc_page_count(hit_count = 0, page_size = 1):
 
 # ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
 
-def perform_queries(queries_set = set(), max_retry_iter = 5):
+async def perform_queries(queries_set = set(), max_retry_iter = 5, records = None, on_response = None):
+    # records : { path : function(item) } reducing the items of the arrays at these paths as
+    # they are parsed (see json_stream), so a page is never held whole ; the response cache
+    # keeps the reduced page (marked REDUCED), only the fixture recorder needs whole responses
+    # on_response : function(JSON_resp) handling each response as soon as it is received,
+    # the responses are then not kept
     # Parameters type checking
     if (not isinstance(queries_set, set)) or (not isinstance(max_retry_iter, int)):
         raise ValueError("perform_queries : expected (set, int) found ({0}, {1})".format(type(queries_set).__name__, type(max_retry_iter).__name__))
     # Variable definitions
-    responses = []
-    iter_count = 0
-    # Perfom the queries until we get a response for each
-    # or until we reach the max number of query retry.
-    while (len(queries_set) > 0) and (iter_count < max_retry_iter):
-        if VERBOSITY > 2: print(" .performing {0} API request(s) (attempt number {1})".format(len(queries_set), iter_count))
-        if TIMING: start_time = time.time()
-        # Perform the queries
-        http_queries = (grequests.get(url) for url in queries_set)
-        http_responses = grequests.map(http_queries)
-        # Check for None responses to re-perform related queries
-        for http_response in http_responses:
-            if http_response is not None:
-                try:
-                    responses.append(http_response.json()) # we only use JSON in our case
-                    queries_set.discard(http_response.url)
-                except:
-                    if VERBOSITY > 2: print(" .request failed ({0})".format(http_response.url))
-                http_response.close()
-        # Count the number of iterations
-        iter_count += 1
-        if TIMING and (VERBOSITY > 2): print(" .queries performed in {1} seconds".format(len(queries_set), time.time() - start_time))
+    responses = QueryResponses()
+    queries_set = set(queries_set)
+    # Serve what we can from the response cache
+    cache = get_response_cache()
+    recorder = get_fixture_recorder()
+    build_metrics = current_build.get()
+    if cache is not None:
+        for url in list(queries_set):
+            JSON_resp = cache.get(url)
+            # a reduced page answers the queries reducing it the same way, the recorder needs it whole
+            if (JSON_resp is not None) and JSON_resp.get(REDUCED, False) and ((records is None) or (recorder is not None)): JSON_resp = None
+            if JSON_resp is not None:
+                if recorder is not None: recorder.record(url, JSON_resp)
+                if (records is not None) and not JSON_resp.get(REDUCED, False): reduce_records(JSON_resp, records)
+                if on_response is not None: on_response(JSON_resp)
+                else: responses.append(JSON_resp)
+                queries_set.discard(url)
+                if build_metrics is not None: build_metrics.record_cache_hit()
+        if VERBOSITY > 2: print(" .{0} response(s) served from cache, {1} left to request".format(len(responses), len(queries_set)))
+    if len(queries_set) == 0:
+        if recorder is not None: recorder.commit()
+        return responses
+    # Perfom the queries through the scheduler : each URL is tried up to
+    # max_retry_iter times, with its own backoff between attempts.
+    if VERBOSITY > 2: print(" .performing {0} API request(s) {1}".format(len(queries_set), get_request_scheduler()))
+    if TIMING: start_time = time.time()
+    engine = get_http_engine()
+    attempted = set()
+    handler_errors = []
+    async def fetch(url):
+        responses.requests_count += 1
+        retry = url in attempted
+        attempted.add(url)
+        request_start = time.monotonic()
+        # whole responses are only needed to be recorded
+        keep_whole = recorder is not None
+        try:
+            if (records is None) or not STREAM_PARSING: (JSON_resp, size) = await engine.fetch_json_sized(url) # we only use JSON in our case
+            else: (JSON_resp, size) = await engine.fetch_json_records(url, JSONRecordStream(records, reduce = not keep_whole))
+        except Exception:
+            if build_metrics is not None: build_metrics.record_failure(endpoint_kind(url), retry)
+            raise
+        if build_metrics is not None: build_metrics.record_request(endpoint_kind(url), time.monotonic() - request_start, size, retry)
+        if recorder is not None: recorder.record(url, JSON_resp)
+        if records is not None:
+            if keep_whole or not STREAM_PARSING: reduce_records(JSON_resp, records)
+            JSON_resp[REDUCED] = True
+        if cache is not None: cache.put(url, JSON_resp)
+        if on_response is None: return JSON_resp
+        # an error of the handler is not a failed request, it is raised once the queries are done
+        try:
+            on_response(JSON_resp)
+        except Exception as error:
+            handler_errors.append(error)
+    (fetched, abandoned) = await get_request_scheduler().fetch_all(queries_set, fetch, max_retry_iter)
+    if on_response is None: responses.extend(fetched.values())
+    responses.abandoned.update(abandoned)
+    if (build_metrics is not None) and (len(abandoned) > 0): build_metrics.record_abandoned(abandoned)
+    if (len(abandoned) > 0) and (VERBOSITY > 0):
+        print(" .{0} request(s) abandoned after {1} attempt(s) :".format(len(abandoned), max_retry_iter))
+        for url in abandoned: print("   {0} ({1})".format(url, abandoned[url]))
+    if TIMING and (VERBOSITY > 2): print(" .queries performed in {0} seconds".format(time.time() - start_time))
+    if cache is not None: cache.commit()
+    if recorder is not None: recorder.commit()
+    if len(handler_errors) > 0: raise handler_errors[0]
     return responses
         
 # ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
         
-def delete_characters(word, characters_to_delete):
-    for char in characters_to_delete: word = word.replace(char, "")
-    return word
-
-# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
-
-def normalize_word(word):
-    # Parameters type checking
-    if not isinstance(word, str):
-        raise ValueError("word : expected str, found {0}".format(type(word).__name__))
-    # Normalize the word
-    return delete_characters(word, ".,?():\n\r").lower()
-
-# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
-
 def format_search_terms(params = [], delimiter = " "):
     output_str = ""
     # Multiple parameters
@@ -760,21 +1534,60 @@ def format_search_terms(params = [], delimiter = " "):
 
 # ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
 
+def extract_paper_fields(JSON_paper):
+    # (id, src, title, authors, pubYear, citedCount, abstract) of a paper, None when fields are missing
+    if not all (key in JSON_paper for key in ('id', 'source', 'title', 'authorString', 'pubYear')): return None
+    # extract plain data
+    id = str(JSON_paper['id'])
+    src = str(JSON_paper['source'])
+    title = str(JSON_paper['title'])
+    pubYear = int(JSON_paper['pubYear'])
+    citedCount = int(JSON_paper['citedByCount']) if 'citedByCount' in JSON_paper else 0
+    abstract = str(JSON_paper['abstractText']) if 'abstractText' in JSON_paper else ""
+    # extract and parse the authors list
+    string_authors = JSON_paper['authorString']
+    authors = string_authors.split(", ")
+    return (id, src, title, authors, pubYear, citedCount, abstract)
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def relation_record(JSON_paper):
+    # (id, fields or None) of a paper of a reference or citation list, None without id
+    return (str(JSON_paper['id']), extract_paper_fields(JSON_paper)) if 'id' in JSON_paper else None
+
+def mined_term_record(JSON_term):
+    return (JSON_term['term'], JSON_term['count'])
+
+def search_record(JSON_paper):
+    # (fields, hasReferences) of a search result, None when fields are missing
+    fields = extract_paper_fields(JSON_paper)
+    return (fields, JSON_paper.get('hasReferences')) if fields is not None else None
+
+# items of the relation, mined terms and search pages, reduced as they are parsed
+RELATION_RECORDS = { ('referenceList', 'reference') : relation_record, ('citationList', 'citation') : relation_record }
+MINED_TERM_RECORDS = { ('semanticTypeList', 'semanticType', '*', 'tmSummary') : mined_term_record }
+SEARCH_RECORDS = { ('resultList', 'result') : search_record }
+# marks a response whose records are reduced, as kept in the response cache
+REDUCED = "reduced_records"
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def extract_papers_fields(JSON_list):
+    # yields (id, src, title, authors, pubYear, citedCount, abstract) once per paper id
+    seen_ids = set()
+    for JSON_paper in JSON_list:
+        paper = extract_paper_fields(JSON_paper)
+        if (paper is None) or (paper[0] in seen_ids): continue
+        seen_ids.add(paper[0])
+        yield paper
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
 def extract_LtdPaperDetails(JSON_list):
     extracted_papers = set()
-    for JSON_paper in JSON_list:
-        if all (key in JSON_paper for key in ('id', 'source', 'title', 'authorString', 'pubYear')):
-            # extract plain data
-            id = str(JSON_paper['id'])
-            src = str(JSON_paper['source'])
-            title = str(JSON_paper['title'])
-            pubYear = int(JSON_paper['pubYear'])
-            citedCount = int(JSON_paper['citedByCount']) if 'citedByCount' in JSON_paper else 0
-            # extract and parse the authors list
-            string_authors = JSON_paper['authorString']
-            authors = string_authors.split(", ")
-            # create a LtdPaperDetails object
-            extracted_papers.add(LtdPaperDetails(id = id, src = src, title = title, authors = authors, pubYear = pubYear, citedCount = citedCount))
+    for (id, src, title, authors, pubYear, citedCount, abstract) in extract_papers_fields(JSON_list):
+        # create a LtdPaperDetails object
+        extracted_papers.add(LtdPaperDetails(id = id, src = src, title = title, authors = authors, pubYear = pubYear, citedCount = citedCount, abstract = abstract))
     return extracted_papers
 
 # ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
@@ -789,20 +1602,30 @@ if __name__ == '__main__':
         # Trollius >= 0.3 was renamed
         import trollius as asyncio
 
+    # worker processes of the frozen executable start here too
+    multiprocessing.freeze_support()
+    read_config()
+
     if STOP_WORDS:
-        stop_word_file = "stop_word_list.txt"
-        if VERBOSITY > 1: print("Reading stop words list from {0}.".format(stop_word_file))
-        with open(stop_word_file, 'r') as stop_words_f:
-            for stop_word in stop_words_f:
-                stop_words_set.add(normalize_word(stop_word))
-        if VERBOSITY > 1: print ("Found {0} stop words.".format(len(stop_words_set)))
+        if VERBOSITY > 1: print("Reading stop words list from {0}.".format(STOP_WORD_FILE))
+        if VERBOSITY > 1: print ("Found {0} stop words.".format(len(get_stop_words())))
 
     factory = WebSocketServerFactory(u"ws://127.0.0.1:9000")
     factory.protocol = MyServerProtocol
+    if WS_COMPRESSION:
+        # accept permessage-deflate when the client offers it
+        from autobahn.websocket.compress import PerMessageDeflateOffer, PerMessageDeflateOfferAccept
+        def accept_compression(offers):
+            for offer in offers:
+                if isinstance(offer, PerMessageDeflateOffer):
+                    return PerMessageDeflateOfferAccept(offer)
+        factory.setProtocolOptions(perMessageCompressionAccept = accept_compression)
 
     loop = asyncio.get_event_loop()
     coro = loop.create_server(factory, '0.0.0.0', 9000)
     server = loop.run_until_complete(coro)
+    # Prometheus scrapes GET /metrics
+    metrics_runner = loop.run_until_complete(start_metrics_server(prometheus_metrics, port = metrics_port)) if metrics_port > 0 else None
 
     try:
         print("Server started");
@@ -811,6 +1634,11 @@ if __name__ == '__main__':
         pass
     finally:
         server.close()
+        if metrics_runner is not None: loop.run_until_complete(metrics_runner.cleanup())
+        if http_engine is not None: loop.run_until_complete(http_engine.close())
+        if process_pool is not None: process_pool.shutdown()
+        if citation_graph is not None: citation_graph.close()
+        if fixture_recorder is not None: fixture_recorder.commit()
         loop.close()
 
 if NO_CLIENT: client.close()
\ No newline at end of file
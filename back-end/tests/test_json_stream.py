@@ -0,0 +1,110 @@
+import os
+import sys
+import json
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import json_stream
+from json_stream import JSONRecordStream, reduce_records
+
+# Split point tests of the incremental parser : every page is fed in two chunks cut at
+# each of its bytes, then in chunks of every size up to 7 bytes, and must give what
+# json.loads (and reduce_records) give for the whole page.
+
+def paper(id, title, cited, score):
+    return { "id" : id, "source" : "MED", "title" : title, "authorString" : "Smith J, Doe A", "pubYear" : "2001",
+        "citedByCount" : cited, "score" : score, "journalInfo" : { "volume" : "12", "issue" : None, "dateOfPublication" : "2001 Mar" } }
+
+REFERENCE_PAGE = json.dumps({
+    "version" : "6.9", "hitCount" : 3, "request" : { "id" : "100001", "source" : "MED", "page" : 1, "pageSize" : 1000 },
+    "referenceList" : { "reference" : [
+        paper("100002", "Café \"quoted\" title\nwith \\ escapes and — dashes", 12, 1.5),
+        None,
+        paper("100003", "Exponents", 0, -2.5e-7),
+        { "title" : "No id" },
+        paper("100004", "🔬 Surrogates", 1234567, 1E+21)
+    ] }
+}, ensure_ascii = False, indent = 1)
+
+MINED_TERMS_PAGE = json.dumps({
+    "hitCount" : 4, "request" : { "id" : "100001", "source" : "MED", "page" : 1, "pageSize" : 1000 },
+    "semanticTypeList" : { "semanticType" : [
+        { "name" : "GENE_PROTEIN", "total" : 2, "tmSummary" : [{ "term" : "p53", "count" : 10 }, { "term" : "BRCA1", "count" : 0.25 }] },
+        { "name" : "DISEASE", "total" : 2, "tmSummary" : [{ "term" : "malaria", "count" : 3 }, None] }
+    ] }
+}, separators = (',', ':'))
+
+NUMBERS_PAGE = '{"resultList":{"result":[1.5,-0.25,1e5,2E-3,10,null,true,false,"1.",{"a":[1.25,{"b":null}]}]},"score":12.75}'
+
+def relation_record(item):
+    return (item["id"], item["title"]) if isinstance(item, dict) and ("id" in item) else None
+
+def term_record(item):
+    return (item["term"], item["count"]) if item is not None else None
+
+PAGES = [
+    (REFERENCE_PAGE, { ("referenceList", "reference") : relation_record }),
+    (MINED_TERMS_PAGE, { ("semanticTypeList", "semanticType", "*", "tmSummary") : term_record }),
+    (NUMBERS_PAGE, { ("resultList", "result") : lambda item : item })
+]
+
+def parse(chunks, record_paths, reduce):
+    parser = JSONRecordStream(record_paths, reduce = reduce)
+    for chunk in chunks: parser.feed(chunk)
+    return parser.close()
+
+def expected(page, record_paths, reduce):
+    # tuples come back as lists once through JSON, as they do from the response cache
+    document = json.loads(page)
+    return reduce_records(document, record_paths) if reduce else document
+
+class SplitPointTest(unittest.TestCase):
+
+    def setUp(self):
+        # every chunk is parsed as soon as it is fed
+        self.min_chunk_size = json_stream.MIN_CHUNK_SIZE
+        json_stream.MIN_CHUNK_SIZE = 1
+
+    def tearDown(self):
+        json_stream.MIN_CHUNK_SIZE = self.min_chunk_size
+
+    def test_two_chunks(self):
+        for (page, record_paths) in PAGES:
+            data = page.encode("utf-8")
+            for reduce in [True, False]:
+                result = expected(page, record_paths, reduce)
+                for split in range(len(data) + 1):
+                    self.assertEqual(parse([data[:split], data[split:]], record_paths, reduce), result, "split at {0} of {1}".format(split, page[:40]))
+
+    def test_small_chunks(self):
+        for (page, record_paths) in PAGES:
+            data = page.encode("utf-8")
+            for reduce in [True, False]:
+                result = expected(page, record_paths, reduce)
+                for size in range(1, 8):
+                    chunks = [data[start:start + size] for start in range(0, len(data), size)]
+                    self.assertEqual(parse(chunks, record_paths, reduce), result, "chunks of {0} bytes".format(size))
+
+    def test_buffered_chunks(self):
+        # the default gathering of chunks before they are parsed
+        json_stream.MIN_CHUNK_SIZE = self.min_chunk_size
+        (page, record_paths) = PAGES[0]
+        data = page.encode("utf-8")
+        self.assertEqual(parse([data[start:start + 100] for start in range(0, len(data), 100)], record_paths, True), expected(page, record_paths, True))
+
+    def test_null_items_kept_unreduced(self):
+        document = parse([NUMBERS_PAGE.encode("utf-8")], { ("resultList", "result") : lambda item : item }, False)
+        self.assertIn(None, document["resultList"]["result"])
+
+    def test_number_cut_before_its_fraction(self):
+        parser = JSONRecordStream({ ("list",) : lambda item : item })
+        for chunk in [b'{"score":1.', b'5,"list":[2.', b'25,3e', b'-2]}']: parser.feed(chunk)
+        self.assertEqual(parser.close(), { "score" : 1.5, "list" : [2.25, 3e-2] })
+
+    def test_invalid_documents(self):
+        for page in ['{"a":1.}', '{"a":[1,]}', '{"a":1', '{"a":1} x', '[1 2]']:
+            with self.assertRaises(ValueError, msg = page):
+                parse([page.encode("utf-8")], { ("a",) : lambda item : item }, True)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import os
+import sys
+from functools import lru_cache
+
+# Characters removed from every word, in one str.translate pass
+DELETED_CHARACTERS = ".,?():\n\r"
+DELETE_TABLE = str.maketrans("", "", DELETED_CHARACTERS)
+# In free text, line breaks separate words : they are left to str.split
+TEXT_DELETE_TABLE = str.maketrans("", "", ".,?():")
+
+# next to the executable in a frozen build, next to this module otherwise
+BASE_DIRECTORY = os.path.dirname(sys.executable) if getattr(sys, "frozen", False) else os.path.dirname(os.path.abspath(__file__))
+STOP_WORD_FILE = os.path.join(BASE_DIRECTORY, "stop_word_list.txt")
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def normalize_word(word):
+    # Parameters type checking
+    if not isinstance(word, str):
+        raise ValueError("word : expected str, found {0}".format(type(word).__name__))
+    # Normalize the word (most words have nothing to delete)
+    if word.isalnum(): return word.lower()
+    return word.translate(DELETE_TABLE).lower()
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+@lru_cache(maxsize = None)
+def load_stop_words(file_name = STOP_WORD_FILE):
+    # read once per file, shared by every build
+    with open(file_name, 'r') as stop_words_f:
+        return frozenset(map(normalize_word, stop_words_f))
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def title_words(title, stop_words = None):
+    # distinct normalized words of a title (words are separated by single spaces)
+    words = set(title.translate(DELETE_TABLE).lower().split(' '))
+    if stop_words is not None: words.difference_update(stop_words)
+    return list(words)
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def text_words(text, stop_words = None):
+    # every normalized word of a text, in order
+    words = text.translate(TEXT_DELETE_TABLE).lower().split()
+    if stop_words is not None: return [word for word in words if not word in stop_words]
+    return words
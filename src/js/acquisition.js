@@ -54,10 +54,10 @@ function search(search_terms, async, referenced_only){
             if (object.hasReferences != "N" || !referenced_only) search_result.push(new Paper(object));
         }
         
-		for (var i = 2; i < number_of_pages; i++){
+		for (var i = 2; i <= number_of_pages; i++){
 			$.get(query+"&page="+i, function(query_data2,status){
-				for (var i in query_data.resultList.result){
-                    var object = query_data.resultList.result[i];
+				for (var i in query_data2.resultList.result){
+                    var object = query_data2.resultList.result[i];
                     if (object.hasReferences != "N" || !referenced_only) search_result.push(new Paper(object));
                 }
                 console.log("objects produced:");